@@ -0,0 +1,61 @@
+import argparse
+import json
+import sys
+
+
+def load_results(path):
+    with open(path) as f:
+        report = json.load(f)
+
+    results = {}
+    for result in report['results']:
+        results[(result['name'], json.dumps(result['size']))] = result
+    return report, results
+
+
+def compare(base_path, new_path, threshold):
+    # Compares median times of two benchmark reports. Returns the list of
+    # (name, size, ratio) for every benchmark slower than the threshold.
+    base_report, base = load_results(base_path)
+    new_report, new = load_results(new_path)
+
+    print('base: ' + str(base_report.get('commit')))
+    print('new:  ' + str(new_report.get('commit')))
+    print()
+    print('{:<22} {:<12} {:>12} {:>12} {:>8}'.format('benchmark', 'size', 'base (s)', 'new (s)', 'ratio'))
+
+    regressions = []
+    for key in new:
+        if key not in base:
+            continue
+
+        name, size = key
+        base_time = base[key]['median']
+        new_time = new[key]['median']
+        ratio = new_time / base_time if base_time > 0 else float('inf')
+
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  slower'
+            regressions.append((name, size, ratio))
+        elif ratio < 1 - threshold:
+            flag = '  faster'
+
+        print('{:<22} {:<12} {:>12.6f} {:>12.6f} {:>8.2f}{}'.format(name, size, base_time, new_time, ratio, flag))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change reported as a regression')
+    args = parser.parse_args()
+
+    regressions = compare(args.base, args.new, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
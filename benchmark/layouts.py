@@ -0,0 +1,83 @@
+import math
+import random
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+
+
+def create_oval(count, segment_length=12.0, radius=120.0):
+    # Closed oval with two straight runs and two semicircles, split into about
+    # `count` segments in total. Returns the nodes and segments, unconnected,
+    # so that Track construction can be measured separately.
+    per_side = max(1, count // 4)
+    run = per_side * segment_length
+    sweep = math.pi / per_side
+
+    nodes = []
+    tracks = []
+
+    # Bottom straight run, left to right
+    for i in range(per_side + 1):
+        nodes.append(Node(Point(i * segment_length, -radius), 0))
+    for i in range(per_side):
+        tracks.append(Straight(nodes[i], nodes[i + 1]))
+
+    # Right semicircle, counterclockwise around (run, 0)
+    right_center = Point(run, 0)
+    first = len(nodes) - 1
+    for i in range(1, per_side + 1):
+        angle = (3 * math.pi / 2) + (i * sweep)
+        nodes.append(Node(Point(run + radius * math.cos(angle), radius * math.sin(angle)), 0))
+    for i in range(per_side):
+        start_angle = (3 * math.pi / 2) + (i * sweep)
+        tracks.append(Curve(right_center, radius, start_angle, start_angle + sweep, nodes[first + i], nodes[first + i + 1]))
+
+    # Top straight run, right to left
+    first = len(nodes) - 1
+    for i in range(1, per_side + 1):
+        nodes.append(Node(Point(run - i * segment_length, radius), 0))
+    for i in range(per_side):
+        tracks.append(Straight(nodes[first + i], nodes[first + i + 1]))
+
+    # Left semicircle back to the first node, counterclockwise around (0, 0)
+    left_center = Point(0, 0)
+    first = len(nodes) - 1
+    for i in range(1, per_side):
+        angle = (math.pi / 2) + (i * sweep)
+        nodes.append(Node(Point(radius * math.cos(angle), radius * math.sin(angle)), 0))
+    ends = nodes[first:] + [nodes[0]]
+    for i in range(per_side):
+        start_angle = (math.pi / 2) + (i * sweep)
+        tracks.append(Curve(left_center, radius, start_angle, start_angle + sweep, ends[i], ends[i + 1]))
+
+    return nodes, tracks
+
+
+def create_train_oval(train_count, train_length, segment_length=12.0):
+    # Oval with segments of about segment_length all the way round, long enough
+    # that train_count trains spread evenly along it have at least a train's
+    # length of clear track between them. Returns the nodes, the segments and a
+    # head location for every train, all facing forward.
+    count = max(100, int(math.ceil(2 * train_count * train_length / segment_length)))
+    radius = (count // 4) * segment_length / math.pi
+    nodes, tracks = create_oval(count, segment_length, radius)
+
+    total = sum(segment.length() for segment in tracks)
+    locations = []
+    i = 0
+    start = 0
+    for train in range(train_count):
+        target = (train + 0.5) * total / train_count
+        while start + tracks[i].length() < target:
+            start += tracks[i].length()
+            i += 1
+        locations.append(tracks[i].get_location(target - start, constants.DIRECTION_FORWARD))
+    return nodes, tracks, locations
+
+
+def create_points(count, seed=0):
+    generator = random.Random(seed)
+    return [Point(generator.uniform(-1000, 1000), generator.uniform(-1000, 1000)) for _ in range(count)]
@@ -0,0 +1,284 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+import numpy as np
+
+import src.constants as constants
+from src.geometry.algorithm.graham_scan import graham_scan
+from src.geometry.algorithm.monotone_chain import monotone_chain, monotone_chain_array
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.track import Track
+from src.simulation.consist import Consist
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from benchmark.layouts import create_oval, create_points, create_train_oval
+
+
+BENCHMARKS = []
+
+
+def benchmark(name, sizes, quick_sizes):
+    # Registers a setup function for a benchmark. The setup function is called
+    # with one size and returns the callable to time.
+    def register(setup):
+        BENCHMARKS.append((name, sizes, quick_sizes, setup))
+        return setup
+    return register
+
+
+@benchmark('location_get_offset', [10**2, 10**3, 10**4], [10**2, 10**3])
+def setup_get_offset(size):
+    # Offsets spanning a quarter of the layout, so every call crosses segments
+    nodes, tracks = create_oval(size)
+    track = Track(nodes, tracks)
+    loc = tracks[0].get_location(1, constants.DIRECTION_FORWARD)
+    offset = track.get_route_index().chains[0].total_length / 4
+
+    def run():
+        for i in range(100):
+            loc.get_offset(offset + i).get_offset(-offset - i)
+    return run
+
+
+@benchmark('simulation_step', [(10, 15), (100, 15), (100, 50), (1000, 15)], [(10, 15), (100, 15)])
+def setup_simulation_step(size):
+    train_count, car_count = size
+    nodes, tracks, locations = create_train_oval(train_count, Consist.uniform(car_count).length())
+    simulation = Simulation(Track(nodes, tracks))
+
+    for loc in locations:
+        simulation.add_train(TrainState(loc, Consist.uniform(car_count), 10))
+
+    def run():
+        simulation.step(1 / 60)
+    return run
+
+
+@benchmark('simulation_dynamics_step', [(10, 15), (100, 15), (1000, 15)], [(10, 15), (100, 15)])
+def setup_simulation_dynamics_step(size):
+    # simulation_step with every train driven through TrainDynamics
+    from src.simulation.dynamics import TrainDynamics
+
+    train_count, car_count = size
+    nodes, tracks, locations = create_train_oval(train_count, Consist.hauled(1, car_count - 1).length())
+    simulation = Simulation(Track(nodes, tracks), TrainDynamics())
+
+    for loc in locations:
+        train = simulation.add_train(TrainState(loc, Consist.hauled(1, car_count - 1), 10))
+        train.throttle = 0.5
+
+    def run():
+        simulation.step(1 / 60)
+    return run
+
+
+@benchmark('simulation_coupler_step', [(10, 15), (100, 15), (100, 50), (1000, 15)], [(10, 15), (100, 15)])
+def setup_simulation_coupler_step(size):
+    # simulation_dynamics_step with every car moving on its own couplers
+    from src.simulation.couplers import CouplerDynamics
+    from src.simulation.dynamics import TrainDynamics
+
+    train_count, car_count = size
+    nodes, tracks, locations = create_train_oval(train_count, Consist.hauled(1, car_count - 1).length())
+    simulation = Simulation(Track(nodes, tracks), couplers=CouplerDynamics(TrainDynamics()))
+
+    for loc in locations:
+        train = simulation.add_train(TrainState(loc, Consist.hauled(1, car_count - 1), 10))
+        train.throttle = 0.5
+
+    def run():
+        simulation.step(1 / 60)
+    return run
+
+
+@benchmark('partitioned_simulation_step', [(1000, 1), (1000, 2), (1000, 4)], [(100, 2)])
+def setup_partitioned_simulation_step(size):
+    # The same trains as simulation_step, split across worker processes
+    from src.simulation.partition import PartitionedSimulation
+
+    train_count, region_count = size
+    nodes, tracks, locations = create_train_oval(train_count, Consist.uniform(15).length())
+    simulation = PartitionedSimulation(Track(nodes, tracks), region_count)
+
+    for loc in locations:
+        simulation.add_train(TrainState(loc, Consist.uniform(15), 10))
+
+    def run():
+        simulation.step(1 / 60)
+    return run
+
+
+@benchmark('track_init', [10**2, 10**3, 10**4, 10**5], [10**2, 10**3])
+def setup_track_init(size):
+    nodes, tracks = create_oval(size)
+
+    def run():
+        Track(nodes, tracks)
+    return run
+
+
+@benchmark('route_planner_find_route', [10**2, 10**3, 10**4], [10**2, 10**3])
+def setup_route_planner(size):
+    # Hundreds of trains routed to a few destinations, as the dispatcher does
+    nodes, tracks = create_oval(size)
+    planner = Track(nodes, tracks).get_route_planner()
+    starts = [((i * size) // 500, constants.DIRECTION_FORWARD) for i in range(500)]
+    targets = [0, size // 3, (2 * size) // 3]
+
+    def run():
+        for target in targets:
+            planner.find_routes(starts, target)
+    return run
+
+
+@benchmark('curve_get_geometry', [1, 10, 100], [1, 10])
+def setup_curve_geometry(size):
+    nodes, tracks = create_oval(max(4, size * 2))
+    curves = [track for track in tracks if isinstance(track, Curve)][:size]
+
+    def run():
+        for curve in curves:
+            curve.get_geometry()
+    return run
+
+
+@benchmark('track_render', [10**2, 10**3, 10**4], [10**2])
+def setup_track_render(size):
+    from panda3d.core import NodePath
+
+    nodes, tracks = create_oval(size)
+    track = Track(nodes, tracks)
+
+    def run():
+        root = NodePath('render')
+        track.render(root)
+        root.removeNode()
+    return run
+
+
+@benchmark('track_edit', [10**2, 10**3, 10**4], [10**2, 10**3])
+def setup_track_edit(size):
+    # Moving one node and catching the simulation and renderer up, which should
+    # take about as long whatever the size of the layout
+    from panda3d.core import NodePath
+
+    nodes, tracks = create_oval(size)
+    track = Track(nodes, tracks)
+    simulation = Simulation(track)
+    simulation.get_segment_table()
+    renderer = track.render(NodePath('render'))
+    node = nodes[len(nodes) // 2]
+    original = node.point
+
+    def run():
+        for i in range(10):
+            node.point = Point(original.x, original.y + (i % 2))
+            simulation.get_segment_table()
+            renderer.update()
+    return run
+
+
+@benchmark('graham_scan', [10**3, 10**4, 10**5, 10**6], [10**3, 10**4])
+def setup_graham_scan(size):
+    points = create_points(size)
+
+    def run():
+        graham_scan(list(points))
+    return run
+
+
+@benchmark('monotone_chain', [10**3, 10**4, 10**5, 10**6], [10**3, 10**4])
+def setup_monotone_chain(size):
+    points = create_points(size)
+
+    def run():
+        monotone_chain(points)
+    return run
+
+
+@benchmark('monotone_chain_array', [10**3, 10**4, 10**5, 10**6], [10**3, 10**4])
+def setup_monotone_chain_array(size):
+    points = np.array([(p.x, p.y) for p in create_points(size)])
+
+    def run():
+        monotone_chain_array(points)
+    return run
+
+
+def measure(run, min_time):
+    # Calls the benchmark repeatedly until min_time has passed, at least 3 times
+    times = []
+    start = time.perf_counter()
+    while len(times) < 3 or time.perf_counter() - start < min_time:
+        begin = timeit.default_timer()
+        run()
+        times.append(timeit.default_timer() - begin)
+    times.sort()
+    return {
+        'runs': len(times),
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'max': times[-1],
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names=None, quick=False, min_time=0.5):
+    results = []
+
+    for name, sizes, quick_sizes, setup in BENCHMARKS:
+        if names and name not in names:
+            continue
+
+        for size in quick_sizes if quick else sizes:
+            try:
+                run = setup(size)
+            except ImportError as e:
+                print('Skipping ' + name + ': ' + str(e))
+                break
+
+            result = measure(run, min_time)
+            result['name'] = name
+            result['size'] = size
+            results.append(result)
+
+            print('{:<22} {:<12} {:>12.6f} s'.format(name, str(size), result['median']))
+
+    return {
+        'commit': get_commit(),
+        'python': sys.version,
+        'platform': platform.platform(),
+        'time': time.time(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the railroad microbenchmarks')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    parser.add_argument('--output', '-o', help='write results to this JSON file')
+    parser.add_argument('--quick', action='store_true', help='only run the smaller sizes')
+    parser.add_argument('--min-time', type=float, default=0.5, help='minimum seconds to spend on each size')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.names, args.quick, args.min_time)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
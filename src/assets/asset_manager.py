@@ -0,0 +1,159 @@
+import hashlib
+import os
+import threading
+
+from panda3d.core import Filename, PandaSystem
+
+
+MODELS_DIR = 'assets/models'
+CACHE_DIR = 'cache/models'
+
+
+class AssetManager:
+    def __init__(self, base, models_dir=MODELS_DIR, cache_dir=CACHE_DIR):
+        # Converts source models (glTF) to BAM files once, keyed by a hash of the
+        # file contents, and keeps loaded models in memory. Loading a BAM skips
+        # the glTF parse entirely.
+        self.base = base
+        self.models_dir = models_dir
+        self.cache_dir = cache_dir
+
+        self.models = {}
+        self.pending = {}
+
+        # Models converted on background threads, waiting to be loaded on the
+        # frame thread, and the number of conversions not yet loaded
+        self.lock = threading.Lock()
+        self.converted = []
+        self.converting = 0
+        self.task = None
+
+    def get_cache_path(self, path):
+        # The panda version is part of the key since BAM files are not always
+        # readable by other versions
+        digest = hashlib.sha256()
+        digest.update(PandaSystem.getVersionString().encode())
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 16), b''):
+                digest.update(block)
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, name + '-' + digest.hexdigest()[:16] + '.bam')
+
+    def convert(self, path):
+        # Returns the path of the cached BAM for a model, converting it if needed
+        if path.endswith('.bam'):
+            return path
+
+        cache_path = self.get_cache_path(path)
+        if not os.path.exists(cache_path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            model = self.base.loader.loadModel(Filename.fromOsSpecific(path), noCache=True)
+
+            # Written to a temporary name first so a partial file is never used,
+            # unique to the thread in case the same model is converted twice
+            temp_path = cache_path + '.' + str(threading.get_ident()) + '.tmp'
+            model.writeBamFile(Filename.fromOsSpecific(temp_path))
+            os.replace(temp_path, cache_path)
+
+        return cache_path
+
+    def get_model_paths(self):
+        paths = []
+        for name in sorted(os.listdir(self.models_dir)):
+            if name.endswith('.glb') or name.endswith('.gltf'):
+                paths.append(os.path.join(self.models_dir, name))
+        return paths
+
+    def preload(self, paths=None):
+        # Converts and loads every model up front so nothing is parsed mid-session
+        if paths is None:
+            paths = self.get_model_paths()
+
+        for path in paths:
+            self.load_model(path)
+
+    def is_loaded(self, path):
+        return os.path.normpath(path) in self.models
+
+    def load_model(self, path):
+        key = os.path.normpath(path)
+        if key not in self.models:
+            self.models[key] = self.base.loader.loadModel(Filename.fromOsSpecific(self.convert(path)))
+        return self.models[key]
+
+    def load_model_async(self, path, callback):
+        # Calls callback(model) on the frame thread once the model is loaded,
+        # straight away if it already is. The source is hashed and converted on
+        # a background thread and the BAM read on the loader thread, so nothing
+        # is parsed on the frame thread.
+        key = os.path.normpath(path)
+        if key in self.models:
+            callback(self.models[key])
+            return
+
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return
+
+        self.pending[key] = [callback]
+        if path.endswith('.bam'):
+            self.load_converted(key, path)
+            return
+
+        self.converting += 1
+        if self.task is None:
+            self.task = self.base.taskMgr.add(self.conversion_task, 'asset_conversion')
+        threading.Thread(target=self.run_conversion, args=(key, path), name='asset_conversion', daemon=True).start()
+
+    def run_conversion(self, key, path):
+        # Runs on a background thread. Errors are raised again on the frame
+        # thread by poll.
+        try:
+            result = self.convert(path)
+        except Exception as error:
+            result = error
+
+        with self.lock:
+            self.converted.append((key, result))
+
+    def poll(self):
+        # Starts loading the models whose conversions have finished. Called
+        # every frame by a task while any conversion is running.
+        with self.lock:
+            converted = self.converted
+            self.converted = []
+
+        errors = []
+        for key, result in converted:
+            self.converting -= 1
+            if isinstance(result, Exception):
+                del self.pending[key]
+                errors.append(result)
+            else:
+                self.load_converted(key, result)
+
+        if len(errors) > 0:
+            raise errors[0]
+
+    def conversion_task(self, task):
+        self.poll()
+        if self.converting == 0:
+            self.task = None
+            return task.done
+        return task.cont
+
+    def load_converted(self, key, cache_path):
+        def on_loaded(model):
+            self.models[key] = model
+            for waiting in self.pending.pop(key):
+                waiting(model)
+
+        self.base.loader.loadModel(Filename.fromOsSpecific(cache_path), callback=on_loaded)
+
+    def clear_cache(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.bam'):
+                os.remove(os.path.join(self.cache_dir, name))
@@ -1,7 +0,0 @@
-MIN_TURN_RADIUS = 21
-
-DIRECTION_FORWARD = 0
-DIRECTION_REVERSE = 1
-
-DIRECTION_TOWARD_NODE = 2
-DIRECTION_AWAY_FROM_NODE = 3
\ No newline at end of file
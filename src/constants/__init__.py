@@ -0,0 +1,14 @@
+MIN_TURN_RADIUS = 21
+
+DIRECTION_FORWARD = 0
+DIRECTION_REVERSE = 1
+
+DIRECTION_TOWARD_NODE = 2
+DIRECTION_AWAY_FROM_NODE = 3
+
+# The two ends of a segment, as used by the transition tables
+END_START = 0
+END_END = 1
+
+# Largest distance, in layout units, between a drawn curve and the true arc
+CURVE_TOLERANCE = 0.01
@@ -1,8 +1,74 @@
-from panda3d.core import LineSegs
+from panda3d.core import LineSegs, PNMImage, Texture, SamplerState, TextureStage
+from panda3d.core import GeomVertexFormat, GeomVertexData, GeomVertexWriter, GeomTriangles, Geom, GeomNode
 
 from src.constants.colors import *
 
 
+# Pixels along each side of the texture for one square foot of grid
+TILE_SIZE = 256
+
+grid_texture = None
+
+
+def get_grid_texture():
+    # One foot of grid (inch lines, with the foot lines along the edges) drawn
+    # once into a repeating, mipmapped texture shared by every Grid
+    global grid_texture
+    if grid_texture is not None:
+        return grid_texture
+
+    image = PNMImage(TILE_SIZE, TILE_SIZE, 4)
+    image.fill(EDITOR_BACKGROUND[0], EDITOR_BACKGROUND[1], EDITOR_BACKGROUND[2])
+    image.alphaFill(0)
+
+    for i in range(1, 12):
+        pixel = round(i * TILE_SIZE / 12)
+        draw_line(image, pixel, 1, EDITOR_LIGHT)
+
+    # Foot lines are split across both edges so they join up when the tile repeats
+    for pixel in [0, TILE_SIZE - 1]:
+        draw_line(image, pixel, 1, EDITOR_MEDIUM)
+
+    grid_texture = Texture('editor_grid')
+    grid_texture.load(image)
+    grid_texture.setWrapU(SamplerState.WM_repeat)
+    grid_texture.setWrapV(SamplerState.WM_repeat)
+    grid_texture.setMinfilter(SamplerState.FT_linear_mipmap_linear)
+    grid_texture.setMagfilter(SamplerState.FT_linear)
+    grid_texture.setAnisotropicDegree(4)
+    return grid_texture
+
+
+def draw_line(image, pixel, width, color):
+    for offset in range(width):
+        for j in range(TILE_SIZE):
+            image.setXelA(pixel + offset, j, color)
+            image.setXelA(j, pixel + offset, color)
+
+
+def create_unit_quad():
+    # Unit square in the XY plane with matching texture coordinates
+    vertex_data = GeomVertexData('editor_grid', GeomVertexFormat.getV3t2(), Geom.UHStatic)
+    vertex_data.setNumRows(4)
+    vertex = GeomVertexWriter(vertex_data, 'vertex')
+    texcoord = GeomVertexWriter(vertex_data, 'texcoord')
+
+    for x, y in [(0, 0), (1, 0), (1, 1), (0, 1)]:
+        vertex.addData3(x, y, 0)
+        texcoord.addData2(x, y)
+
+    triangles = GeomTriangles(Geom.UHStatic)
+    triangles.addVertices(0, 1, 2)
+    triangles.addVertices(0, 2, 3)
+
+    geom = Geom(vertex_data)
+    geom.addPrimitive(triangles)
+
+    node = GeomNode('editor_grid')
+    node.addGeom(geom)
+    return node
+
+
 class Grid:
     def __init__(self, base, width, height):
         self.base = base
@@ -18,8 +84,15 @@ class Grid:
         if self.root is not None:
             self.cleanup()
 
+        # Everything is built at a size of one inch and scaled up, so resizing
+        # only changes the scale and the texture repeat count
         self.root = self.base.render.attachNewNode('editor_grid')
 
+        self.quad = self.root.attachNewNode(create_unit_quad())
+        self.quad.setTexture(get_grid_texture())
+        self.quad.setTransparency(True)
+        self.quad.setTwoSided(True)
+        self.quad.setZ(-0.01)
 
         # Draw border
         segs = LineSegs()
@@ -27,50 +100,25 @@ class Grid:
         segs.setColor(EDITOR_DARK)
 
         segs.moveTo(0, 0, 0)
-        segs.drawTo(12*self.width, 0, 0)
-        segs.drawTo(12*self.width, 12*self.height, 0)
-        segs.drawTo(0, 12*self.height, 0)
+        segs.drawTo(1, 0, 0)
+        segs.drawTo(1, 1, 0)
+        segs.drawTo(0, 1, 0)
         segs.drawTo(0, 0, 0)
 
         self.root.attachNewNode(segs.create(None))
 
-        # Draw 1-foot lines
-        segs = LineSegs()
-        segs.setThickness(2.0)
-        segs.setColor(EDITOR_MEDIUM)
-
-        for i in range(1, self.width):
-            segs.moveTo(12 * i, 0, 0)
-            segs.drawTo(12 * i, 12*self.height, 0)
-        for i in range(1, self.height):
-            segs.moveTo(0, 12 * i, 0)
-            segs.drawTo(12 * self.width, 12 * i, 0)
+        self.apply_size()
 
-        self.root.attachNewNode(segs.create(None))
-
-        # Draw inch lines
-        segs = LineSegs()
-        segs.setThickness(1.0)
-        segs.setColor(EDITOR_LIGHT)
-
-        for i in range(1, 12*self.width):
-            if i % 12 == 0:
-                continue
-            segs.moveTo(i, 0, 0)
-            segs.drawTo(i, 12 * self.height, 0)
-        for i in range(1, 12*self.height):
-            if i % 12 == 0:
-                continue
-            segs.moveTo(0, i, 0)
-            segs.drawTo(12 * self.width, i, 0)
-
-        self.root.attachNewNode(segs.create(None))
+    def apply_size(self):
+        self.root.setScale(12 * self.width, 12 * self.height, 1)
+        self.quad.setTexScale(TextureStage.getDefault(), self.width, self.height)
 
     def update_size(self, newWidth, newHeight):
         self.width = newWidth
         self.height = newHeight
 
-        self.generate()
+        self.apply_size()
 
     def cleanup(self):
         self.root.removeNode()
+        self.root = None
@@ -1,7 +1,5 @@
 import functools
 
-from src.geometry.vector import Vector
-
 
 def graham_scan(points):
     ref_point, index = get_reference_point(points)
@@ -9,11 +7,11 @@ def graham_scan(points):
 
     sorted_polar = sorted(points[1:], key=functools.cmp_to_key(lambda p1, p2: polar_comparator(p1, p2, ref_point)))
 
-    to_remove = []
+    to_remove = set()
     for i in range(len(sorted_polar) - 1):
         d = direction(sorted_polar[i], sorted_polar[i + 1], ref_point)
         if d == 0:
-            to_remove.append(i)
+            to_remove.add(i)
     sorted_polar = [i for j, i in enumerate(sorted_polar) if j not in to_remove]
 
     m = len(sorted_polar)
@@ -48,20 +46,25 @@ def to_simple_comparator_value(value):
 
 
 def direction(p1, p2, ref_point):
-    vec1 = Vector.from_points(ref_point, p1)
-    vec2 = Vector.from_points(ref_point, p2)
+    # Cross product of the vectors from the reference point to p2 and p1,
+    # worked out inline since the comparator runs n log n times
+    dx1 = p1.x - ref_point.x
+    dy1 = p1.y - ref_point.y
+    dx2 = p2.x - ref_point.x
+    dy2 = p2.y - ref_point.y
 
-    return vec2.cross(vec1)
+    return (dx2 * dy1) - (dy2 * dx1)
 
 
 def polar_comparator(p1, p2, ref_point):
-    vec1 = Vector.from_points(ref_point, p1)
-    vec2 = Vector.from_points(ref_point, p2)
-
     angle_cmp = direction(p1, p2, ref_point)
 
     if angle_cmp == 0:
-        return to_simple_comparator_value(vec1.magnitude() - vec2.magnitude())
+        # Collinear with the reference point, so the squared distances order
+        # the points the same way as the distances
+        dist1 = ((p1.x - ref_point.x) ** 2) + ((p1.y - ref_point.y) ** 2)
+        dist2 = ((p2.x - ref_point.x) ** 2) + ((p2.y - ref_point.y) ** 2)
+        return to_simple_comparator_value(dist1 - dist2)
 
     return to_simple_comparator_value(angle_cmp)
 
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def monotone_chain(points):
+    # Andrew's monotone chain. Returns the hull in the same form as graham_scan:
+    # counterclockwise, starting from the lowest (then leftmost) point, with
+    # duplicate and collinear points removed.
+    if len(points) == 0:
+        raise AssertionError('Must have at least one point')
+
+    ordered = sorted(points, key=lambda p: (p.x, p.y))
+
+    unique = [ordered[0]]
+    for point in ordered[1:]:
+        last = unique[-1]
+        if point.x != last.x or point.y != last.y:
+            unique.append(point)
+
+    hull = chain([(p.x, p.y) for p in unique])
+    hull_points = [unique[i] for i in hull]
+    return rotate_to_reference(hull_points, [(p.y, p.x) for p in hull_points])
+
+
+def monotone_chain_array(points):
+    # Vectorized path for an (n, 2) array of points. Points that are strictly
+    # inside the polygon of extreme points can never be on the hull, so they are
+    # discarded with NumPy before the sequential part of the algorithm runs.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        raise AssertionError('Must have at least one point')
+
+    points = discard_interior(points)
+
+    # np.unique sorts by x then y and removes duplicates in the same pass
+    unique = np.unique(points, axis=0)
+
+    hull = unique[chain(unique.tolist())]
+    return np.array(rotate_to_reference(list(hull), [(p[1], p[0]) for p in hull])).reshape(-1, 2)
+
+
+def discard_interior(points):
+    x = points[:, 0]
+    y = points[:, 1]
+
+    extremes = [np.argmin(x), np.argmax(x), np.argmin(y), np.argmax(y),
+                np.argmin(x + y), np.argmax(x + y), np.argmin(x - y), np.argmax(x - y)]
+    candidates = np.unique(points[extremes], axis=0)
+    polygon = candidates[chain(candidates.tolist())]
+    if len(polygon) < 3:
+        return points
+
+    inside = np.ones(len(points), dtype=bool)
+    for i in range(len(polygon)):
+        ax, ay = polygon[i]
+        bx, by = polygon[(i + 1) % len(polygon)]
+        inside &= ((bx - ax) * (y - ay)) - ((by - ay) * (x - ax)) > 0
+
+    return points[~inside]
+
+
+def chain(points):
+    # Points must be sorted by x then y, without duplicates, as (x, y) pairs.
+    # Returns the indices of the hull vertices in counterclockwise order.
+    if len(points) < 3:
+        return list(range(len(points)))
+
+    lower = build_half(points, range(len(points)))
+    upper = build_half(points, range(len(points) - 1, -1, -1))
+    return lower[:-1] + upper[:-1]
+
+
+def build_half(points, order):
+    half = []
+    for i in order:
+        px, py = points[i]
+        while len(half) >= 2:
+            ax, ay = points[half[-2]]
+            bx, by = points[half[-1]]
+            # Pop anything that does not make a strict left turn
+            if ((bx - ax) * (py - ay)) - ((by - ay) * (px - ax)) > 0:
+                break
+            half.pop()
+        half.append(i)
+    return half
+
+
+def rotate_to_reference(hull, keys):
+    start = min(range(len(hull)), key=lambda i: keys[i])
+    return hull[start:] + hull[:start]
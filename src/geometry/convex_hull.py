@@ -1,5 +1,80 @@
+import numpy as np
+
+from src.geometry.algorithm.monotone_chain import monotone_chain, monotone_chain_array
+from src.geometry.point import Point
+
+
+# Above this many points it is faster to convert to an array than to sort Points
+ARRAY_THRESHOLD = 1000
+
+
 class ConvexHull:
     def __init__(self, points):
-        self.points = points
+        # Points can be a list of Points or an (n, 2) array. Only the hull
+        # vertices are kept, counterclockwise from the lowest point.
+        if not isinstance(points, np.ndarray) and len(points) > ARRAY_THRESHOLD:
+            points = np.array([(p.x, p.y) for p in points], dtype=np.float64)
+
+        if isinstance(points, np.ndarray):
+            self.points = [Point(x, y) for x, y in monotone_chain_array(points).tolist()]
+        else:
+            self.points = monotone_chain(points)
+
+    def bounds(self):
+        # (min_x, min_y, max_x, max_y)
+        xs = [p.x for p in self.points]
+        ys = [p.y for p in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def translate(self, dx, dy):
+        self.points = [Point(p.x + dx, p.y + dy) for p in self.points]
+
+    def contains(self, point):
+        # Points on the boundary count as inside
+        n = len(self.points)
+        if n == 1:
+            return point == self.points[0]
+        if n == 2:
+            return on_segment(self.points[0], self.points[1], point)
+
+        for i in range(n):
+            a = self.points[i]
+            b = self.points[(i + 1) % n]
+            if cross(a, b, point) < 0:
+                return False
+        return True
+
+    def overlaps(self, other):
+        # Separating axis test. Hulls only overlap if their interiors do, so hulls
+        # that just touch along an edge or at a corner do not overlap.
+        if len(self.points) < 3 or len(other.points) < 3:
+            return False
+
+        for hull in [self, other]:
+            n = len(hull.points)
+            for i in range(n):
+                a = hull.points[i]
+                b = hull.points[(i + 1) % n]
+                axis_x = a.y - b.y
+                axis_y = b.x - a.x
+
+                min_1, max_1 = project(self.points, axis_x, axis_y)
+                min_2, max_2 = project(other.points, axis_x, axis_y)
+                if max_1 <= min_2 or max_2 <= min_1:
+                    return False
+        return True
+
+
+def cross(a, b, p):
+    return ((b.x - a.x) * (p.y - a.y)) - ((b.y - a.y) * (p.x - a.x))
+
+
+def on_segment(a, b, p):
+    if cross(a, b, p) != 0:
+        return False
+    return min(a.x, b.x) <= p.x <= max(a.x, b.x) and min(a.y, b.y) <= p.y <= max(a.y, b.y)
 
 
+def project(points, axis_x, axis_y):
+    values = [(p.x * axis_x) + (p.y * axis_y) for p in points]
+    return min(values), max(values)
@@ -2,6 +2,8 @@ import math
 
 
 class Vector:
+    __slots__ = ('dx', 'dy')
+
     def __init__(self, dx, dy):
         self.dx = dx
         self.dy = dy
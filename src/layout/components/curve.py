@@ -1,13 +1,15 @@
 import math
 
-from panda3d.core import Vec4, LineSegs
-
 import src.constants as constants
+import src.stats as stats
 from src.layout.components.straight import Straight
 from src.geometry.point import Point
 from src.layout.components.location import Location
 
 
+MAX_SEGMENT_COUNT = 1000
+
+
 class Curve(Straight):
     def __init__(self, center, radius, startAngle, endAngle, startNode, endNode):
         Straight.__init__(self, startNode, endNode)
@@ -23,8 +25,45 @@ class Curve(Straight):
         self.startAngle = startAngle
         self.endAngle = endAngle
 
-    def length(self):
-        return (self.endAngle - self.startAngle) * self.radius
+    def update_cache(self):
+        # Curves have no single heading or direction, only a length and grade.
+        # Call invalidate after changing the center, radius or angles.
+        self.cached_length = (self.endAngle - self.startAngle) * self.radius
+        self.update_grade()
+        self.cache_valid = True
+
+    def get_heading(self):
+        raise AssertionError('Curves do not have a single heading')
+
+    def get_unit_direction(self):
+        raise AssertionError('Curves do not have a single direction')
+
+    def contains_angle(self, angle):
+        # Whether the arc sweeps through the given direction from the center
+        rel_angle = (angle - self.startAngle) % (2 * math.pi)
+        return rel_angle <= self.endAngle - self.startAngle
+
+    def bounds(self):
+        start = self.startNode.point
+        end = self.endNode.point
+        xs = [start.x, end.x]
+        ys = [start.y, end.y]
+
+        # The arc also reaches out to any of the four axis directions it sweeps past
+        for i in range(4):
+            angle = i * math.pi / 2
+            if self.contains_angle(angle):
+                xs.append(self.center.x + (self.radius * math.cos(angle)))
+                ys.append(self.center.y + (self.radius * math.sin(angle)))
+
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def distance_to(self, point):
+        angle = math.atan2(point.y - self.center.y, point.x - self.center.x)
+        if self.contains_angle(angle):
+            return abs(point.distance(self.center) - self.radius)
+
+        return min(point.distance(self.startNode.point), point.distance(self.endNode.point))
 
     def get_initial_location(self, node_id, rel_direction):
         direction = constants.DIRECTION_FORWARD
@@ -41,64 +80,49 @@ class Curve(Straight):
 
         return CurveLocation(self, angle, direction)
 
+    def get_location(self, distance, direction):
+        return CurveLocation(self, self.startAngle + (distance / self.radius), direction)
+
     def get_offset(self, loc, offset):
         # Location must be from this track segment, otherwise it does not mean anything
-        if self.uuid != loc.track_uuid():
-            raise AssertionError(self.uuid + ' does not match provided ID ' + loc.track_uuid)
+        if loc.track is not self:
+            raise AssertionError(self.uuid + ' does not match provided ID ' + loc.track_uuid())
 
         offset_angle = offset / self.radius
         new_angle = loc.angle + offset_angle
         if loc.direction == constants.DIRECTION_REVERSE:
             new_angle = loc.angle - offset_angle
 
-        if new_angle < self.startAngle:
-            relative_dir = constants.DIRECTION_TOWARD_NODE
-            remaining_angle = new_angle - self.startAngle
+        if new_angle < self.startAngle or new_angle > self.endAngle:
+            return self.get_route_offset(loc, offset)
 
-            if loc.direction == constants.DIRECTION_REVERSE:
-                relative_dir = constants.DIRECTION_AWAY_FROM_NODE
-                remaining_angle = self.startAngle - new_angle
-
-            remaining_offset = remaining_angle * self.radius
-
-            connecting_track = self.connections[self.startNode.uuid]
-            new_track_loc = connecting_track.get_initial_location(self.startNode.uuid, relative_dir)
-            return new_track_loc.get_offset(remaining_offset)
-
-        if new_angle > self.endAngle:
-            relative_dir = constants.DIRECTION_AWAY_FROM_NODE
-            remaining_angle = new_angle - self.endAngle
-
-            if loc.direction == constants.DIRECTION_REVERSE:
-                relative_dir = constants.DIRECTION_TOWARD_NODE
-                remaining_angle = self.endAngle - new_angle
+        return CurveLocation(self, new_angle, loc.direction)
 
-            remaining_offset = remaining_angle * self.radius
+    def get_segment_count(self, tolerance):
+        # Fewest straight lines that keep the chord error (the gap between a line
+        # and the arc it replaces) within the tolerance
+        if tolerance >= self.radius:
+            return 1
 
-            connecting_track = self.connections[self.endNode.uuid]
-            new_track_loc = connecting_track.get_initial_location(self.endNode.uuid, relative_dir)
-            return new_track_loc.get_offset(remaining_offset)
+        max_step = 2 * math.acos(1 - (tolerance / self.radius))
+        count = math.ceil((self.endAngle - self.startAngle) / max_step)
+        return min(max(count, 1), MAX_SEGMENT_COUNT)
 
-        return CurveLocation(self, new_angle, loc.direction)
+    def draw(self, segs, tolerance=constants.CURVE_TOLERANCE):
+        count = self.get_segment_count(tolerance)
 
-    def get_geometry(self):
-        segs = LineSegs()
-        segs.setThickness(2.0)
-        segs.setColor(Vec4(0, 1, 0, 1))
         segs.moveTo(self.startNode.point.x, self.startNode.point.y, self.startNode.height)
 
-        for i in range(100):
-            angle = self.startAngle + ((self.endAngle - self.startAngle) * (i / 100.0))
+        for i in range(1, count):
+            angle = self.startAngle + ((self.endAngle - self.startAngle) * (i / count))
             x = self.center.x + (math.cos(angle) * self.radius)
             y = self.center.y + (math.sin(angle) * self.radius)
-            height = self.startNode.height + ((self.endNode.height - self.startNode.height) * (i / 100.0))
+            height = self.startNode.height + ((self.endNode.height - self.startNode.height) * (i / count))
 
             segs.drawTo(x, y, height)
 
         segs.drawTo(self.endNode.point.x, self.endNode.point.y, self.endNode.height)
 
-        return segs.create(None)
-
     def to_string(self):
         string = 'Curve: ' + self.uuid + '\n'
         string += '  - center: ' + self.center.to_string() + '\n'
@@ -115,7 +139,12 @@ class Curve(Straight):
 
 
 class CurveLocation(Location):
+    __slots__ = ('track', 'angle', 'direction')
+
     def __init__(self, track, angle, direction):
+        if stats.enabled:
+            stats.count('locations_allocated')
+
         self.track = track
         self.angle = angle
         self.direction = direction
@@ -123,19 +152,19 @@ class CurveLocation(Location):
     def track_uuid(self):
         return self.track.uuid
 
+    def track_id(self):
+        return self.track.id
+
     def get_pos(self):
         x = self.track.center.x + (self.track.radius * math.cos(self.angle))
         y = self.track.center.y + (self.track.radius * math.sin(self.angle))
         return Point(x, y)
 
     def get_height(self):
-        start_height = self.track.startNode.height
-        end_height = self.track.endNode.height
-
         rel_angle = self.angle - self.track.startAngle
         total_angle = self.track.endAngle - self.track.startAngle
 
-        return start_height + ((end_height - start_height) * (rel_angle / total_angle))
+        return self.track.startNode.height + (self.track.get_height_delta() * (rel_angle / total_angle))
 
     def get_h(self):
         h = self.angle
@@ -148,13 +177,15 @@ class CurveLocation(Location):
         return h
 
     def get_slope(self):
-        dz = self.track.endNode.height - self.track.startNode.height
-        slope = math.atan2(dz, self.track.length())
+        slope = self.track.get_grade()
 
         if self.direction == constants.DIRECTION_REVERSE:
             slope = -slope
 
         return slope
 
+    def get_distance(self):
+        return (self.angle - self.track.startAngle) * self.track.radius
+
     def get_offset(self, offset):
         return self.track.get_offset(self, offset)
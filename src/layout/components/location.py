@@ -2,9 +2,15 @@ from src.geometry.point import Point
 
 
 class Location:
+    # Subclasses list their own fields, so locations carry no __dict__
+    __slots__ = ()
+
     def track_uuid(self):
         return ''
 
+    def track_id(self):
+        return -1
+
     def get_pos(self):
         return Point(0, 0)
 
@@ -17,5 +23,8 @@ class Location:
     def get_slope(self):
         return 0
 
+    def get_distance(self):
+        return 0
+
     def get_offset(self, offset):
         return Location()
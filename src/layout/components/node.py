@@ -4,8 +4,46 @@ import src.util as util
 class Node:
     def __init__(self, point, height):
         self.uuid = util.gen_uuid()
-        self.point = point
-        self.height = height
+
+        # Dense index within the Track, set when the Track is built
+        self.id = None
+
+        # Segments ending at this node, told when the node moves so they can
+        # drop their cached lengths and directions
+        self.segments = []
+
+        self._point = point
+        self._height = height
+
+    @property
+    def point(self):
+        return self._point
+
+    @point.setter
+    def point(self, point):
+        # Points are replaced rather than edited in place, so every move passes
+        # through here
+        self._point = point
+        self.invalidate_segments()
+
+    @property
+    def height(self):
+        return self._height
+
+    @height.setter
+    def height(self, height):
+        self._height = height
+        self.invalidate_segments()
+
+    def attach_segment(self, segment):
+        self.segments.append(segment)
+
+    def detach_segment(self, segment):
+        self.segments.remove(segment)
+
+    def invalidate_segments(self):
+        for segment in self.segments:
+            segment.invalidate()
 
     def to_string(self):
-        return 'Node ' + self.uuid + ': ' + self.point.to_string()
\ No newline at end of file
+        return 'Node ' + self.uuid + ': ' + self.point.to_string()
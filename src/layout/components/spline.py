@@ -0,0 +1,324 @@
+import math
+from bisect import bisect_right
+
+import numpy as np
+
+import src.constants as constants
+import src.stats as stats
+from src.layout.components.straight import Straight
+from src.geometry.point import Point
+from src.layout.components.location import Location
+
+
+MIN_TABLE_SIZE = 16
+MAX_TABLE_SIZE = 4096
+
+# Largest distance, in layout units, between the spline and straight lines
+# drawn between neighbouring entries of its arc length table
+SPLINE_TOLERANCE = 0.001
+
+# 5 point Gauss-Legendre rule on [0, 1], exact for the polynomial part of the
+# speed and accurate to well below a millimetre over one table interval
+GAUSS_NODES = [0.04691007703066800, 0.23076534494715845, 0.5, 0.76923465505284155, 0.95308992296933200]
+GAUSS_WEIGHTS = [0.11846344252809454, 0.23931433524968324, 0.28444444444444444, 0.23931433524968324,
+                 0.11846344252809454]
+
+
+class Spline(Straight):
+    def __init__(self, control1, control2, startNode, endNode, tolerance=SPLINE_TOLERANCE):
+        Straight.__init__(self, startNode, endNode)
+
+        # Splines are cubic Bezier curves from the start node to the end node,
+        # pulled toward two control points. The track leaves the start node
+        # heading toward control1 and arrives at the end node heading away from
+        # control2, so easements are made by putting the control points on the
+        # tangents of the segments being joined.
+        #
+        # Distances are turned into curve parameters through an arc length
+        # table, sampled densely enough that straight lines between its entries
+        # stay within the tolerance of the curve.
+        self.control1 = control1
+        self.control2 = control2
+        self.tolerance = tolerance
+
+    @classmethod
+    def from_headings(cls, startNode, startHeading, endNode, endHeading, tolerance=SPLINE_TOLERANCE):
+        # Spline leaving the start node at startHeading and arriving at the end
+        # node at endHeading, with each control point a third of the chord out
+        start = startNode.point
+        end = endNode.point
+        reach = start.distance(end) / 3
+
+        control1 = Point(start.x + (reach * math.cos(startHeading)), start.y + (reach * math.sin(startHeading)))
+        control2 = Point(end.x - (reach * math.cos(endHeading)), end.y - (reach * math.sin(endHeading)))
+        return cls(control1, control2, startNode, endNode, tolerance)
+
+    def get_control_points(self):
+        return [self.startNode.point, self.control1, self.control2, self.endNode.point]
+
+    def point_at(self, t):
+        p0, p1, p2, p3 = self.get_control_points()
+        u = 1 - t
+        a = u * u * u
+        b = 3 * u * u * t
+        c = 3 * u * t * t
+        d = t * t * t
+        return (a * p0.x) + (b * p1.x) + (c * p2.x) + (d * p3.x), (a * p0.y) + (b * p1.y) + (c * p2.y) + (d * p3.y)
+
+    def derivative_at(self, t):
+        p0, p1, p2, p3 = self.get_control_points()
+        u = 1 - t
+        a = 3 * u * u
+        b = 6 * u * t
+        c = 3 * t * t
+        dx = (a * (p1.x - p0.x)) + (b * (p2.x - p1.x)) + (c * (p3.x - p2.x))
+        dy = (a * (p1.y - p0.y)) + (b * (p2.y - p1.y)) + (c * (p3.y - p2.y))
+        return dx, dy
+
+    def speed_at(self, t):
+        dx, dy = self.derivative_at(t)
+        return math.sqrt((dx * dx) + (dy * dy))
+
+    def arc_length(self, t0, t1):
+        # Length of the curve between two parameters
+        total = 0
+        for node, weight in zip(GAUSS_NODES, GAUSS_WEIGHTS):
+            total += weight * self.speed_at(t0 + ((t1 - t0) * node))
+        return total * (t1 - t0)
+
+    def evaluate_arrays(self, t):
+        # Points, first and second derivatives at many parameters at once
+        p = np.array([[point.x, point.y] for point in self.get_control_points()])
+        t = t[:, None]
+        u = 1 - t
+
+        points = (u * u * u * p[0]) + (3 * u * u * t * p[1]) + (3 * u * t * t * p[2]) + (t * t * t * p[3])
+        first = (3 * u * u * (p[1] - p[0])) + (6 * u * t * (p[2] - p[1])) + (3 * t * t * (p[3] - p[2]))
+        second = (6 * u * (p[2] - (2 * p[1]) + p[0])) + (6 * t * (p[3] - (2 * p[2]) + p[1]))
+        return points, first, second
+
+    def get_table_size(self):
+        # Straight lines of length s along a curve of curvature k stray from it
+        # by about k * s^2 / 8, so the table needs entries at most
+        # sqrt(8 * tolerance / k) apart where the curve is tightest. Entries are
+        # evenly spaced in the parameter, which is stretched where the curve
+        # moves fastest, so the count is scaled up by how uneven that is.
+        t = np.linspace(0, 1, 65)
+        points, first, second = self.evaluate_arrays(t)
+        speed = np.hypot(first[:, 0], first[:, 1])
+        cross = np.abs((first[:, 0] * second[:, 1]) - (first[:, 1] * second[:, 0]))
+        curvature = np.divide(cross, speed ** 3, out=np.zeros_like(speed), where=speed > 0)
+
+        mean_speed = np.mean(speed)
+        max_curvature = np.max(curvature)
+        if mean_speed == 0 or max_curvature == 0:
+            return MIN_TABLE_SIZE
+
+        count = mean_speed * math.sqrt(max_curvature / (8 * self.tolerance)) * (np.max(speed) / mean_speed)
+        return min(max(math.ceil(count), MIN_TABLE_SIZE), MAX_TABLE_SIZE)
+
+    def update_cache(self):
+        # Builds the arc length table: parameters, cumulative distances, points
+        # and headings, plus the length and grade every segment caches. Call
+        # invalidate after moving a control point.
+        count = self.get_table_size()
+        t = np.linspace(0, 1, count + 1)
+
+        # Length of each interval by Gauss-Legendre quadrature of the speed
+        step = np.diff(t)
+        samples = t[:-1, None] + (step[:, None] * np.array(GAUSS_NODES))
+        _, first, _ = self.evaluate_arrays(samples.flatten())
+        speed = np.hypot(first[:, 0], first[:, 1]).reshape(samples.shape)
+        lengths = (speed @ np.array(GAUSS_WEIGHTS)) * step
+
+        points, first, _ = self.evaluate_arrays(t)
+
+        self.table_t = t.tolist()
+        self.table_s = np.concatenate([[0.0], np.cumsum(lengths)]).tolist()
+        self.table_x = points[:, 0]
+        self.table_y = points[:, 1]
+        self.table_h = np.unwrap(np.arctan2(first[:, 1], first[:, 0]))
+
+        self.cached_length = self.table_s[-1]
+        self.update_grade()
+        self.cache_valid = True
+
+    def get_heading(self):
+        raise AssertionError('Splines do not have a single heading')
+
+    def get_unit_direction(self):
+        raise AssertionError('Splines do not have a single direction')
+
+    def get_table(self):
+        if not self.cache_valid:
+            self.update_cache()
+        return self.table_s, self.table_x, self.table_y, self.table_h
+
+    def get_parameter(self, distance):
+        # Curve parameter at a distance along the spline. The table entry is
+        # found by binary search and interpolated, then one Newton step on the
+        # arc length removes the error of treating the interval as uniform.
+        if not self.cache_valid:
+            self.update_cache()
+
+        table_s = self.table_s
+        table_t = self.table_t
+        distance = min(max(distance, 0), self.cached_length)
+
+        i = min(max(bisect_right(table_s, distance) - 1, 0), len(table_s) - 2)
+        s0 = table_s[i]
+        s1 = table_s[i + 1]
+        t0 = table_t[i]
+        t1 = table_t[i + 1]
+        if s1 <= s0:
+            return t0
+
+        t = t0 + ((t1 - t0) * ((distance - s0) / (s1 - s0)))
+
+        speed = self.speed_at(t)
+        if speed > 0:
+            t -= (s0 + self.arc_length(t0, t) - distance) / speed
+            t = min(max(t, t0), t1)
+
+        return t
+
+    def get_curve_heading(self, t):
+        dx, dy = self.derivative_at(t)
+        return math.atan2(dy, dx)
+
+    def bounds(self):
+        # The table points are within the tolerance of the curve everywhere
+        table_s, table_x, table_y, table_h = self.get_table()
+        return (float(np.min(table_x)) - self.tolerance, float(np.min(table_y)) - self.tolerance,
+                float(np.max(table_x)) + self.tolerance, float(np.max(table_y)) + self.tolerance)
+
+    def distance_to(self, point):
+        # Distance to the nearest line between table points
+        table_s, table_x, table_y, table_h = self.get_table()
+        start_x = table_x[:-1]
+        start_y = table_y[:-1]
+        dx = table_x[1:] - start_x
+        dy = table_y[1:] - start_y
+
+        length_squared = (dx * dx) + (dy * dy)
+        t = np.divide(((point.x - start_x) * dx) + ((point.y - start_y) * dy), length_squared,
+                      out=np.zeros_like(dx), where=length_squared > 0)
+        t = np.clip(t, 0, 1)
+        return float(np.min(np.hypot(point.x - (start_x + (t * dx)), point.y - (start_y + (t * dy)))))
+
+    def get_initial_location(self, node_id, rel_direction):
+        direction = constants.DIRECTION_FORWARD
+        distance = 0
+
+        if node_id == self.startNode.uuid:
+            if rel_direction == constants.DIRECTION_TOWARD_NODE:
+                direction = constants.DIRECTION_REVERSE
+        else:
+            if rel_direction == constants.DIRECTION_AWAY_FROM_NODE:
+                direction = constants.DIRECTION_REVERSE
+            distance = self.length()
+
+        return SplineLocation(self, distance, direction)
+
+    def get_location(self, distance, direction):
+        return SplineLocation(self, distance, direction)
+
+    def get_offset(self, loc, offset):
+        # Location must be from this track segment, otherwise it does not mean anything
+        if loc.track is not self:
+            raise AssertionError(self.uuid + ' does not match provided ID ' + loc.track_uuid())
+
+        length = self.length()
+
+        new_distance = loc.distance + offset
+        if loc.direction == constants.DIRECTION_REVERSE:
+            new_distance = loc.distance - offset
+
+        if new_distance < 0 or new_distance > length:
+            return self.get_route_offset(loc, offset)
+
+        return SplineLocation(self, new_distance, loc.direction)
+
+    def get_segment_count(self, tolerance):
+        # Fewest straight lines that keep the chord error within the tolerance,
+        # never finer than the table itself
+        table_count = len(self.get_table()[0]) - 1
+        if tolerance <= self.tolerance:
+            return table_count
+        return max(math.ceil(table_count * math.sqrt(self.tolerance / tolerance)), 1)
+
+    def draw(self, segs, tolerance=constants.CURVE_TOLERANCE):
+        count = self.get_segment_count(tolerance)
+        length = self.length()
+
+        segs.moveTo(self.startNode.point.x, self.startNode.point.y, self.startNode.height)
+
+        for i in range(1, count):
+            x, y = self.point_at(self.get_parameter(length * (i / count)))
+            height = self.startNode.height + ((self.endNode.height - self.startNode.height) * (i / count))
+
+            segs.drawTo(x, y, height)
+
+        segs.drawTo(self.endNode.point.x, self.endNode.point.y, self.endNode.height)
+
+    def to_string(self):
+        string = 'Spline: ' + self.uuid + '\n'
+        string += '  - control1: ' + self.control1.to_string() + '\n'
+        string += '  - control2: ' + self.control2.to_string() + '\n'
+        string += '  - start: ' + self.startNode.to_string() + '\n'
+        string += '  - end:   ' + self.endNode.to_string() + '\n'
+        string += '  - connections:\n'
+        for node in self.connections:
+            string += '    - ' + node + ': ' + self.connections[node].uuid + '\n'
+
+        return string
+
+
+class SplineLocation(Location):
+    __slots__ = ('track', 'distance', 'direction')
+
+    def __init__(self, track, distance, direction):
+        if stats.enabled:
+            stats.count('locations_allocated')
+
+        self.track = track
+        self.distance = distance
+        self.direction = direction
+
+    def track_uuid(self):
+        return self.track.uuid
+
+    def track_id(self):
+        return self.track.id
+
+    def get_pos(self):
+        x, y = self.track.point_at(self.track.get_parameter(self.distance))
+        return Point(x, y)
+
+    def get_height(self):
+        length = self.track.length()
+        if length == 0:
+            return self.track.startNode.height
+        return self.track.startNode.height + (self.track.get_height_delta() * (self.distance / length))
+
+    def get_h(self):
+        angle = self.track.get_curve_heading(self.track.get_parameter(self.distance))
+
+        if self.direction == constants.DIRECTION_REVERSE:
+            angle += math.pi
+
+        return angle
+
+    def get_slope(self):
+        slope = self.track.get_grade()
+
+        if self.direction == constants.DIRECTION_REVERSE:
+            slope = -slope
+
+        return slope
+
+    def get_distance(self):
+        return self.distance
+
+    def get_offset(self, offset):
+        return self.track.get_offset(self, offset)
@@ -1,9 +1,8 @@
 import math
 
-from panda3d.core import Vec4, LineSegs
-
 import src.util as util
 import src.constants as constants
+import src.stats as stats
 from src.geometry.point import Point
 from src.layout.components.location import Location
 
@@ -13,12 +12,73 @@ class Straight:
         self.uuid = util.gen_uuid()
         self.connections = {}
 
+        # The Track this segment belongs to and its dense index within it, both
+        # set when the Track is built. The uuid is only an external identifier.
+        self.layout = None
+        self.id = None
+
         # Straight tracks are defined by two points
         self.startNode = startNode
         self.endNode = endNode
 
+        # Quantities derived from the nodes, worked out on first use and again
+        # after either node moves
+        self.cache_valid = False
+        startNode.attach_segment(self)
+        endNode.attach_segment(self)
+
+    def invalidate(self):
+        # Also tells the Track, so whatever it derived from this segment is
+        # rebuilt without rebuilding the rest
+        self.cache_valid = False
+        if self.layout is not None:
+            self.layout.segment_changed(self)
+
+    def update_cache(self):
+        start = self.startNode.point
+        end = self.endNode.point
+        dx = end.x - start.x
+        dy = end.y - start.y
+
+        self.cached_length = math.sqrt((dx * dx) + (dy * dy))
+        self.heading = math.atan2(dy, dx)
+        self.direction_x = 0
+        self.direction_y = 0
+        if self.cached_length > 0:
+            self.direction_x = dx / self.cached_length
+            self.direction_y = dy / self.cached_length
+
+        self.update_grade()
+        self.cache_valid = True
+
+    def update_grade(self):
+        self.dz = self.endNode.height - self.startNode.height
+        self.grade = math.atan2(self.dz, self.cached_length)
+
     def length(self):
-        return self.startNode.point.distance(self.endNode.point)
+        if not self.cache_valid:
+            self.update_cache()
+        return self.cached_length
+
+    def get_heading(self):
+        if not self.cache_valid:
+            self.update_cache()
+        return self.heading
+
+    def get_unit_direction(self):
+        if not self.cache_valid:
+            self.update_cache()
+        return self.direction_x, self.direction_y
+
+    def get_grade(self):
+        if not self.cache_valid:
+            self.update_cache()
+        return self.grade
+
+    def get_height_delta(self):
+        if not self.cache_valid:
+            self.update_cache()
+        return self.dz
 
     def add_connection(self, node_id, track):
         self.connections[node_id] = track
@@ -26,6 +86,27 @@ class Straight:
     def get_nodes(self):
         return [self.startNode.uuid, self.endNode.uuid]
 
+    def bounds(self):
+        # (min_x, min_y, max_x, max_y) in the plane
+        start = self.startNode.point
+        end = self.endNode.point
+        return min(start.x, end.x), min(start.y, end.y), max(start.x, end.x), max(start.y, end.y)
+
+    def distance_to(self, point):
+        # Shortest distance in the plane from the point to the segment
+        start = self.startNode.point
+        end = self.endNode.point
+        dx = end.x - start.x
+        dy = end.y - start.y
+
+        length_squared = (dx * dx) + (dy * dy)
+        if length_squared == 0:
+            return start.distance(point)
+
+        t = (((point.x - start.x) * dx) + ((point.y - start.y) * dy)) / length_squared
+        t = min(max(t, 0), 1)
+        return point.distance(Point(start.x + (t * dx), start.y + (t * dy)))
+
     def get_initial_location(self, node_id, rel_direction):
         direction = constants.DIRECTION_FORWARD
         t = 0
@@ -40,10 +121,13 @@ class Straight:
 
         return StraightLocation(self, t, direction)
 
+    def get_location(self, distance, direction):
+        return StraightLocation(self, distance, direction)
+
     def get_offset(self, loc, offset):
         # Location must be from this track segment, otherwise it does not mean anything
-        if self.uuid != loc.track_uuid():
-            raise AssertionError(self.uuid + ' does not match provided ID ' + loc.track_uuid)
+        if loc.track is not self:
+            raise AssertionError(self.uuid + ' does not match provided ID ' + loc.track_uuid())
 
         length = self.length()
 
@@ -51,39 +135,32 @@ class Straight:
         if loc.direction == constants.DIRECTION_REVERSE:
             new_t = loc.t - offset
 
-        if new_t < 0:
-            relative_dir = constants.DIRECTION_TOWARD_NODE
-            remaining_offset = new_t
-
-            if loc.direction == constants.DIRECTION_REVERSE:
-                relative_dir = constants.DIRECTION_AWAY_FROM_NODE
-                remaining_offset = offset - loc.t
-
-            connecting_track = self.connections[self.startNode.uuid]
-            new_track_loc = connecting_track.get_initial_location(self.startNode.uuid, relative_dir)
-            return new_track_loc.get_offset(remaining_offset)
+        if new_t < 0 or new_t > length:
+            return self.get_route_offset(loc, offset)
 
-        if new_t > length:
-            relative_dir = constants.DIRECTION_AWAY_FROM_NODE
-            remaining_offset = new_t - length
-
-            if loc.direction == constants.DIRECTION_REVERSE:
-                relative_dir = constants.DIRECTION_TOWARD_NODE
-                remaining_offset = length - new_t
+        return StraightLocation(self, new_t, loc.direction)
 
-            connecting_track = self.connections[self.endNode.uuid]
-            new_track_loc = connecting_track.get_initial_location(self.endNode.uuid, relative_dir)
-            return new_track_loc.get_offset(remaining_offset)
+    def get_route_offset(self, loc, offset):
+        # Offsets that leave this segment are resolved in one lookup through the
+        # route index of the Track instead of walking connections one at a time
+        if self.layout is None:
+            raise AssertionError(self.uuid + ' is not part of a track')
+        return self.layout.get_route_index().get_offset(loc, offset)
 
-        return StraightLocation(self, new_t, loc.direction)
+    def get_geometry(self, tolerance=constants.CURVE_TOLERANCE):
+        # Imported here so segments can be used by the simulation without panda3d
+        from panda3d.core import Vec4, LineSegs
 
-    def get_geometry(self):
         segs = LineSegs()
         segs.setThickness(2.0)
         segs.setColor(Vec4(0, 1, 0, 1))
+        self.draw(segs, tolerance)
+        return segs.create(None)
+
+    def draw(self, segs, tolerance=constants.CURVE_TOLERANCE):
+        # Adds this segment to a LineSegs, so many segments can share one Geom
         segs.moveTo(self.startNode.point.x, self.startNode.point.y, self.startNode.height)
         segs.drawTo(self.endNode.point.x, self.endNode.point.y, self.endNode.height)
-        return segs.create(None)
 
     def to_string(self):
         string = 'Straight: ' + self.uuid + '\n'
@@ -97,7 +174,12 @@ class Straight:
 
 
 class StraightLocation(Location):
+    __slots__ = ('track', 't', 'direction')
+
     def __init__(self, track, t, direction):
+        if stats.enabled:
+            stats.count('locations_allocated')
+
         self.track = track
         self.t = t
         self.direction = direction
@@ -105,31 +187,22 @@ class StraightLocation(Location):
     def track_uuid(self):
         return self.track.uuid
 
-    def get_pos(self):
-        percent = self.t / self.track.length()
-
-        start_x = self.track.startNode.point.x
-        start_y = self.track.startNode.point.y
-
-        end_x = self.track.endNode.point.x
-        end_y = self.track.endNode.point.y
+    def track_id(self):
+        return self.track.id
 
-        x = start_x + ((end_x - start_x) * percent)
-        y = start_y + ((end_y - start_y) * percent)
-        return Point(x, y)
+    def get_pos(self):
+        direction_x, direction_y = self.track.get_unit_direction()
+        start = self.track.startNode.point
+        return Point(start.x + (direction_x * self.t), start.y + (direction_y * self.t))
 
     def get_height(self):
-        percent = self.t / self.track.length()
-
-        start_height = self.track.startNode.height
-        end_height = self.track.endNode.height
-
-        return start_height + ((end_height - start_height) * percent)
+        length = self.track.length()
+        if length == 0:
+            return self.track.startNode.height
+        return self.track.startNode.height + (self.track.get_height_delta() * (self.t / length))
 
     def get_h(self):
-        y = self.track.endNode.point.y - self.track.startNode.point.y
-        x = self.track.endNode.point.x - self.track.startNode.point.x
-        angle = math.atan2(y, x)
+        angle = self.track.get_heading()
 
         if self.direction == constants.DIRECTION_REVERSE:
             angle += math.pi
@@ -137,13 +210,15 @@ class StraightLocation(Location):
         return angle
 
     def get_slope(self):
-        dz = self.track.endNode.height - self.track.startNode.height
-        slope = math.atan2(dz, self.track.length())
+        slope = self.track.get_grade()
 
         if self.direction == constants.DIRECTION_REVERSE:
             slope = -slope
 
         return slope
 
+    def get_distance(self):
+        return self.t
+
     def get_offset(self, offset):
         return self.track.get_offset(self, offset)
@@ -0,0 +1,35 @@
+import src.util as util
+from src.geometry.convex_hull import ConvexHull
+
+
+class Section:
+    def __init__(self, points):
+        # A piece of benchwork. Its footprint is the convex hull of the given points.
+        self.uuid = util.gen_uuid()
+        self.hull = ConvexHull(points)
+        self.update_bounds()
+
+    def update_bounds(self):
+        self.min_x, self.min_y, self.max_x, self.max_y = self.hull.bounds()
+
+    def translate(self, dx, dy):
+        self.hull.translate(dx, dy)
+        self.min_x += dx
+        self.max_x += dx
+        self.min_y += dy
+        self.max_y += dy
+
+    def bounds_overlap(self, other):
+        return (self.min_x < other.max_x and other.min_x < self.max_x and
+                self.min_y < other.max_y and other.min_y < self.max_y)
+
+    def contains(self, point):
+        if point.x < self.min_x or point.x > self.max_x or point.y < self.min_y or point.y > self.max_y:
+            return False
+        return self.hull.contains(point)
+
+    def overlaps(self, other):
+        return self.bounds_overlap(other) and self.hull.overlaps(other.hull)
+
+    def to_string(self):
+        return 'Section ' + self.uuid + ': ' + ', '.join(p.to_string() for p in self.hull.points)
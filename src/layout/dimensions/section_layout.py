@@ -0,0 +1,105 @@
+import bisect
+
+
+class SectionLayout:
+    def __init__(self, sections=None):
+        # Sections kept sorted by the left edge of their bounding box, so that the
+        # sections that could overlap a given x range are found with a bisect
+        # (sweep and prune along x), and only those get the exact hull test.
+        self.sections = {}
+        self.sweep_keys = []
+        self.sweep_ids = []
+        self.max_width = 0
+
+        # Ids of the sections overlapping each section
+        self.overlapping = {}
+
+        for section in sections or []:
+            self.add_section(section)
+
+    def add_section(self, section):
+        self.sections[section.uuid] = section
+        self.overlapping[section.uuid] = set()
+        self.insert_sweep(section)
+        self.update_overlaps(section)
+
+    def remove_section(self, section):
+        self.clear_overlaps(section)
+        self.remove_sweep(section)
+        del self.sections[section.uuid]
+        del self.overlapping[section.uuid]
+
+    def move_section(self, section, dx, dy):
+        # Only pairs involving the moved section are re-tested
+        self.clear_overlaps(section)
+        self.remove_sweep(section)
+        section.translate(dx, dy)
+        self.insert_sweep(section)
+        self.update_overlaps(section)
+
+    def insert_sweep(self, section):
+        i = bisect.bisect_right(self.sweep_keys, section.min_x)
+        self.sweep_keys.insert(i, section.min_x)
+        self.sweep_ids.insert(i, section.uuid)
+        self.max_width = max(self.max_width, section.max_x - section.min_x)
+
+    def remove_sweep(self, section):
+        i = bisect.bisect_left(self.sweep_keys, section.min_x)
+        while self.sweep_ids[i] != section.uuid:
+            i += 1
+        del self.sweep_keys[i]
+        del self.sweep_ids[i]
+
+    def get_candidates(self, min_x, max_x):
+        # Every section whose bounding box could reach into [min_x, max_x]
+        start = bisect.bisect_left(self.sweep_keys, min_x - self.max_width)
+        end = bisect.bisect_right(self.sweep_keys, max_x)
+        for uuid in self.sweep_ids[start:end]:
+            section = self.sections[uuid]
+            if section.max_x >= min_x:
+                yield section
+
+    def clear_overlaps(self, section):
+        for uuid in self.overlapping[section.uuid]:
+            self.overlapping[uuid].discard(section.uuid)
+        self.overlapping[section.uuid] = set()
+
+    def update_overlaps(self, section):
+        for other in self.get_candidates(section.min_x, section.max_x):
+            if other.uuid != section.uuid and section.overlaps(other):
+                self.overlapping[section.uuid].add(other.uuid)
+                self.overlapping[other.uuid].add(section.uuid)
+
+    def check_all(self):
+        # Full sweep over every section, only needed if sections were changed
+        # without going through this layout
+        sweep = sorted((section.min_x, section.uuid) for section in self.sections.values())
+        self.sweep_keys = [key for key, _ in sweep]
+        self.sweep_ids = [uuid for _, uuid in sweep]
+        self.max_width = max([s.max_x - s.min_x for s in self.sections.values()], default=0)
+        self.overlapping = {uuid: set() for uuid in self.sections}
+
+        active = []
+        for uuid in self.sweep_ids:
+            section = self.sections[uuid]
+            active = [other for other in active if other.max_x > section.min_x]
+            for other in active:
+                if section.overlaps(other):
+                    self.overlapping[section.uuid].add(other.uuid)
+                    self.overlapping[other.uuid].add(section.uuid)
+            active.append(section)
+
+    def get_overlaps(self):
+        # Every overlapping pair of sections, once each
+        pairs = []
+        for uuid, others in self.overlapping.items():
+            for other in others:
+                if uuid < other:
+                    pairs.append((self.sections[uuid], self.sections[other]))
+        return pairs
+
+    def get_overlapping(self, section):
+        return [self.sections[uuid] for uuid in self.overlapping[section.uuid]]
+
+    def get_sections_at(self, point):
+        return [section for section in self.get_candidates(point.x, point.x) if section.contains(point)]
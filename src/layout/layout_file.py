@@ -0,0 +1,376 @@
+import json
+import mmap
+import struct
+
+import numpy as np
+
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+from src.layout.components.spline import Spline
+from src.layout.components.straight import Straight
+from src.layout.segment_table import SegmentTable, KIND_STRAIGHT, KIND_CURVE, KIND_SPLINE
+from src.layout.track import Track
+
+
+MAGIC = b'PRLY'
+VERSION = 2
+
+# Columns added after the first version, with the version that added them.
+# Older files are read with these columns left as zeros.
+COLUMN_VERSIONS = {
+    'control1_x': 2,
+    'control1_y': 2,
+    'control2_x': 2,
+    'control2_y': 2,
+}
+
+# magic, version, node count, segment count, padded to 32 bytes
+HEADER = struct.Struct('<4sIQQ8x')
+
+# Every column is a contiguous little-endian array, in this order, each
+# starting on an 8 byte boundary. Uuids are stored as their 16 raw bytes.
+# Curve columns are only used by curves and control columns only by splines.
+NODE_COLUMNS = [
+    ('uuid', 'V16'),
+    ('x', '<f8'),
+    ('y', '<f8'),
+    ('height', '<f8'),
+]
+
+SEGMENT_COLUMNS = [
+    ('uuid', 'V16'),
+    ('kind', 'u1'),
+    ('start_node', '<u4'),
+    ('end_node', '<u4'),
+    ('center_x', '<f8'),
+    ('center_y', '<f8'),
+    ('radius', '<f8'),
+    ('start_angle', '<f8'),
+    ('end_angle', '<f8'),
+    ('control1_x', '<f8'),
+    ('control1_y', '<f8'),
+    ('control2_x', '<f8'),
+    ('control2_y', '<f8'),
+    # Connected segment and the end of it we enter through, for each end, or -1
+    ('next_segment_start', '<i8'),
+    ('next_end_start', '<i1'),
+    ('next_segment_end', '<i8'),
+    ('next_end_end', '<i1'),
+]
+
+
+def get_columns(columns, version):
+    return [(name, dtype) for name, dtype in columns if COLUMN_VERSIONS.get(name, 1) <= version]
+
+
+def get_column_offsets(node_count, segment_count, version=VERSION):
+    offsets = {}
+    offset = HEADER.size
+    for prefix, columns, count in [('node', NODE_COLUMNS, node_count), ('segment', SEGMENT_COLUMNS, segment_count)]:
+        for name, dtype in get_columns(columns, version):
+            offsets[prefix + '_' + name] = offset
+            offset += np.dtype(dtype).itemsize * count
+            offset = (offset + 7) & ~7
+    return offsets, offset
+
+
+def write_layout(path, track):
+    # Rows are in id order, so the transition table is written as it is
+    nodes = track.node_list
+    segments = track.segment_list
+
+    columns = {
+        'node_uuid': [bytes.fromhex(node.uuid) for node in nodes],
+        'node_x': [node.point.x for node in nodes],
+        'node_y': [node.point.y for node in nodes],
+        'node_height': [node.height for node in nodes],
+    }
+
+    for name, dtype in SEGMENT_COLUMNS:
+        columns['segment_' + name] = []
+
+    for segment in segments:
+        is_curve = isinstance(segment, Curve)
+        is_spline = isinstance(segment, Spline)
+        kind = KIND_STRAIGHT
+        if is_curve:
+            kind = KIND_CURVE
+        elif is_spline:
+            kind = KIND_SPLINE
+
+        columns['segment_uuid'].append(bytes.fromhex(segment.uuid))
+        columns['segment_kind'].append(kind)
+        columns['segment_start_node'].append(segment.startNode.id)
+        columns['segment_end_node'].append(segment.endNode.id)
+        columns['segment_center_x'].append(segment.center.x if is_curve else 0)
+        columns['segment_center_y'].append(segment.center.y if is_curve else 0)
+        columns['segment_radius'].append(segment.radius if is_curve else 0)
+        columns['segment_start_angle'].append(segment.startAngle if is_curve else 0)
+        columns['segment_end_angle'].append(segment.endAngle if is_curve else 0)
+        columns['segment_control1_x'].append(segment.control1.x if is_spline else 0)
+        columns['segment_control1_y'].append(segment.control1.y if is_spline else 0)
+        columns['segment_control2_x'].append(segment.control2.x if is_spline else 0)
+        columns['segment_control2_y'].append(segment.control2.y if is_spline else 0)
+
+        for end, end_name in enumerate(['start', 'end']):
+            next_segment, next_end, _ = track.get_transition(segment.id, end)
+            columns['segment_next_segment_' + end_name].append(next_segment)
+            columns['segment_next_end_' + end_name].append(next_end)
+
+    offsets, size = get_column_offsets(len(nodes), len(segments))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(nodes), len(segments)))
+        for prefix, column_spec in [('node', NODE_COLUMNS), ('segment', SEGMENT_COLUMNS)]:
+            for name, dtype in column_spec:
+                key = prefix + '_' + name
+                f.write(b'\0' * (offsets[key] - f.tell()))
+                f.write(np.array(columns[key], dtype=dtype).tobytes())
+        f.write(b'\0' * (size - f.tell()))
+
+
+class LayoutFile:
+    def __init__(self, path):
+        # Memory maps a layout written by write_layout. Columns are NumPy views
+        # straight onto the file, and Nodes and segments are only built when
+        # they are asked for.
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.node_count, self.segment_count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise AssertionError(path + ' is not a layout file')
+        if version < 1 or version > VERSION:
+            raise AssertionError('Unsupported layout file version ' + str(version))
+
+        offsets, size = get_column_offsets(self.node_count, self.segment_count, version)
+        if len(self.map) < size:
+            raise AssertionError(path + ' is truncated')
+
+        self.columns = {}
+        for prefix, column_spec, count in [('node', NODE_COLUMNS, self.node_count),
+                                           ('segment', SEGMENT_COLUMNS, self.segment_count)]:
+            for name, dtype in column_spec:
+                key = prefix + '_' + name
+                if key in offsets:
+                    self.columns[key] = np.frombuffer(self.map, dtype=dtype, count=count, offset=offsets[key])
+                else:
+                    self.columns[key] = np.zeros(count, dtype=dtype)
+
+        self.nodes = {}
+        self.segments = {}
+        self.connected = set()
+        self.segment_index = None
+        self.route_index = None
+
+    def close(self):
+        # Column views must not be used after closing
+        self.columns = {}
+        self.route_index = None
+        self.map.close()
+        self.file.close()
+
+    def get_node(self, i):
+        if i not in self.nodes:
+            node = Node(Point(float(self.columns['node_x'][i]), float(self.columns['node_y'][i])),
+                        float(self.columns['node_height'][i]))
+            node.uuid = self.columns['node_uuid'][i].tobytes().hex()
+            node.id = i
+            self.nodes[i] = node
+        return self.nodes[i]
+
+    def build_segment(self, i):
+        if i in self.segments:
+            return self.segments[i]
+
+        columns = self.columns
+        start = self.get_node(int(columns['segment_start_node'][i]))
+        end = self.get_node(int(columns['segment_end_node'][i]))
+
+        if columns['segment_kind'][i] == KIND_CURVE:
+            center = Point(float(columns['segment_center_x'][i]), float(columns['segment_center_y'][i]))
+            segment = Curve(center, float(columns['segment_radius'][i]), float(columns['segment_start_angle'][i]),
+                            float(columns['segment_end_angle'][i]), start, end)
+        elif columns['segment_kind'][i] == KIND_SPLINE:
+            control1 = Point(float(columns['segment_control1_x'][i]), float(columns['segment_control1_y'][i]))
+            control2 = Point(float(columns['segment_control2_x'][i]), float(columns['segment_control2_y'][i]))
+            segment = Spline(control1, control2, start, end)
+        else:
+            segment = Straight(start, end)
+
+        segment.uuid = columns['segment_uuid'][i].tobytes().hex()
+        segment.id = i
+        segment.layout = self
+        self.segments[i] = segment
+        return segment
+
+    def get_segment(self, i):
+        # The segment with its connections filled in. Connected segments are
+        # built too, but their own connections wait until they are asked for.
+        segment = self.build_segment(i)
+        if i not in self.connected:
+            for end_name, node in [('start', segment.startNode), ('end', segment.endNode)]:
+                next_segment = int(self.columns['segment_next_segment_' + end_name][i])
+                if next_segment >= 0:
+                    segment.add_connection(node.uuid, self.build_segment(next_segment))
+            self.connected.add(i)
+        return segment
+
+    def get_route_index(self):
+        # Built segments move past their ends through the file's transition
+        # columns, the way segments of a Track go through its RouteIndex
+        if self.route_index is None:
+            self.route_index = FileRouteIndex(self.get_segment_table())
+        return self.route_index
+
+    def segment_changed(self, segment):
+        # Built segments are read-only views of the file. A layout is edited
+        # through to_track, whose segments take over from these.
+        raise AssertionError(segment.uuid + ' is read from a layout file and cannot be changed')
+
+    def find_segment(self, uuid):
+        if self.segment_index is None:
+            uuids = self.columns['segment_uuid']
+            self.segment_index = {uuids[i].tobytes().hex(): i for i in range(self.segment_count)}
+        return self.segment_index[uuid]
+
+    def to_track(self):
+        # Builds every object, for layouts small enough to edit as a whole
+        nodes = [self.get_node(i) for i in range(self.node_count)]
+        segments = [self.build_segment(i) for i in range(self.segment_count)]
+        return Track(nodes, segments)
+
+    def get_segment_table(self):
+        # SegmentTable filled directly from the columns, without building segments
+        # other than splines, whose arc length tables are not stored
+        columns = self.columns
+        start = columns['segment_start_node'].astype(np.int64)
+        end = columns['segment_end_node'].astype(np.int64)
+        is_curve = columns['segment_kind'] == KIND_CURVE
+
+        table = SegmentTable()
+        table.segments = LazySegments(self)
+        table.index_by_uuid = LazySegmentIndex(self)
+
+        table.kind = columns['segment_kind'].astype(np.int8)
+        table.start_x = columns['node_x'][start]
+        table.start_y = columns['node_y'][start]
+        table.start_z = columns['node_height'][start]
+        table.end_x = columns['node_x'][end]
+        table.end_y = columns['node_y'][end]
+        table.end_z = columns['node_height'][end]
+
+        table.center_x = columns['segment_center_x'].copy()
+        table.center_y = columns['segment_center_y'].copy()
+        table.radius = np.where(is_curve, columns['segment_radius'], 1.0)
+        table.start_angle = columns['segment_start_angle'].copy()
+        table.end_angle = columns['segment_end_angle'].copy()
+
+        straight_length = np.hypot(table.end_x - table.start_x, table.end_y - table.start_y)
+        curve_length = (table.end_angle - table.start_angle) * table.radius
+        table.length = np.where(is_curve, curve_length, straight_length)
+
+        table.next_segment = np.stack([columns['segment_next_segment_start'], columns['segment_next_segment_end']], axis=1)
+        table.next_end = np.stack([columns['segment_next_end_start'], columns['segment_next_end_end']], axis=1).astype(np.int8)
+
+        splines = np.nonzero(columns['segment_kind'] == KIND_SPLINE)[0]
+        if len(splines) > 0:
+            table.spline_first = np.zeros(self.segment_count, dtype=np.int64)
+            table.spline_last = np.zeros(self.segment_count, dtype=np.int64)
+            table.spline_base = np.zeros(self.segment_count)
+            table.set_splines([(int(i), self.build_segment(int(i))) for i in splines])
+        return table
+
+
+class FileRouteIndex:
+    def __init__(self, table):
+        # Offsets of locations on segments built from a LayoutFile, found with
+        # the SegmentTable filled from the file
+        self.table = table
+
+    def get_offset(self, loc, offset):
+        table = self.table
+        return table.to_location(*table.locate(*table.from_location(loc), offset))
+
+
+class LazySegments:
+    def __init__(self, layout_file):
+        self.layout_file = layout_file
+
+    def __len__(self):
+        return self.layout_file.segment_count
+
+    def __getitem__(self, i):
+        return self.layout_file.get_segment(i)
+
+
+class LazySegmentIndex:
+    def __init__(self, layout_file):
+        self.layout_file = layout_file
+
+    def __getitem__(self, uuid):
+        return self.layout_file.find_segment(uuid)
+
+
+def export_json(path, track):
+    nodes = []
+    for node in track.nodes.values():
+        nodes.append({'uuid': node.uuid, 'x': node.point.x, 'y': node.point.y, 'height': node.height})
+
+    segments = []
+    for segment in track.tracks.values():
+        data = {
+            'uuid': segment.uuid,
+            'type': 'straight',
+            'start': segment.startNode.uuid,
+            'end': segment.endNode.uuid,
+        }
+        if isinstance(segment, Curve):
+            data['type'] = 'curve'
+            data['center'] = [segment.center.x, segment.center.y]
+            data['radius'] = segment.radius
+            data['startAngle'] = segment.startAngle
+            data['endAngle'] = segment.endAngle
+        elif isinstance(segment, Spline):
+            data['type'] = 'spline'
+            data['control1'] = [segment.control1.x, segment.control1.y]
+            data['control2'] = [segment.control2.x, segment.control2.y]
+        segments.append(data)
+
+    with open(path, 'w') as f:
+        json.dump({'version': VERSION, 'nodes': nodes, 'segments': segments}, f, indent=2)
+
+
+def import_json(path):
+    with open(path) as f:
+        data = json.load(f)
+
+    if data.get('version') not in range(1, VERSION + 1):
+        raise AssertionError('Unsupported layout version ' + str(data.get('version')))
+
+    nodes = {}
+    for node_data in data['nodes']:
+        node = Node(Point(node_data['x'], node_data['y']), node_data['height'])
+        node.uuid = node_data['uuid']
+        nodes[node.uuid] = node
+
+    segments = []
+    for segment_data in data['segments']:
+        start = nodes[segment_data['start']]
+        end = nodes[segment_data['end']]
+
+        if segment_data['type'] == 'curve':
+            center = Point(*segment_data['center'])
+            segment = Curve(center, segment_data['radius'], segment_data['startAngle'], segment_data['endAngle'], start, end)
+        elif segment_data['type'] == 'spline':
+            segment = Spline(Point(*segment_data['control1']), Point(*segment_data['control2']), start, end)
+        elif segment_data['type'] == 'straight':
+            segment = Straight(start, end)
+        else:
+            raise AssertionError('Unknown segment type ' + segment_data['type'])
+
+        segment.uuid = segment_data['uuid']
+        segments.append(segment)
+
+    return Track(list(nodes.values()), segments)
@@ -0,0 +1,202 @@
+import bisect
+import itertools
+
+import src.constants as constants
+import src.stats as stats
+
+
+class RouteChain:
+    def __init__(self, segments, orientations, is_loop):
+        # A run of segments joined end to end. Orientation is 1 when the chain
+        # passes through the segment from its start node to its end node and -1
+        # when it passes through it backwards.
+        self.segments = segments
+        self.orientations = orientations
+        self.is_loop = is_loop
+
+        self.lengths = [segment.length() for segment in segments]
+        self.update_starts()
+
+    def update_starts(self):
+        # starts[i] is the arc length from the beginning of the chain to segment i
+        self.starts = [0.0] + list(itertools.accumulate(self.lengths))
+        self.total_length = self.starts.pop()
+
+    def is_unchanged(self, track, i):
+        # Whether segment i still leads to the same neighbours at both ends, so
+        # only its length can have changed
+        segment = self.segments[i]
+        orientation = self.orientations[i]
+        last = len(self.segments) - 1
+
+        expected = None
+        if i < last:
+            expected = (self.segments[i + 1], self.orientations[i + 1])
+        elif self.is_loop:
+            expected = (self.segments[0], self.orientations[0])
+        if next_in_chain(track, segment, orientation) != (expected or (None, 0)):
+            return False
+
+        expected = None
+        if i > 0:
+            expected = (self.segments[i - 1], -self.orientations[i - 1])
+        elif self.is_loop:
+            expected = (self.segments[last], -self.orientations[last])
+        return next_in_chain(track, segment, -orientation) == (expected or (None, 0))
+
+
+class RouteIndex:
+    def __init__(self, track):
+        self.chains = []
+
+        # (chain, index within the chain) for every segment id, and the same
+        # tuples by uuid so update can find segments whose id has changed
+        self.positions = [None] * len(track.segment_list)
+        self.positions_by_uuid = {}
+
+        for segment in track.segment_list:
+            if self.positions[segment.id] is None:
+                self.add_chain(build_chain(track, segment))
+
+    def add_chain(self, chain):
+        self.chains.append(chain)
+        for i, segment in enumerate(chain.segments):
+            position = (chain, i)
+            self.positions[segment.id] = position
+            self.positions_by_uuid[segment.uuid] = position
+
+    def update(self, track, changes):
+        # Catches up with the segments returned by Track.get_changes. Chains
+        # whose changed segments kept their neighbours only have their lengths
+        # refreshed, chains with a segment added, removed, renumbered or
+        # reconnected are built again, and every other chain is left alone.
+        n = len(track.segment_list)
+        del self.positions[n:]
+        self.positions.extend([None] * (n - len(self.positions)))
+
+        rebuild = {}
+        refresh = {}
+        seeds = []
+        for segment in changes:
+            position = self.positions_by_uuid.get(segment.uuid)
+            if position is None:
+                if segment.layout is track:
+                    seeds.append(segment)
+                continue
+
+            chain, i = position
+            if segment.layout is not track or self.positions[segment.id] is not position:
+                rebuild[id(chain)] = chain
+            elif chain.is_unchanged(track, i):
+                refresh.setdefault(id(chain), (chain, []))[1].append(i)
+            else:
+                rebuild[id(chain)] = chain
+
+        for key, (chain, indices) in refresh.items():
+            if key not in rebuild:
+                for i in indices:
+                    chain.lengths[i] = chain.segments[i].length()
+                chain.update_starts()
+
+        for chain in rebuild.values():
+            self.chains.remove(chain)
+            for segment in chain.segments:
+                del self.positions_by_uuid[segment.uuid]
+                if segment.layout is track:
+                    self.positions[segment.id] = None
+                    seeds.append(segment)
+
+        for segment in seeds:
+            if segment.uuid not in self.positions_by_uuid:
+                self.add_chain(build_chain(track, segment))
+
+    def get_chain_position(self, loc):
+        # Arc length of the location along its chain, and which way a positive
+        # offset moves along the chain (1 or -1)
+        chain, i = self.positions[loc.track_id()]
+
+        segment = chain.segments[i]
+        orientation = chain.orientations[i]
+
+        distance = loc.get_distance()
+        if orientation < 0:
+            distance = segment.length() - distance
+
+        travel = orientation
+        if loc.direction == constants.DIRECTION_REVERSE:
+            travel = -orientation
+
+        return chain, chain.starts[i] + distance, travel
+
+    def get_offset(self, loc, offset):
+        if stats.enabled:
+            stats.count('route_lookups')
+
+        chain, position, travel = self.get_chain_position(loc)
+        position += travel * offset
+
+        if chain.is_loop:
+            position %= chain.total_length
+        elif position < 0 or position > chain.total_length:
+            raise AssertionError('Offset runs past the end of the track')
+
+        i = bisect.bisect_right(chain.starts, position) - 1
+        i = min(max(i, 0), len(chain.segments) - 1)
+
+        segment = chain.segments[i]
+        orientation = chain.orientations[i]
+
+        distance = position - chain.starts[i]
+        if orientation < 0:
+            distance = segment.length() - distance
+
+        direction = constants.DIRECTION_FORWARD
+        if travel * orientation < 0:
+            direction = constants.DIRECTION_REVERSE
+
+        return segment.get_location(distance, direction)
+
+
+def next_in_chain(track, segment, orientation):
+    end = constants.END_END if orientation > 0 else constants.END_START
+    next_segment, next_end, _ = track.get_transition(segment.id, end)
+    if next_segment < 0:
+        return None, 0
+
+    if next_end == constants.END_START:
+        return track.segment_list[next_segment], 1
+    return track.segment_list[next_segment], -1
+
+
+def walk_chain(track, segment, orientation):
+    # Follows connections away from the given segment until the track ends or
+    # loops back around. Returns the segments passed, not including the first.
+    visited = {segment.id}
+    segments = []
+    orientations = []
+
+    current, current_orientation = next_in_chain(track, segment, orientation)
+    while current is not None:
+        if current.id in visited:
+            return segments, orientations, current is segment
+
+        visited.add(current.id)
+        segments.append(current)
+        orientations.append(current_orientation)
+        current, current_orientation = next_in_chain(track, current, current_orientation)
+
+    return segments, orientations, False
+
+
+def build_chain(track, segment):
+    before, before_orientations, is_loop = walk_chain(track, segment, -1)
+    if is_loop:
+        after, after_orientations, _ = walk_chain(track, segment, 1)
+        return RouteChain([segment] + after, [1] + after_orientations, True)
+
+    after, after_orientations, _ = walk_chain(track, segment, 1)
+
+    # Walking backwards reverses the orientation of every segment passed
+    segments = list(reversed(before)) + [segment] + after
+    orientations = [-o for o in reversed(before_orientations)] + [1] + after_orientations
+    return RouteChain(segments, orientations, False)
@@ -0,0 +1,305 @@
+import heapq
+import math
+from collections import OrderedDict
+
+import src.constants as constants
+
+
+class Route:
+    def __init__(self, steps, distance):
+        # steps is a list of (segment id, direction) from the starting segment to
+        # the target segment, distance is how far there is to travel to reach
+        # the start of the target segment
+        self.steps = steps
+        self.distance = distance
+
+    def segments(self):
+        return [segment for segment, _ in self.steps]
+
+
+class RoutePlanner:
+    def __init__(self, track, landmark_count=4, max_cached_targets=64):
+        # Directed graph over segment ends. Each state is a segment together with
+        # the direction it is travelled in, numbered 2 * segment id + direction,
+        # and an edge leads out through the far end to every other segment end
+        # at that node, weighted by the length of the segment being left.
+        #
+        # Track.get_route_planner calls update after edits, which rebuilds only
+        # the edges around changed segments and drops only the cached trees and
+        # landmarks the edit could have changed.
+        self.track = track
+        self.max_cached_targets = max_cached_targets
+        self.landmark_count = landmark_count
+
+        n = 2 * len(track.segment_list)
+        self.lengths = [segment.length() for segment in track.segment_list]
+        self.successors = [[] for _ in range(n)]
+        self.predecessors = [[] for _ in range(n)]
+
+        for state in range(n):
+            self.add_edges(state)
+
+        # Shortest path trees towards recently requested targets, least recently
+        # used first. Any number of trains heading to a cached target are routed
+        # by following the tree without searching.
+        self.trees = OrderedDict()
+
+        self.landmarks = []
+        self.landmark_from = []
+        self.landmark_to = []
+        self.landmarks_stale = False
+        self.choose_landmarks(landmark_count)
+
+    def add_edges(self, state):
+        segment, direction = divmod(state, 2)
+        end = constants.END_END if direction == constants.DIRECTION_FORWARD else constants.END_START
+        track_segment = self.track.segment_list[segment]
+        node = track_segment.endNode if end == constants.END_END else track_segment.startNode
+        weight = self.lengths[segment]
+
+        for other, other_end in self.track.ends_by_node[node.id]:
+            if other == segment:
+                continue
+
+            other_direction = constants.DIRECTION_FORWARD
+            if other_end == constants.END_END:
+                other_direction = constants.DIRECTION_REVERSE
+
+            next_state = (2 * other) + other_direction
+            self.successors[state].append((next_state, weight))
+            self.predecessors[next_state].append((state, weight))
+
+    def update(self, changes):
+        # Catches up with the segments returned by Track.get_changes. The edges
+        # leaving every segment at the nodes of a changed one are built again,
+        # along with those of states whose segment id no longer exists.
+        track = self.track
+        n = 2 * len(track.segment_list)
+        old_n = len(self.successors)
+
+        segments = set()
+        for segment in changes:
+            if segment.layout is track:
+                for node in [segment.startNode, segment.endNode]:
+                    segments.update(other for other, _ in track.ends_by_node[node.id])
+
+        affected = set(range(n, old_n))
+        for segment in segments:
+            affected.update([2 * segment, (2 * segment) + 1])
+
+        for state in affected:
+            if state < old_n:
+                for next_state, weight in self.successors[state]:
+                    self.predecessors[next_state].remove((state, weight))
+                self.successors[state] = []
+
+        del self.successors[n:]
+        del self.predecessors[n:]
+        del self.lengths[n // 2:]
+        self.successors.extend([] for _ in range(n - len(self.successors)))
+        self.predecessors.extend([] for _ in range(n - len(self.predecessors)))
+        self.lengths.extend([0] * ((n // 2) - len(self.lengths)))
+
+        for segment in segments:
+            self.lengths[segment] = track.segment_list[segment].length()
+        for state in affected:
+            if state < n:
+                self.add_edges(state)
+
+        # A tree or landmark search is only unchanged if it never reached any
+        # state whose edges were rebuilt, and cannot reach one now
+        if n != old_n:
+            self.trees.clear()
+        else:
+            for target in list(self.trees):
+                if not self.is_unaffected(self.trees[target][0], affected):
+                    del self.trees[target]
+
+        if n != old_n or not all(self.is_unaffected(to_landmark, affected) for to_landmark in self.landmark_to) or \
+                any(from_landmark[state] < math.inf for from_landmark in self.landmark_from for state in affected):
+            self.landmarks = []
+            self.landmark_from = []
+            self.landmark_to = []
+            self.landmarks_stale = True
+
+    def is_unaffected(self, distances, affected):
+        # Whether a backwards search, giving the distance from every state to
+        # its sources, reached none of the affected states and still would not
+        for state in affected:
+            if distances[state] < math.inf:
+                return False
+            for next_state, _ in self.successors[state]:
+                if distances[next_state] < math.inf:
+                    return False
+        return True
+
+    def choose_landmarks(self, count):
+        # Landmarks are spread out by repeatedly picking the state furthest from
+        # the ones chosen so far. Distances to and from each give the lower
+        # bounds used by find_route_astar.
+        n = len(self.successors)
+        if n == 0:
+            return
+
+        closest = [math.inf] * n
+        landmark = 0
+        for _ in range(min(count, n)):
+            self.landmarks.append(landmark)
+            from_landmark = dijkstra(self.successors, [landmark])[0]
+            self.landmark_from.append(from_landmark)
+            self.landmark_to.append(dijkstra(self.predecessors, [landmark])[0])
+
+            for state in range(n):
+                closest[state] = min(closest[state], from_landmark[state])
+
+            reachable = [state for state in range(n) if closest[state] < math.inf]
+            landmark = max(reachable, key=lambda state: closest[state])
+            if closest[landmark] == 0:
+                break
+
+    def get_tree(self, target):
+        # Distance from every state to the start of the target segment and the
+        # next state along the shortest path, from one search backwards
+        if target in self.trees:
+            self.trees.move_to_end(target)
+            return self.trees[target]
+
+        tree = dijkstra(self.predecessors, target_states(target))
+        self.trees[target] = tree
+        if len(self.trees) > self.max_cached_targets:
+            self.trees.popitem(last=False)
+        return tree
+
+    def find_route(self, segment, direction, target):
+        # Shortest route from the start of a segment, travelled in the given
+        # direction, to the target segment. Returns None if it cannot be reached.
+        distances, next_states = self.get_tree(target)
+
+        state = state_for(segment, direction)
+        distance = distances[state]
+        if distance == math.inf:
+            return None
+
+        steps = [(segment, direction)]
+        while state // 2 != target:
+            state = next_states[state]
+            steps.append(divmod(state, 2))
+
+        return Route(steps, distance)
+
+    def get_distance(self, segment, direction, target):
+        # Only the distance of the shortest route, without building the route
+        return self.get_tree(target)[0][state_for(segment, direction)]
+
+    def get_next_step(self, segment, direction, target):
+        # (segment, direction) to continue into from the far end of the segment,
+        # or None if the segment is the target or the target cannot be reached
+        distances, next_states = self.get_tree(target)
+        state = state_for(segment, direction)
+        if segment == target or distances[state] == math.inf:
+            return None
+        return divmod(next_states[state], 2)
+
+    def find_route_from_location(self, loc, target):
+        # The same as find_route, with the distance measured from the location
+        route = self.find_route(loc.track_id(), loc.direction, target)
+        if route is None:
+            return None
+
+        travelled = loc.get_distance()
+        if loc.direction == constants.DIRECTION_REVERSE:
+            travelled = self.lengths[loc.track_id()] - travelled
+
+        if len(route.steps) > 1:
+            route.distance -= travelled
+        return route
+
+    def find_routes(self, starts, target):
+        # Routes for many (segment, direction) starts heading to one target,
+        # sharing a single search
+        return [self.find_route(segment, direction, target) for segment, direction in starts]
+
+    def heuristic(self, state, target):
+        # Lower bound on the distance from the state to the target segment, from
+        # the triangle inequality through each landmark
+        bounds = []
+        for target_state in target_states(target):
+            bound = 0
+            for from_landmark, to_landmark in zip(self.landmark_from, self.landmark_to):
+                if from_landmark[state] < math.inf and from_landmark[target_state] < math.inf:
+                    bound = max(bound, from_landmark[target_state] - from_landmark[state])
+                if to_landmark[state] < math.inf and to_landmark[target_state] < math.inf:
+                    bound = max(bound, to_landmark[state] - to_landmark[target_state])
+            bounds.append(bound)
+        return min(bounds)
+
+    def find_route_astar(self, segment, direction, target):
+        # One-off search that does not build or use a cached tree, for targets
+        # that are unlikely to be asked for again
+        if self.landmarks_stale:
+            self.landmarks_stale = False
+            self.choose_landmarks(self.landmark_count)
+
+        start = state_for(segment, direction)
+        targets = set(target_states(target))
+
+        distances = {start: 0}
+        previous = {start: None}
+        heap = [(self.heuristic(start, target), 0, start)]
+
+        while len(heap) > 0:
+            _, distance, state = heapq.heappop(heap)
+            if distance > distances[state]:
+                continue
+
+            if state in targets:
+                steps = []
+                while state is not None:
+                    steps.append(divmod(state, 2))
+                    state = previous[state]
+                return Route(list(reversed(steps)), distance)
+
+            for next_state, weight in self.successors[state]:
+                next_distance = distance + weight
+                if next_distance < distances.get(next_state, math.inf):
+                    distances[next_state] = next_distance
+                    previous[next_state] = state
+                    heapq.heappush(heap, (next_distance + self.heuristic(next_state, target), next_distance, next_state))
+
+        return None
+
+
+def state_for(segment, direction):
+    return (2 * segment) + direction
+
+
+def target_states(target):
+    return [state_for(target, constants.DIRECTION_FORWARD), state_for(target, constants.DIRECTION_REVERSE)]
+
+
+def dijkstra(edges, sources):
+    # Distances from the nearest source along the given adjacency lists, and for
+    # every state the neighbour it was reached from
+    n = len(edges)
+    distances = [math.inf] * n
+    previous = [-1] * n
+
+    heap = []
+    for source in sources:
+        distances[source] = 0
+        heap.append((0, source))
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        distance, state = heapq.heappop(heap)
+        if distance > distances[state]:
+            continue
+
+        for next_state, weight in edges[state]:
+            next_distance = distance + weight
+            if next_distance < distances[next_state]:
+                distances[next_state] = next_distance
+                previous[next_state] = state
+                heapq.heappush(heap, (next_distance, next_state))
+
+    return distances, previous
@@ -0,0 +1,368 @@
+import numpy as np
+
+import src.constants as constants
+import src.stats as stats
+from src.layout.components.curve import Curve
+from src.layout.components.spline import Spline
+
+
+KIND_STRAIGHT = 0
+KIND_CURVE = 1
+KIND_SPLINE = 2
+
+END_START = constants.END_START
+END_END = constants.END_END
+
+
+# Arrays with one row per segment
+ROW_ARRAY_NAMES = [
+    'kind', 'length',
+    'start_x', 'start_y', 'start_z', 'end_x', 'end_y', 'end_z',
+    'center_x', 'center_y', 'radius', 'start_angle', 'end_angle',
+    'next_segment', 'next_end',
+    'spline_first', 'spline_last', 'spline_base',
+]
+
+# Arc length tables of every spline, one after another
+SPLINE_TABLE_NAMES = ['spline_s', 'spline_x', 'spline_y', 'spline_h']
+
+# Every array, as copied between processes by get_arrays
+ARRAY_NAMES = ROW_ARRAY_NAMES + SPLINE_TABLE_NAMES
+
+
+class SegmentTable:
+    def __init__(self, track=None):
+        # Struct-of-arrays copy of every segment in a Track, so that many
+        # locations can be moved and evaluated at once with NumPy instead
+        # of walking Location objects one at a time. Without a track the table
+        # is left empty for the caller to fill in (see LayoutFile).
+        self.segments = []
+        self.index_by_uuid = {}
+        self.allocate(0)
+
+        if track is not None:
+            self.fill(track)
+
+    def allocate(self, n):
+        self.kind = np.zeros(n, dtype=np.int8)
+        self.length = np.zeros(n)
+
+        self.start_x = np.zeros(n)
+        self.start_y = np.zeros(n)
+        self.start_z = np.zeros(n)
+        self.end_x = np.zeros(n)
+        self.end_y = np.zeros(n)
+        self.end_z = np.zeros(n)
+
+        self.center_x = np.zeros(n)
+        self.center_y = np.zeros(n)
+        self.radius = np.ones(n)
+        self.start_angle = np.zeros(n)
+        self.end_angle = np.zeros(n)
+
+        # For each segment and each end (start, end): the index of the connecting
+        # segment and which of its ends we enter through, or -1 if nothing is connected
+        self.next_segment = np.full((n, 2), -1, dtype=np.int64)
+        self.next_end = np.full((n, 2), -1, dtype=np.int8)
+
+        # The arc length tables of every spline, one after another. Each spline
+        # has a run of entries from spline_first to spline_last, and its
+        # distances are stored offset by spline_base so that the whole of
+        # spline_s increases and one searchsorted finds entries for any mix
+        # of splines.
+        self.spline_first = np.zeros(n, dtype=np.int64)
+        self.spline_last = np.zeros(n, dtype=np.int64)
+        self.spline_base = np.zeros(n)
+        self.spline_s = np.zeros(0)
+        self.spline_x = np.zeros(0)
+        self.spline_y = np.zeros(0)
+        self.spline_h = np.zeros(0)
+
+    def fill(self, track):
+        # Rows are in segment id order, so a segment's row is its id
+        self.segments = list(track.segment_list)
+        self.index_by_uuid = {}
+        for i, segment in enumerate(self.segments):
+            self.index_by_uuid[segment.uuid] = i
+
+        self.allocate(len(self.segments))
+
+        for i, segment in enumerate(self.segments):
+            self.set_row(i, segment)
+
+        self.set_splines([(i, segment) for i, segment in enumerate(self.segments) if isinstance(segment, Spline)])
+
+        # Copied straight from the transition table of the track
+        n = len(self.segments)
+        self.next_segment = np.array(track.next_segment, dtype=np.int64).reshape(n, 2)
+        self.next_end = np.array(track.next_end, dtype=np.int8).reshape(n, 2)
+
+    def set_row(self, i, segment):
+        self.kind[i] = KIND_STRAIGHT
+        self.length[i] = segment.length()
+
+        self.start_x[i] = segment.startNode.point.x
+        self.start_y[i] = segment.startNode.point.y
+        self.start_z[i] = segment.startNode.height
+        self.end_x[i] = segment.endNode.point.x
+        self.end_y[i] = segment.endNode.point.y
+        self.end_z[i] = segment.endNode.height
+
+        self.center_x[i] = 0
+        self.center_y[i] = 0
+        self.radius[i] = 1
+        self.start_angle[i] = 0
+        self.end_angle[i] = 0
+        self.spline_first[i] = 0
+        self.spline_last[i] = 0
+        self.spline_base[i] = 0
+
+        if isinstance(segment, Curve):
+            self.kind[i] = KIND_CURVE
+            self.center_x[i] = segment.center.x
+            self.center_y[i] = segment.center.y
+            self.radius[i] = segment.radius
+            self.start_angle[i] = segment.startAngle
+            self.end_angle[i] = segment.endAngle
+        elif isinstance(segment, Spline):
+            self.kind[i] = KIND_SPLINE
+
+    def update(self, track, changes):
+        # Brings the table up to date with the segments returned by
+        # Track.get_changes, rewriting only their rows. Removed segments drop
+        # out because the arrays are cut to the new segment count.
+        n = len(track.segment_list)
+        if n != len(self.length):
+            self.resize(n)
+            self.segments = list(track.segment_list)
+
+        splines_changed = False
+        for segment in changes:
+            if isinstance(segment, Spline):
+                splines_changed = True
+            if segment.layout is not track:
+                self.index_by_uuid.pop(segment.uuid, None)
+                continue
+
+            i = segment.id
+            self.segments[i] = segment
+            self.index_by_uuid[segment.uuid] = i
+            self.set_row(i, segment)
+            for end in range(2):
+                self.next_segment[i, end] = track.next_segment[(2 * i) + end]
+                self.next_end[i, end] = track.next_end[(2 * i) + end]
+
+        if splines_changed:
+            for name in SPLINE_TABLE_NAMES:
+                setattr(self, name, np.zeros(0))
+            splines = np.nonzero(self.kind == KIND_SPLINE)[0]
+            self.set_splines([(int(i), self.segments[i]) for i in splines])
+
+    def resize(self, n):
+        # Keeps the first n rows, padding any new ones the way allocate does
+        rows = {name: getattr(self, name) for name in ROW_ARRAY_NAMES}
+        spline_tables = {name: getattr(self, name) for name in SPLINE_TABLE_NAMES}
+        count = min(n, len(self.length))
+
+        self.allocate(n)
+        for name, array in rows.items():
+            getattr(self, name)[:count] = array[:count]
+        for name, array in spline_tables.items():
+            setattr(self, name, array)
+
+    def set_splines(self, splines):
+        # Copies in the arc length tables of (row, Spline) pairs
+        s_parts = []
+        x_parts = []
+        y_parts = []
+        h_parts = []
+        first = 0
+        base = 0.0
+
+        for i, segment in splines:
+            table_s, table_x, table_y, table_h = segment.get_table()
+
+            self.kind[i] = KIND_SPLINE
+            self.length[i] = segment.length()
+            self.spline_first[i] = first
+            self.spline_last[i] = first + len(table_s) - 1
+            self.spline_base[i] = base
+
+            s_parts.append(base + np.asarray(table_s))
+            x_parts.append(table_x)
+            y_parts.append(table_y)
+            h_parts.append(table_h)
+
+            # The gap keeps the end of one spline apart from the start of the next
+            first += len(table_s)
+            base += segment.length() + 1
+
+        if splines:
+            self.spline_s = np.concatenate(s_parts)
+            self.spline_x = np.concatenate(x_parts)
+            self.spline_y = np.concatenate(y_parts)
+            self.spline_h = np.concatenate(h_parts)
+
+    def get_arrays(self):
+        # The arrays alone, without the segment objects, for sending to worker
+        # processes that only locate and evaluate
+        return {name: getattr(self, name) for name in ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        table = cls()
+        for name in ARRAY_NAMES:
+            setattr(table, name, arrays[name])
+        return table
+
+    def __len__(self):
+        return len(self.segments)
+
+    def from_location(self, loc):
+        return loc.track_id(), loc.get_distance(), loc.direction
+
+    def to_location(self, segment, distance, direction):
+        return self.segments[int(segment)].get_location(float(distance), int(direction))
+
+    def locate(self, segment, distance, direction, offset):
+        # Vectorized equivalent of Location.get_offset. Every argument is broadcast
+        # against the others, so one location can be offset by many amounts or
+        # many locations by one amount. Returns (segment, distance, direction) arrays.
+        segment, distance, direction, offset = np.broadcast_arrays(
+            np.asarray(segment, dtype=np.int64),
+            np.asarray(distance, dtype=np.float64),
+            np.asarray(direction, dtype=np.int8),
+            np.asarray(offset, dtype=np.float64))
+
+        shape = segment.shape
+        segment = segment.flatten()
+        direction = direction.flatten()
+        distance = distance.flatten()
+        offset = offset.flatten()
+
+        sign = np.where(direction == constants.DIRECTION_FORWARD, 1.0, -1.0)
+        distance = distance + (sign * offset)
+
+        # Each pass moves every location that fell off its segment onto the next one,
+        # so the number of passes is the largest number of boundaries crossed
+        while True:
+            length = self.length[segment]
+            below = distance < 0
+            above = distance > length
+            crossing = np.nonzero(below | above)[0]
+            if len(crossing) == 0:
+                break
+
+            if stats.enabled:
+                stats.count('segment_crossings', len(crossing))
+
+            seg = segment[crossing]
+            exit_end = np.where(above[crossing], END_END, END_START)
+            remaining = np.where(above[crossing], distance[crossing] - length[crossing], -distance[crossing])
+
+            next_seg = self.next_segment[seg, exit_end]
+            if np.any(next_seg < 0):
+                raise AssertionError('Offset runs past the end of the track')
+            entry_end = self.next_end[seg, exit_end]
+
+            # The location keeps its direction if it travels the same way through the
+            # next segment as it did through the last one, otherwise it flips
+            flip = (exit_end == END_END) != (entry_end == END_START)
+            direction[crossing] = np.where(flip, 1 - direction[crossing], direction[crossing])
+
+            segment[crossing] = next_seg
+            distance[crossing] = np.where(entry_end == END_START, remaining, self.length[next_seg] - remaining)
+
+        return segment.reshape(shape), distance.reshape(shape), direction.reshape(shape)
+
+    def evaluate(self, segment, distance, direction, out=None):
+        # Vectorized equivalent of Location.get_pos/get_height/get_h/get_slope.
+        # Returns (x, y, z, h, slope) arrays, or writes them into the columns of
+        # out, an (n, 5) array, and returns out.
+        segment, distance, reverse = np.broadcast_arrays(
+            np.asarray(segment, dtype=np.int64),
+            np.asarray(distance, dtype=np.float64),
+            np.asarray(direction) == constants.DIRECTION_REVERSE)
+
+        length = self.length[segment]
+        percent = np.divide(distance, length, out=np.zeros(np.broadcast(distance, length).shape), where=length > 0)
+
+        start_x = self.start_x[segment]
+        start_y = self.start_y[segment]
+        start_z = self.start_z[segment]
+        end_z = self.end_z[segment]
+        dx = self.end_x[segment] - start_x
+        dy = self.end_y[segment] - start_y
+        dz = end_z - start_z
+
+        is_curve = self.kind[segment] == KIND_CURVE
+        radius = self.radius[segment]
+        angle = self.start_angle[segment] + (distance / radius)
+
+        x = np.where(is_curve, self.center_x[segment] + (radius * np.cos(angle)), start_x + (dx * percent))
+        y = np.where(is_curve, self.center_y[segment] + (radius * np.sin(angle)), start_y + (dy * percent))
+        z = start_z + (dz * percent)
+
+        h_curve = angle + np.where(reverse, -np.pi / 2, np.pi / 2)
+        h_straight = np.arctan2(dy, dx) + np.where(reverse, np.pi, 0)
+        h = np.where(is_curve, h_curve, h_straight)
+
+        is_spline = self.kind[segment] == KIND_SPLINE
+        if np.any(is_spline):
+            x[is_spline], y[is_spline], h_spline = self.evaluate_splines(segment[is_spline], distance[is_spline])
+            h[is_spline] = h_spline + np.where(reverse[is_spline], np.pi, 0)
+
+        slope = np.arctan2(dz, length)
+        slope = np.where(reverse, -slope, slope)
+
+        if out is None:
+            return x, y, z, h, slope
+
+        for column, values in enumerate([x, y, z, h, slope]):
+            out[:, column] = values
+        return out
+
+    def find_spline_entries(self, segment, distance):
+        # Index of the arc length table entry at or before each distance, and
+        # how far the distance is toward the next entry
+        first = self.spline_first[segment]
+        last = self.spline_last[segment]
+        key = self.spline_base[segment] + distance
+
+        i = np.searchsorted(self.spline_s, key, side='right') - 1
+        i = np.clip(i, first, np.maximum(last - 1, first))
+        s0 = self.spline_s[i]
+        step = self.spline_s[i + 1] - s0
+        fraction = np.divide(key - s0, step, out=np.zeros_like(key), where=step > 0)
+        return i, np.clip(fraction, 0, 1)
+
+    def evaluate_splines(self, segment, distance):
+        # Interpolates x, y and h between the arc length table entries either
+        # side of each distance
+        i, fraction = self.find_spline_entries(segment, distance)
+
+        x = self.spline_x[i] + ((self.spline_x[i + 1] - self.spline_x[i]) * fraction)
+        y = self.spline_y[i] + ((self.spline_y[i + 1] - self.spline_y[i]) * fraction)
+        h = self.spline_h[i] + ((self.spline_h[i + 1] - self.spline_h[i]) * fraction)
+        return x, y, h
+
+    def get_curvature(self, segment, distance):
+        # Signed curvature (1 / radius, positive turning left going forward) at
+        # each location. Splines use the change in heading across the table
+        # interval holding the distance.
+        segment, distance = np.broadcast_arrays(np.asarray(segment, dtype=np.int64),
+                                                np.asarray(distance, dtype=np.float64))
+        kind = self.kind[segment]
+        curvature = np.where(kind == KIND_CURVE, 1 / self.radius[segment], 0.0)
+
+        is_spline = kind == KIND_SPLINE
+        if np.any(is_spline):
+            i, _ = self.find_spline_entries(segment[is_spline], distance[is_spline])
+            step = self.spline_s[i + 1] - self.spline_s[i]
+            turn = self.spline_h[i + 1] - self.spline_h[i]
+            curvature[is_spline] = np.divide(turn, step, out=np.zeros_like(turn), where=step > 0)
+
+        return curvature
+
+    def place(self, segment, distance, direction, offset, out=None):
+        return self.evaluate(*self.locate(segment, distance, direction, offset), out=out)
@@ -0,0 +1,197 @@
+import math
+from collections import defaultdict
+
+
+class SpatialIndex:
+    def __init__(self, track, cell_size=None):
+        # Uniform grid over the bounding boxes of every segment in a Track. Each
+        # segment is listed in every cell its box touches, queries collect the
+        # segments from the cells they cover and refine with exact distances.
+        # Queries first catch up with the segments changed since the revision
+        # the index was last updated to.
+        self.track = track
+        self.revision = -1
+
+        if cell_size is None:
+            cell_size = default_cell_size(track.tracks.values())
+        self.cell_size = cell_size
+
+        self.build()
+
+    def build(self):
+        self.segments = {}
+        self.cells = defaultdict(set)
+        self.segment_cells = {}
+        self.revision = self.track.revision
+
+        # Range of occupied cells, so nearest-segment searches know when to
+        # stop. Found again when a segment at its edge is removed.
+        self.min_cell = None
+        self.max_cell = None
+        self.cell_range_stale = False
+
+        for segment in self.track.tracks.values():
+            self.add_segment(segment)
+
+    def update(self):
+        # Re-files only the segments changed since the last update, falling back
+        # to building everything when the track cannot say what changed
+        if self.revision == self.track.revision:
+            return
+
+        changes = self.track.get_changes(self.revision)
+        if changes is None:
+            self.build()
+            return
+
+        for segment in changes:
+            if segment.uuid in self.segment_cells:
+                self.remove_segment(segment)
+            if segment.layout is self.track:
+                self.add_segment(segment)
+        self.revision = self.track.revision
+
+    def find_cell_range(self):
+        self.cell_range_stale = False
+        self.min_cell = None
+        self.max_cell = None
+        if len(self.cells) > 0:
+            self.min_cell = (min(cx for cx, _ in self.cells), min(cy for _, cy in self.cells))
+            self.max_cell = (max(cx for cx, _ in self.cells), max(cy for _, cy in self.cells))
+
+    def get_cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def get_cell_range(self, min_x, min_y, max_x, max_y):
+        min_cx, min_cy = self.get_cell(min_x, min_y)
+        max_cx, max_cy = self.get_cell(max_x, max_y)
+        return [(cx, cy) for cx in range(min_cx, max_cx + 1) for cy in range(min_cy, max_cy + 1)]
+
+    def add_segment(self, segment):
+        self.segments[segment.uuid] = segment
+
+        cells = self.get_cell_range(*segment.bounds())
+        self.segment_cells[segment.uuid] = cells
+        for cell in cells:
+            self.cells[cell].add(segment.uuid)
+
+        first = cells[0]
+        last = cells[-1]
+        if self.cell_range_stale:
+            return
+        if self.min_cell is None:
+            self.min_cell = first
+            self.max_cell = last
+        else:
+            self.min_cell = (min(self.min_cell[0], first[0]), min(self.min_cell[1], first[1]))
+            self.max_cell = (max(self.max_cell[0], last[0]), max(self.max_cell[1], last[1]))
+
+    def remove_segment(self, segment):
+        cells = self.segment_cells.pop(segment.uuid)
+        for cell in cells:
+            self.cells[cell].discard(segment.uuid)
+            if len(self.cells[cell]) == 0:
+                del self.cells[cell]
+
+        first = cells[0]
+        last = cells[-1]
+        if first[0] == self.min_cell[0] or first[1] == self.min_cell[1] or \
+                last[0] == self.max_cell[0] or last[1] == self.max_cell[1]:
+            self.cell_range_stale = True
+
+        del self.segments[segment.uuid]
+
+    def update_segment(self, segment):
+        self.remove_segment(segment)
+        self.add_segment(segment)
+
+    def node_moved(self, node):
+        # Moving a node already reaches the index through the track's change
+        # log, so this only catches up before the next query would
+        self.update()
+
+    def query_box(self, min_x, min_y, max_x, max_y):
+        # Segments whose bounding box intersects the box
+        self.update()
+        found = {}
+        for cell in self.get_cell_range(min_x, min_y, max_x, max_y):
+            for uuid in self.cells.get(cell, ()):
+                if uuid in found:
+                    continue
+                seg_min_x, seg_min_y, seg_max_x, seg_max_y = self.segments[uuid].bounds()
+                if seg_min_x <= max_x and min_x <= seg_max_x and seg_min_y <= max_y and min_y <= seg_max_y:
+                    found[uuid] = self.segments[uuid]
+        return list(found.values())
+
+    def query_radius(self, point, radius):
+        # Segments passing within the radius of the point
+        candidates = self.query_box(point.x - radius, point.y - radius, point.x + radius, point.y + radius)
+        return [segment for segment in candidates if segment.distance_to(point) <= radius]
+
+    def nearest(self, point, max_distance=None):
+        # Nearest segment to the point and its distance, searching rings of cells
+        # outward until no unsearched cell can hold anything closer
+        self.update()
+        if len(self.segments) == 0:
+            return None, None
+        if self.cell_range_stale:
+            self.find_cell_range()
+
+        center_x, center_y = self.get_cell(point.x, point.y)
+        max_ring = max(abs(center_x - self.min_cell[0]), abs(center_x - self.max_cell[0]),
+                       abs(center_y - self.min_cell[1]), abs(center_y - self.max_cell[1]))
+
+        best = None
+        best_distance = math.inf
+        checked = set()
+
+        for ring in range(max_ring + 1):
+            if max_distance is not None and (ring - 1) * self.cell_size > max_distance:
+                break
+
+            for cell in ring_cells(center_x, center_y, ring):
+                for uuid in self.cells.get(cell, ()):
+                    if uuid in checked:
+                        continue
+                    checked.add(uuid)
+
+                    distance = self.segments[uuid].distance_to(point)
+                    if distance < best_distance:
+                        best = self.segments[uuid]
+                        best_distance = distance
+
+            # Anything in the next ring out is at least this far away
+            if best_distance <= ring * self.cell_size:
+                break
+
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None, None
+        return best, best_distance
+
+
+def ring_cells(center_x, center_y, ring):
+    if ring == 0:
+        return [(center_x, center_y)]
+
+    cells = []
+    for i in range(-ring, ring + 1):
+        cells.append((center_x + i, center_y - ring))
+        cells.append((center_x + i, center_y + ring))
+    for i in range(-ring + 1, ring):
+        cells.append((center_x - ring, center_y + i))
+        cells.append((center_x + ring, center_y + i))
+    return cells
+
+
+def default_cell_size(segments):
+    # About the size of an average segment, so most segments touch a few cells
+    total = 0
+    count = 0
+    for segment in segments:
+        min_x, min_y, max_x, max_y = segment.bounds()
+        total += max(max_x - min_x, max_y - min_y)
+        count += 1
+
+    if count == 0 or total == 0:
+        return 1
+    return total / count
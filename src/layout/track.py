@@ -1,4 +1,11 @@
-from collections import defaultdict
+import src.constants as constants
+from src.layout.route_index import RouteIndex
+from src.layout.route_planner import RoutePlanner
+
+
+# Most changes kept for incremental rebuilds. Consumers further behind than
+# this rebuild from scratch.
+MAX_CHANGES = 100000
 
 
 class Track:
@@ -6,32 +13,255 @@ class Track:
         self.nodes = {}
         self.tracks = {}
 
-        tracks_by_node = defaultdict(lambda: [])
+        # Dense integer ids, in the order given. Segments and nodes are looked
+        # up by id internally; uuids are only used as external identifiers.
+        self.node_list = list(nodes)
+        self.segment_list = list(tracks)
+
+        # Derived lookup structures are rebuilt lazily whenever the revision changes
+        self.revision = 0
+        self.route_index = None
+        self.route_index_revision = -1
+        self.route_planner = None
+        self.route_planner_revision = -1
 
-        for node in nodes:
+        for i, node in enumerate(self.node_list):
+            node.id = i
             self.nodes[node.uuid] = node
 
-        for track in tracks:
+        # Ends of every segment meeting at each node id, as (segment id, end)
+        self.ends_by_node = [[] for _ in self.node_list]
+
+        for i, track in enumerate(self.segment_list):
+            track.id = i
+            track.layout = self
             self.tracks[track.uuid] = track
 
-            for node in track.get_nodes():
-                tracks_by_node[node].append(track)
+            for end, node in enumerate([track.startNode, track.endNode]):
+                if self.nodes.get(node.uuid) is not node:
+                    raise AssertionError(node.uuid + ' not found in provided nodes')
+                self.ends_by_node[node.id].append((i, end))
+
+        # Transition table, indexed by 2 * segment id + end: the segment entered
+        # when leaving through that end, the end it is entered through, and the
+        # direction of travel along it afterwards. -1 where nothing is connected.
+        n = 2 * len(self.segment_list)
+        self.next_segment = [-1] * n
+        self.next_end = [-1] * n
+        self.next_direction = [-1] * n
+
+        for node, ends in zip(self.node_list, self.ends_by_node):
+            if len(ends) != 0 and len(ends) != 2:
+                print('Warning: node has ' + str(len(ends)) + ' connections')
+            self.connect_node(node)
+
+        # Segments changed since each revision, as (revision, segment) in the
+        # order they changed. Consumers holding derived data ask for the changes
+        # since the revision they last saw and rebuild only those segments.
+        # Anything older than changes_start, or before the last call to
+        # mark_changed, needs a full rebuild.
+        self.changes = []
+        self.changes_start = 0
+
+    def get_transition(self, segment, end):
+        # (next segment id, entry end, direction) leaving the segment through the end
+        i = (2 * segment) + end
+        return self.next_segment[i], self.next_end[i], self.next_direction[i]
+
+    def connect_node(self, node):
+        # Rebuilds the connections and transitions of every segment end at the node
+        ends = self.ends_by_node[node.id]
+        for segment, end in ends:
+            self.segment_list[segment].connections.pop(node.uuid, None)
+            i = (2 * segment) + end
+            self.next_segment[i] = -1
+            self.next_end[i] = -1
+            self.next_direction[i] = -1
+
+        for segment, end in ends:
+            for other, other_end in ends:
+                if other == segment:
+                    continue
+
+                self.segment_list[segment].add_connection(node.uuid, self.segment_list[other])
+
+                i = (2 * segment) + end
+                self.next_segment[i] = other
+                self.next_end[i] = other_end
+                self.next_direction[i] = constants.DIRECTION_FORWARD
+                if other_end == constants.END_END:
+                    self.next_direction[i] = constants.DIRECTION_REVERSE
+
+    def get_node_segments(self, node):
+        return [self.segment_list[segment] for segment, end in self.ends_by_node[node.id]]
+
+    def add_node(self, node):
+        node.id = len(self.node_list)
+        self.node_list.append(node)
+        self.nodes[node.uuid] = node
+        self.ends_by_node.append([])
+        self.revision += 1
+
+    def remove_node(self, node):
+        # Nodes can only be removed once no segment ends at them. The last node
+        # takes over the id of the removed one, so ids stay dense.
+        if len(self.ends_by_node[node.id]) != 0:
+            raise AssertionError(node.uuid + ' still has segments attached')
+
+        i = node.id
+        last = self.node_list.pop()
+        ends = self.ends_by_node.pop()
+        if last is not node:
+            last.id = i
+            self.node_list[i] = last
+            self.ends_by_node[i] = ends
+
+        del self.nodes[node.uuid]
+        node.id = None
+        self.revision += 1
+
+    def add_segment(self, segment):
+        # Connects a new segment between nodes already in the track. Only the
+        # segments meeting it at its nodes are reconnected.
+        for node in [segment.startNode, segment.endNode]:
+            if self.nodes.get(node.uuid) is not node:
+                raise AssertionError(node.uuid + ' not found in provided nodes')
 
-        for node in tracks_by_node:
-            if node not in self.nodes:
-                raise AssertionError(node + ' not found in provided nodes')
-            if len(tracks_by_node[node]) != 2:
-                print('Warning: node has ' + str(len(tracks_by_node[node])) + ' connections')
+        segment.id = len(self.segment_list)
+        segment.layout = self
+        self.segment_list.append(segment)
+        self.tracks[segment.uuid] = segment
+        self.next_segment.extend([-1, -1])
+        self.next_end.extend([-1, -1])
+        self.next_direction.extend([-1, -1])
 
-            for track in tracks_by_node[node]:
-                for other_track in tracks_by_node[node]:
-                    if track.uuid == other_track.uuid:
-                        continue
+        # A segment removed earlier was detached from its nodes, and must be
+        # attached again to hear about them moving
+        for end, node in enumerate([segment.startNode, segment.endNode]):
+            self.ends_by_node[node.id].append((segment.id, end))
+            if segment not in node.segments:
+                node.attach_segment(segment)
+        self.reconnect(segment)
 
-                    track.add_connection(node, other_track)
+    def remove_segment(self, segment):
+        # Disconnects a segment and detaches it from its nodes, which stay in the
+        # track. The last segment takes over the id of the removed one.
+        if self.tracks.get(segment.uuid) is not segment:
+            raise AssertionError(segment.uuid + ' is not part of this track')
+
+        i = segment.id
+        for node in [segment.startNode, segment.endNode]:
+            self.ends_by_node[node.id] = [(other, end) for other, end in self.ends_by_node[node.id] if other != i]
+            node.detach_segment(segment)
+        self.reconnect(segment)
+
+        last = len(self.segment_list) - 1
+        if i != last:
+            self.move_segment_id(last, i)
+
+        self.segment_list.pop()
+        del self.next_segment[-2:]
+        del self.next_end[-2:]
+        del self.next_direction[-2:]
+
+        del self.tracks[segment.uuid]
+        segment.connections = {}
+        segment.layout = None
+        segment.id = None
+        self.segment_changed(segment)
+
+    def move_segment_id(self, old, new):
+        # Gives the segment at id old the id new, and points its neighbours'
+        # transitions and the node end lists at the new id
+        segment = self.segment_list[old]
+        segment.id = new
+        self.segment_list[new] = segment
+
+        for end in range(2):
+            self.next_segment[(2 * new) + end] = self.next_segment[(2 * old) + end]
+            self.next_end[(2 * new) + end] = self.next_end[(2 * old) + end]
+            self.next_direction[(2 * new) + end] = self.next_direction[(2 * old) + end]
+
+        for node in {segment.startNode, segment.endNode}:
+            ends = self.ends_by_node[node.id]
+            self.ends_by_node[node.id] = [(new if other == old else other, end) for other, end in ends]
+
+            # Neighbours whose transitions are rewritten are changed too, so
+            # tables built from the transitions stop pointing at the old id
+            for other, other_end in self.ends_by_node[node.id]:
+                i = (2 * other) + other_end
+                if self.next_segment[i] == old:
+                    self.next_segment[i] = new
+                    self.segment_changed(self.segment_list[other])
+
+        self.segment_changed(segment)
+
+    def reconnect(self, segment):
+        # Reconnects the nodes at both ends of a segment that was added or
+        # removed, marking it and every segment meeting it there as changed
+        self.segment_changed(segment)
+        for node in [segment.startNode, segment.endNode]:
+            self.connect_node(node)
+            for other in self.get_node_segments(node):
+                self.segment_changed(other)
+
+    def segment_changed(self, segment):
+        # Called when a segment changes shape, through Straight.invalidate, and
+        # when it is added, removed or reconnected
+        self.revision += 1
+        self.changes.append((self.revision, segment))
+
+        if len(self.changes) > MAX_CHANGES:
+            drop = len(self.changes) // 2
+            self.changes_start = self.changes[drop - 1][0]
+            del self.changes[:drop]
+
+    def get_changes(self, revision):
+        # Segments changed since the revision, including removed ones (whose
+        # layout is no longer this track), or None if everything must be rebuilt
+        if revision < self.changes_start:
+            return None
+
+        changed = {}
+        for i in range(len(self.changes) - 1, -1, -1):
+            changed_revision, segment = self.changes[i]
+            if changed_revision <= revision:
+                break
+            changed[segment.uuid] = segment
+        return list(changed.values())
+
+    def mark_changed(self):
+        # Must be called after editing nodes or segments of this track in a way
+        # it is not told about, such as changing the arc of a Curve. Everything
+        # derived from the track is rebuilt.
+        self.revision += 1
+        self.changes = []
+        self.changes_start = self.revision
+
+    def get_route_index(self):
+        # Only the chains holding segments changed since the last call are
+        # built again
+        if self.route_index_revision != self.revision:
+            changes = self.get_changes(self.route_index_revision)
+            if self.route_index is None or changes is None:
+                self.route_index = RouteIndex(self)
+            else:
+                self.route_index.update(self, changes)
+            self.route_index_revision = self.revision
+        return self.route_index
+
+    def get_route_planner(self):
+        if self.route_planner_revision != self.revision:
+            changes = self.get_changes(self.route_planner_revision)
+            if self.route_planner is None or changes is None:
+                self.route_planner = RoutePlanner(self)
+            else:
+                self.route_planner.update(changes)
+            self.route_planner_revision = self.revision
+        return self.route_planner
 
     def get_updated_location(self, loc, offset):
-        return self.tracks[loc.track_uuid].get_updated_location(loc, offset)
+        return self.get_route_index().get_offset(loc, offset)
 
     def to_string(self):
         string = 'Track\n'
@@ -48,6 +278,8 @@ class Track:
         return string
 
     def render(self, render):
-        for track in self.tracks.values():
-            geom = track.get_geometry()
-            render.attachNewNode(geom)
+        # Segments are drawn in merged quadtree chunks. Imported here because
+        # the rest of Track is used by the simulation without panda3d.
+        from src.layout.track_renderer import TrackRenderer
+
+        return TrackRenderer(self, render)
@@ -0,0 +1,35 @@
+class TrackCursor:
+    __slots__ = ('segment', 'distance', 'direction')
+
+    def __init__(self, segment, distance, direction):
+        # A location that moves in place. It has the same track_id, get_distance
+        # and direction as a Location, so it can be used wherever one is read,
+        # but moving it allocates nothing. Heads are moved in bulk by
+        # SegmentTable.locate and written back through set.
+        self.segment = segment
+        self.distance = distance
+        self.direction = direction
+
+    @classmethod
+    def from_location(cls, loc):
+        return cls(loc.track, loc.get_distance(), loc.direction)
+
+    def set(self, segment, distance, direction):
+        self.segment = segment
+        self.distance = distance
+        self.direction = direction
+
+    def set_location(self, loc):
+        self.set(loc.track, loc.get_distance(), loc.direction)
+
+    def to_location(self):
+        return self.segment.get_location(self.distance, self.direction)
+
+    def track_uuid(self):
+        return self.segment.uuid
+
+    def track_id(self):
+        return self.segment.id
+
+    def get_distance(self):
+        return self.distance
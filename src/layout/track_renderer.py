@@ -0,0 +1,267 @@
+from panda3d.core import Vec4, LineSegs, LODNode, Point3
+
+import src.stats as stats
+
+
+# (curve tolerance, distance from the camera beyond which the level is hidden).
+# Each level is shown from where the previous one ends.
+DEFAULT_LOD_LEVELS = [
+    (0.01, 240),
+    (0.1, 1200),
+    (1.0, 6000),
+    (4.0, 1e9),
+]
+
+
+class TrackChunk:
+    def __init__(self, bounds, segments, depth, parent=None):
+        # A square region of the layout. Leaf chunks draw all of their segments
+        # into a single Geom, inner chunks hold up to four children so that panda
+        # can cull whole branches of the layout at once.
+        self.bounds = bounds
+        self.segments = segments
+        self.depth = depth
+        self.parent = parent
+        self.children = []
+        self.node_path = None
+
+    def is_leaf(self):
+        return len(self.children) == 0
+
+
+class TrackRenderer:
+    def __init__(self, track, parent, max_segments=64, max_depth=12, lod_levels=None):
+        self.track = track
+        self.parent = parent
+        self.max_segments = max_segments
+        self.max_depth = max_depth
+
+        if lod_levels is None:
+            lod_levels = DEFAULT_LOD_LEVELS
+        self.lod_levels = lod_levels
+
+        self.thickness = 2.0
+        self.color = Vec4(0, 1, 0, 1)
+
+        self.root = None
+        self.quadtree = None
+        self.chunks_by_segment = {}
+        self.revision = -1
+        self.build()
+
+    def build(self):
+        if self.root is not None:
+            self.cleanup()
+
+        self.root = self.parent.attachNewNode('track')
+        self.chunks_by_segment = {}
+        self.revision = self.track.revision
+
+        segments = list(self.track.tracks.values())
+        if len(segments) == 0:
+            return
+
+        self.quadtree = self.build_chunk(square_bounds(segments), segments, 0)
+        self.attach_chunk(self.quadtree, self.root)
+
+    def build_chunk(self, bounds, segments, depth, parent=None):
+        chunk = TrackChunk(bounds, segments, depth, parent)
+        self.split_chunk(chunk)
+        return chunk
+
+    def split_chunk(self, chunk):
+        # Hands the segments of a chunk with too many down to up to four
+        # children, as deep as needed
+        if len(chunk.segments) <= self.max_segments or chunk.depth >= self.max_depth:
+            return
+
+        # Segments go to the quadrant holding the center of their bounding box
+        quadrants = [[], [], [], []]
+        for segment in chunk.segments:
+            quadrants[get_quadrant(chunk.bounds, segment)].append(segment)
+
+        for i in range(4):
+            if len(quadrants[i]) > 0:
+                chunk.children.append(self.build_chunk(get_quadrant_bounds(chunk.bounds, i), quadrants[i],
+                                                       chunk.depth + 1, chunk))
+
+        chunk.segments = []
+
+    def find_leaf(self, segment):
+        # Leaf chunk a segment belongs in, descending by the center of its
+        # bounding box and adding a leaf where the quadrant has none yet.
+        # Segments outside the layout go to the nearest edge chunk.
+        chunk = self.quadtree
+        while not chunk.is_leaf():
+            bounds = get_quadrant_bounds(chunk.bounds, get_quadrant(chunk.bounds, segment))
+
+            child = None
+            for other in chunk.children:
+                if other.bounds == bounds:
+                    child = other
+            if child is None:
+                child = TrackChunk(bounds, [], chunk.depth + 1, chunk)
+                chunk.children.append(child)
+            chunk = child
+
+        return chunk
+
+    def update(self):
+        # Redraws only the leaf chunks holding segments changed since the last
+        # update, moving segments whose bounds left their chunk. Falls back to
+        # building everything when the track cannot say what changed.
+        if self.revision == self.track.revision:
+            return
+
+        changes = self.track.get_changes(self.revision)
+        if changes is None or self.quadtree is None:
+            self.build()
+            return
+
+        dirty = {}
+        for segment in changes:
+            old = self.chunks_by_segment.pop(segment.uuid, None)
+            if old is not None:
+                old.segments.remove(segment)
+                dirty[id(old)] = old
+
+            if segment.layout is self.track:
+                chunk = self.find_leaf(segment)
+                chunk.segments.append(segment)
+                self.chunks_by_segment[segment.uuid] = chunk
+                dirty[id(chunk)] = chunk
+
+        for chunk in dirty.values():
+            if len(chunk.segments) > self.max_segments and chunk.depth < self.max_depth:
+                self.split_leaf(chunk)
+            else:
+                self.rebuild_chunk(chunk)
+        self.revision = self.track.revision
+
+    def split_leaf(self, chunk):
+        # A leaf that update filled past max_segments is split the way
+        # build_chunk would have split it, and its new children drawn
+        if chunk.node_path is not None:
+            parent = chunk.node_path.getParent()
+            chunk.node_path.removeNode()
+        else:
+            self.attach_parents(chunk.parent)
+            parent = chunk.parent.node_path
+
+        self.split_chunk(chunk)
+        self.attach_chunk(chunk, parent)
+
+    def attach_chunk(self, chunk, parent):
+        if chunk.is_leaf():
+            chunk.node_path = self.create_chunk_node(chunk, parent)
+            for segment in chunk.segments:
+                self.chunks_by_segment[segment.uuid] = chunk
+            return
+
+        chunk.node_path = parent.attachNewNode('track_chunk')
+        for child in chunk.children:
+            self.attach_chunk(child, chunk.node_path)
+
+    def create_chunk_node(self, chunk, parent):
+        # One Geom per level of detail, switched on the distance from the camera
+        # to the center of the chunk
+        lod = LODNode('track_chunk')
+        min_x, min_y, max_x, max_y = chunk.bounds
+        lod.setCenter(Point3((min_x + max_x) / 2, (min_y + max_y) / 2, 0))
+
+        node_path = parent.attachNewNode(lod)
+        near = 0
+        for tolerance, far in self.lod_levels:
+            node_path.attachNewNode(self.create_geometry(chunk.segments, tolerance))
+            lod.addSwitch(far, near)
+            near = far
+
+        return node_path
+
+    def create_geometry(self, segments, tolerance):
+        with stats.timer('Track:Geometry'):
+            segs = LineSegs('track_chunk')
+            segs.setThickness(self.thickness)
+            segs.setColor(self.color)
+            for segment in segments:
+                segment.draw(segs, tolerance)
+
+            if stats.enabled:
+                stats.count('segments_drawn', len(segments))
+            return segs.create(None)
+
+    def rebuild_chunk(self, chunk):
+        # Redraws a leaf chunk after its segments changed shape, or draws it for
+        # the first time if update just added it
+        if chunk.node_path is None:
+            self.attach_parents(chunk.parent)
+            chunk.node_path = self.create_chunk_node(chunk, chunk.parent.node_path)
+            return
+
+        parent = chunk.node_path.getParent()
+        chunk.node_path.removeNode()
+        chunk.node_path = self.create_chunk_node(chunk, parent)
+
+    def attach_parents(self, chunk):
+        # Inner chunks are only attached once they have children to hold
+        if chunk.node_path is None:
+            self.attach_parents(chunk.parent)
+            chunk.node_path = chunk.parent.node_path.attachNewNode('track_chunk')
+
+    def get_leaf_chunks(self):
+        leaves = []
+        if self.quadtree is None:
+            return leaves
+
+        stack = [self.quadtree]
+        while len(stack) > 0:
+            chunk = stack.pop()
+            if chunk.is_leaf():
+                leaves.append(chunk)
+            else:
+                stack.extend(chunk.children)
+        return leaves
+
+    def cleanup(self):
+        self.root.removeNode()
+        self.root = None
+        self.quadtree = None
+
+
+def get_quadrant(bounds, segment):
+    # 0 to 3 for the lower left, lower right, upper left and upper right
+    # quadrants, by the center of the segment's bounding box
+    min_x, min_y, max_x, max_y = bounds
+    seg_min_x, seg_min_y, seg_max_x, seg_max_y = segment.bounds()
+
+    i = 0
+    if (seg_min_x + seg_max_x) / 2 >= (min_x + max_x) / 2:
+        i += 1
+    if (seg_min_y + seg_max_y) / 2 >= (min_y + max_y) / 2:
+        i += 2
+    return i
+
+
+def get_quadrant_bounds(bounds, i):
+    min_x, min_y, max_x, max_y = bounds
+    mid_x = (min_x + max_x) / 2
+    mid_y = (min_y + max_y) / 2
+
+    return [
+        (min_x, min_y, mid_x, mid_y),
+        (mid_x, min_y, max_x, mid_y),
+        (min_x, mid_y, mid_x, max_y),
+        (mid_x, mid_y, max_x, max_y),
+    ][i]
+
+
+def square_bounds(segments):
+    # Square bounding box around every segment, so quadrants stay square
+    boxes = [segment.bounds() for segment in segments]
+    min_x = min(box[0] for box in boxes)
+    min_y = min(box[1] for box in boxes)
+    max_x = max(box[2] for box in boxes)
+    max_y = max(box[3] for box in boxes)
+
+    size = max(max_x - min_x, max_y - min_y, 1)
+    return min_x, min_y, min_x + size, min_y + size
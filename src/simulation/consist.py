@@ -0,0 +1,69 @@
+class Car:
+    def __init__(self, wheel_offset=1.5, wheel_dist=5, mass=30000, brake_force=30000):
+        # Distance from the coupler face to the nearest wheelset, and between wheelsets
+        self.wheel_offset = wheel_offset
+        self.wheel_dist = wheel_dist
+
+        # Mass in kg and the largest force its brakes can apply, in N. Cars
+        # without a motor give no tractive effort.
+        self.mass = mass
+        self.brake_force = brake_force
+        self.tractive_effort = 0
+        self.power = 0
+
+    def length(self):
+        return 2 * self.wheel_offset + self.wheel_dist
+
+
+class Locomotive(Car):
+    def __init__(self, wheel_offset=1.5, wheel_dist=5, mass=100000, brake_force=100000, tractive_effort=250000,
+                 power=2000000):
+        Car.__init__(self, wheel_offset, wheel_dist, mass, brake_force)
+
+        # Largest pull at the rail in N, available up to the speed where the
+        # power in W runs out
+        self.tractive_effort = tractive_effort
+        self.power = power
+
+
+class Consist:
+    def __init__(self, cars):
+        self.cars = cars
+
+    @classmethod
+    def uniform(cls, count, wheel_offset=1.5, wheel_dist=5):
+        return cls([Car(wheel_offset, wheel_dist) for _ in range(count)])
+
+    @classmethod
+    def hauled(cls, locomotives, count, wheel_offset=1.5, wheel_dist=5):
+        # Locomotives at the head followed by a run of identical cars
+        cars = [Locomotive(wheel_offset, wheel_dist) for _ in range(locomotives)]
+        cars.extend(Car(wheel_offset, wheel_dist) for _ in range(count))
+        return cls(cars)
+
+    def length(self):
+        return sum(car.length() for car in self.cars)
+
+    def mass(self):
+        return sum(car.mass for car in self.cars)
+
+    def brake_force(self):
+        return sum(car.brake_force for car in self.cars)
+
+    def tractive_effort(self):
+        return sum(car.tractive_effort for car in self.cars)
+
+    def power(self):
+        return sum(car.power for car in self.cars)
+
+    def wheel_offsets(self):
+        # Offsets of every wheelset from the head of the train, front and back
+        # wheelset for each car in order. Offsets are negative, behind the head.
+        offsets = []
+        car_offset = 0
+        for car in self.cars:
+            front_offset = car_offset - car.wheel_offset
+            offsets.append(front_offset)
+            offsets.append(front_offset - car.wheel_dist)
+            car_offset -= car.length()
+        return offsets
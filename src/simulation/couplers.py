@@ -0,0 +1,181 @@
+import numpy as np
+
+
+class CarParameters:
+    def __init__(self, trains, air_drag):
+        # Per-car arrays of shape (trains, longest consist), cars in order from
+        # the head. Rows of shorter consists are padded with inert cars of unit
+        # mass that nothing is coupled to.
+        self.car_counts = np.array([len(train.consist.cars) for train in trains], dtype=np.int64)
+        width = max(int(np.max(self.car_counts)), 1) if len(trains) > 0 else 1
+        shape = (len(trains), width)
+
+        self.mass = np.ones(shape)
+        self.brake_force = np.zeros(shape)
+        self.tractive_effort = np.zeros(shape)
+        self.power = np.zeros(shape)
+        self.drag = np.zeros(shape)
+        self.valid = np.zeros(shape, dtype=bool)
+
+        for i, train in enumerate(trains):
+            for j, car in enumerate(train.consist.cars):
+                self.mass[i, j] = car.mass
+                self.brake_force[i, j] = car.brake_force
+                self.tractive_effort[i, j] = car.tractive_effort
+                self.power[i, j] = car.power
+                self.drag[i, j] = air_drag
+                self.valid[i, j] = True
+
+        # Coupler j joins car j to car j + 1
+        self.coupled = self.valid[:, 1:] & self.valid[:, :-1]
+
+        # (train, car) of every real car, in the order their wheelsets appear in
+        # the Simulation's concatenated wheel offsets
+        self.rows, self.columns = np.nonzero(self.valid)
+
+
+class CouplerDynamics:
+    def __init__(self, dynamics, stiffness=2e7, damping=3e5, slack=0.05, min_speed=0.01):
+        # Longitudinal motion of every car of every train, joined by spring and
+        # damper couplers with free slack between them. Forces on each car come
+        # from the TrainDynamics, with the train's controls applied to every car.
+        #
+        # Each step is integrated with backward Euler, linearised about the
+        # start of the step: whether each coupler is in its slack or bearing is
+        # decided from its predicted gap, and the rest is a symmetric
+        # tridiagonal system per train, solved for all trains at once. This
+        # stays stable for stiff couplers at the simulation rate.
+        #
+        # Resisting forces act as a damping of resistance / speed, never less
+        # than min_speed, so they stop cars without reversing them. A car held
+        # by its brakes against a grade creeps at no more than about min_speed.
+        self.dynamics = dynamics
+        self.stiffness = stiffness
+        self.damping = damping
+        self.slack = slack
+        self.min_speed = min_speed
+
+        self.trains = []
+        self.parameters = None
+
+        # Per car: position relative to where the car would be if the train
+        # were rigid with every coupler centred in its slack, and speed
+        self.offsets = np.zeros((0, 1))
+        self.speeds = np.zeros((0, 1))
+
+    def sync(self, trains):
+        # Brings the state up to date with the Simulation's trains, keeping the
+        # state of trains already known. New trains start rigid at their speed.
+        rows = {train: i for i, train in enumerate(self.trains)}
+        parameters = CarParameters(trains, self.dynamics.air_drag)
+
+        offsets = np.zeros(parameters.mass.shape)
+        speeds = np.zeros(parameters.mass.shape)
+        for i, train in enumerate(trains):
+            count = parameters.car_counts[i]
+            if train in rows:
+                offsets[i, :count] = self.offsets[rows[train], :count]
+                speeds[i, :count] = self.speeds[rows[train], :count]
+            else:
+                speeds[i, :count] = train.speed
+
+        self.trains = list(trains)
+        self.parameters = parameters
+        self.offsets = offsets
+        self.speeds = speeds
+
+    def get_coupler_forces(self):
+        # Force in every coupler, positive in draft (pulling cars apart) and
+        # negative in buff, shape (trains, longest consist - 1)
+        gap = self.offsets[:, :-1] - self.offsets[:, 1:]
+        stretch = np.sign(gap) * np.maximum(np.abs(gap) - (self.slack / 2), 0)
+        closing = self.speeds[:, :-1] - self.speeds[:, 1:]
+        engaged = stretch != 0
+        forces = (self.stiffness * stretch) + np.where(engaged, self.damping * closing, 0)
+        return np.where(self.parameters.coupled, forces, 0)
+
+    def get_wheel_offsets(self):
+        # Offset of every car from its rigid place, repeated for its front and
+        # back wheelset, in the order of the Simulation's wheel offsets
+        parameters = self.parameters
+        return np.repeat(self.offsets[parameters.rows, parameters.columns], 2)
+
+    def get_car_values(self, values):
+        # Spreads one value per wheelset into the (trains, cars) layout, each
+        # car taking the mean of its two wheelsets
+        cars = np.zeros(self.offsets.shape)
+        cars[self.parameters.rows, self.parameters.columns] = values.reshape(-1, 2).mean(axis=1)
+        return cars
+
+    def update(self, throttle, brake, slopes, curvatures, dt):
+        # Advances every car by dt. slopes and curvatures are per car. Returns
+        # how far each train's lead car moved and its new speed; offsets are kept
+        # relative to the lead car, which the Simulation moves along the track.
+        parameters = self.parameters
+        mass = parameters.mass
+        speeds = self.speeds
+
+        driving, resisting = self.dynamics.get_forces(speeds, throttle[:, None], brake[:, None], slopes, curvatures,
+                                                      parameters)
+        driving = np.where(parameters.valid, driving, 0)
+        resisting = np.where(parameters.valid, resisting, 0)
+        resistance_damping = resisting / np.maximum(np.abs(speeds), self.min_speed)
+
+        # Couplers whose predicted gap is past the slack act as springs pulling
+        # the gap back to the edge of the slack
+        gap = self.offsets[:, :-1] - self.offsets[:, 1:]
+        closing = speeds[:, :-1] - speeds[:, 1:]
+        predicted = gap + (closing * dt)
+        engaged = (np.abs(predicted) > (self.slack / 2)) & parameters.coupled
+        rest = np.sign(predicted) * (self.slack / 2)
+
+        stiffness = np.where(engaged, self.stiffness, 0)
+        spring = stiffness * (gap - rest)
+        coupling = dt * ((stiffness * dt) + np.where(engaged, self.damping, 0))
+
+        # Coupler j pulls car j back and car j + 1 forward while in draft
+        force = driving.copy()
+        force[:, :-1] -= spring
+        force[:, 1:] += spring
+
+        diagonal = mass + (dt * resistance_damping)
+        diagonal[:, :-1] += coupling
+        diagonal[:, 1:] += coupling
+        right = (mass * speeds) + (dt * force)
+
+        new_speeds = solve_tridiagonal(-coupling, diagonal, -coupling, right)
+        new_speeds = np.where(parameters.valid, new_speeds, 0)
+
+        # Move every car, then measure offsets from the lead car again
+        advance = dt * new_speeds[:, 0]
+        self.offsets = self.offsets + (dt * (new_speeds - new_speeds[:, :1]))
+        self.offsets = np.where(parameters.valid, self.offsets, 0)
+        self.speeds = new_speeds
+        return advance, new_speeds[:, 0]
+
+
+def solve_tridiagonal(lower, diagonal, upper, right):
+    # Thomas algorithm along the last axis, vectorized over every other axis.
+    # lower[..., j] and upper[..., j] join unknowns j and j + 1, so they are
+    # one shorter than diagonal and right. The matrix must be diagonally
+    # dominant, as it always is for masses joined by springs and dampers.
+    n = diagonal.shape[-1]
+    c = np.zeros(diagonal.shape)
+    d = np.zeros(diagonal.shape)
+
+    c_prev = np.zeros(diagonal.shape[:-1])
+    d_prev = np.zeros(diagonal.shape[:-1])
+    for j in range(n):
+        a = lower[..., j - 1] if j > 0 else 0
+        denominator = diagonal[..., j] - (a * c_prev)
+        if j < n - 1:
+            c[..., j] = upper[..., j] / denominator
+        d[..., j] = (right[..., j] - (a * d_prev)) / denominator
+        c_prev = c[..., j]
+        d_prev = d[..., j]
+
+    x = np.zeros(diagonal.shape)
+    x[..., n - 1] = d[..., n - 1]
+    for j in range(n - 2, -1, -1):
+        x[..., j] = d[..., j] - (c[..., j] * x[..., j + 1])
+    return x
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+class TrainParameters:
+    def __init__(self, trains, air_drag):
+        # Per-train arrays gathered from the consists, rebuilt by the Simulation
+        # only when trains are added or removed
+        self.mass = np.array([train.consist.mass() for train in trains], dtype=np.float64)
+        self.brake_force = np.array([train.consist.brake_force() for train in trains], dtype=np.float64)
+        self.tractive_effort = np.array([train.consist.tractive_effort() for train in trains], dtype=np.float64)
+        self.power = np.array([train.consist.power() for train in trains], dtype=np.float64)
+        self.drag = np.array([air_drag * len(train.consist.cars) for train in trains], dtype=np.float64)
+
+
+class TrainDynamics:
+    def __init__(self, gravity=9.81, rolling_resistance=0.0015, speed_resistance=0.00003, air_drag=0.6,
+                 curve_resistance=0.5, min_power_speed=1.0):
+        # Longitudinal forces on whole trains, all in SI units with layout units
+        # taken as metres:
+        # - rolling_resistance and speed_resistance are the fractions of the
+        #   train's weight lost to the wheels, constant and per m/s
+        # - air_drag is the drag of each car in N per (m/s)^2
+        # - curve_resistance is the fraction of the weight lost per unit of
+        #   curvature (1 / radius), so 0.5 loses 1% of the weight on a 50 unit curve
+        # - below min_power_speed the pull is limited by tractive effort
+        #   alone rather than by power / speed
+        self.gravity = gravity
+        self.rolling_resistance = rolling_resistance
+        self.speed_resistance = speed_resistance
+        self.air_drag = air_drag
+        self.curve_resistance = curve_resistance
+        self.min_power_speed = min_power_speed
+
+    def get_parameters(self, trains):
+        return TrainParameters(trains, self.air_drag)
+
+    def get_controls(self, trains):
+        throttle = np.array([train.throttle for train in trains], dtype=np.float64)
+        brake = np.array([train.brake for train in trains], dtype=np.float64)
+        return throttle, brake
+
+    def get_forces(self, speed, throttle, brake, slope, curvature, parameters):
+        # (driving, resisting) forces in N for every train. The driving force is
+        # signed along the direction of the train's head: the pull of the
+        # locomotives plus gravity on the grade. The resisting force is the size
+        # of everything that can only oppose motion: brakes, rolling, curves and
+        # air, which the caller applies against the direction of travel.
+        weight = parameters.mass * self.gravity
+        magnitude = np.abs(speed)
+
+        available = np.minimum(parameters.tractive_effort,
+                               parameters.power / np.maximum(magnitude, self.min_power_speed))
+        driving = (np.clip(throttle, -1, 1) * available) - (weight * np.sin(slope))
+
+        resisting = np.clip(brake, 0, 1) * parameters.brake_force
+        resisting += weight * (self.rolling_resistance + (self.speed_resistance * magnitude) +
+                               (self.curve_resistance * np.abs(curvature)))
+        resisting += parameters.drag * speed * speed
+        return driving, resisting
+
+    def update(self, speed, throttle, brake, slope, curvature, parameters, dt):
+        # New speeds after dt. Resisting forces can bring a train to a stand but
+        # never push it backwards, so a braked train on a gentle grade stays put
+        # instead of creeping.
+        driving, resisting = self.get_forces(speed, throttle, brake, slope, curvature, parameters)
+
+        free = speed + ((driving / parameters.mass) * dt)
+        impulse = (resisting / parameters.mass) * dt
+        return np.where(np.abs(free) <= impulse, 0.0, free - (np.sign(free) * impulse))
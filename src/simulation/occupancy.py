@@ -0,0 +1,306 @@
+import bisect
+from collections import defaultdict
+
+import src.constants as constants
+
+
+class SegmentOccupancy:
+    def __init__(self):
+        # Occupied [start, end] distance ranges on one segment, sorted by start
+        self.starts = []
+        self.intervals = []
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def add(self, start, end, train):
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.intervals.insert(i, (start, end, train))
+
+    def remove(self, start, end, train):
+        i = bisect.bisect_left(self.starts, start)
+        while self.intervals[i][2] is not train:
+            i += 1
+        del self.starts[i]
+        del self.intervals[i]
+
+    def query(self, start, end):
+        # Trains with an interval overlapping [start, end]. Intervals are sorted
+        # by start, so only those starting before the end of the range are checked.
+        found = []
+        for i in range(bisect.bisect_right(self.starts, end)):
+            interval_start, interval_end, train = self.intervals[i]
+            if interval_end >= start:
+                found.append(train)
+        return found
+
+    def get_overlaps(self):
+        # Pairs of trains whose intervals overlap, in one sweep over the sorted
+        # intervals while tracking the ones still open. Trains that only touch
+        # end to end do not overlap.
+        pairs = []
+        active = []
+        for start, end, train in self.intervals:
+            active = [interval for interval in active if interval[1] > start]
+            for _, _, other in active:
+                if other is not train:
+                    pairs.append((other, train))
+            active.append((start, end, train))
+        return pairs
+
+
+class OccupancyIndex:
+    def __init__(self, track):
+        # Which parts of which segments every train covers, from its head back
+        # along its length. Trains are updated one at a time, and only the
+        # segments whose intervals changed are checked for overlaps, so the cost
+        # of collision checks grows with the number of trains, not its square.
+        self.track = track
+        self.lengths = [segment.length() for segment in track.segment_list]
+
+        self.segments = defaultdict(SegmentOccupancy)
+        self.footprints = {}
+
+        # Head position and length of every train, and whether its tail hangs
+        # off the end of the track. Footprint pieces are kept with the step the
+        # walk took along them, so a train that moved can be shifted in place.
+        self.heads = {}
+
+        # Overlapping pairs of trains on each segment that has any, and the
+        # number of segments every overlapping pair shares. Both are brought up
+        # to date for the segments changed since the last call to get_collisions.
+        self.overlaps = {}
+        self.pair_counts = {}
+        self.pairs = {}
+        self.dirty = set()
+
+    def get_footprint(self, segment, distance, direction, length):
+        # (segment id, start, end) for every piece of track covered from the head
+        # back to the tail of a train of the given length
+        footprint, _ = self.walk(segment, distance, -1 if direction == constants.DIRECTION_FORWARD else 1, length)
+        return [piece[:3] for piece in footprint]
+
+    def walk(self, segment, distance, step, length):
+        # (segment id, start, end, step) for every piece covered walking length
+        # from distance, step being +1 or -1 in distance along the first
+        # segment, and whether the walk ran off the end of the track
+        footprint = []
+        remaining = length
+
+        while True:
+            segment_length = self.lengths[segment]
+            if step < 0:
+                covered = min(remaining, distance)
+                footprint.append((segment, distance - covered, distance, step))
+                exit_end = constants.END_START
+            else:
+                covered = min(remaining, segment_length - distance)
+                footprint.append((segment, distance, distance + covered, step))
+                exit_end = constants.END_END
+
+            remaining -= covered
+            if remaining <= 0:
+                return footprint, False
+
+            next_segment, entry_end, _ = self.track.get_transition(segment, exit_end)
+            if next_segment < 0:
+                # The tail hangs off the end of the track
+                return footprint, True
+
+            segment = next_segment
+            distance = 0 if entry_end == constants.END_START else self.lengths[segment]
+            step = 1 if entry_end == constants.END_START else -1
+
+    def shift_footprint(self, train, segment, distance, direction, length, moved):
+        # The footprint of a train that moved toward its head by moved, found
+        # by walking only the track gained at one end and trimming the other.
+        # Returns (footprint, removed pieces, added pieces, hanging), or None if
+        # the whole footprint must be walked again.
+        head = self.heads.get(train)
+        if head is None or head[3] != length or head[4]:
+            return None
+
+        old = self.footprints[train]
+        added = []
+        removed = []
+
+        def drop(piece):
+            for i, other in enumerate(added):
+                if other is piece:
+                    del added[i]
+                    return
+            removed.append(piece)
+
+        if moved > 0:
+            # Walk back from the new head to the old one and join them, then
+            # give up as much at the tail
+            step = -1 if direction == constants.DIRECTION_FORWARD else 1
+            gained, hanging = self.walk(segment, distance, step, moved)
+            joint = gained[-1]
+            first = old[0]
+            if hanging or joint[0] != first[0] or joint[3] != first[3]:
+                return None
+            reached = joint[1] if joint[3] < 0 else joint[2]
+            if abs(reached - (first[2] if first[3] < 0 else first[1])) > 1e-6:
+                return None
+            joint = (joint[0], min(joint[1], first[1]), max(joint[2], first[2]), joint[3])
+            added = gained[:-1] + [joint]
+            removed = [first]
+            footprint = added + old[1:]
+
+            trim = moved
+            while trim > 0:
+                piece = footprint[-1]
+                piece_length = piece[2] - piece[1]
+                drop(piece)
+                if piece_length <= trim and len(footprint) > 1:
+                    footprint.pop()
+                    trim -= piece_length
+                    continue
+                if piece[3] < 0:
+                    piece = (piece[0], piece[1] + trim, piece[2], piece[3])
+                else:
+                    piece = (piece[0], piece[1], piece[2] - trim, piece[3])
+                footprint[-1] = piece
+                added.append(piece)
+                break
+        else:
+            # Walk on from the old tail and join it, then give up as much at
+            # the head
+            last = old[-1]
+            tail = last[1] if last[3] < 0 else last[2]
+            gained, hanging = self.walk(last[0], tail, last[3], -moved)
+            joint = gained[0]
+            joint = (joint[0], min(joint[1], last[1]), max(joint[2], last[2]), joint[3])
+            added = [joint] + gained[1:]
+            removed = [last]
+            footprint = old[:-1] + added
+
+            trim = -moved
+            while trim > 0:
+                piece = footprint[0]
+                piece_length = piece[2] - piece[1]
+                drop(piece)
+                if piece_length <= trim and len(footprint) > 1:
+                    footprint.pop(0)
+                    trim -= piece_length
+                    continue
+                if piece[3] < 0:
+                    piece = (piece[0], piece[1], piece[2] - trim, piece[3])
+                else:
+                    piece = (piece[0], piece[1] + trim, piece[2], piece[3])
+                footprint[0] = piece
+                added.append(piece)
+                break
+
+        # The head must have come out where it was placed, or the move was not
+        # along the track (such as being stopped at the end of it)
+        first = footprint[0]
+        step = -1 if direction == constants.DIRECTION_FORWARD else 1
+        position = first[2] if first[3] < 0 else first[1]
+        if first[0] != segment or first[3] != step or abs(position - distance) > 1e-6 or first[1] > first[2]:
+            return None
+        return footprint, removed, added, hanging
+
+    def update_segments(self, changes):
+        # Catches up with the segments returned by Track.get_changes. Trains on
+        # any changed id, or an id that no longer exists, lose their intervals
+        # and are put back by their next update_train.
+        n = len(self.track.segment_list)
+        del self.lengths[n:]
+        self.lengths.extend([0] * (n - len(self.lengths)))
+
+        changed = set()
+        for segment in changes:
+            if segment.layout is self.track:
+                self.lengths[segment.id] = segment.length()
+                changed.add(segment.id)
+
+        for train, footprint in list(self.footprints.items()):
+            if any(piece[0] in changed or piece[0] >= n for piece in footprint):
+                self.remove_train(train)
+
+    def update_train(self, train, segment, distance, direction, length, moved=None):
+        # Moves the train's intervals to its new position. Given how far the
+        # train moved, only the pieces at its two ends are found again and
+        # changed, otherwise the footprint is walked in full and only the
+        # pieces that differ are changed.
+        head = self.heads.get(train)
+        if head is not None and head[:4] == (segment, distance, direction, length):
+            return
+
+        shifted = None
+        if moved is not None and moved != 0:
+            shifted = self.shift_footprint(train, segment, distance, direction, length, moved)
+
+        if shifted is not None:
+            new, removed, added, hanging = shifted
+        else:
+            old = self.footprints.get(train, [])
+            new, hanging = self.walk(segment, distance, -1 if direction == constants.DIRECTION_FORWARD else 1, length)
+            new_pieces = set(new)
+            removed = [piece for piece in old if piece not in new_pieces]
+            old_pieces = set(old)
+            added = [piece for piece in new if piece not in old_pieces]
+
+        for piece in removed:
+            self.segments[piece[0]].remove(piece[1], piece[2], train)
+            self.dirty.add(piece[0])
+        for piece in added:
+            self.segments[piece[0]].add(piece[1], piece[2], train)
+            self.dirty.add(piece[0])
+
+        self.footprints[train] = new
+        self.heads[train] = (segment, distance, direction, length, hanging)
+
+    def remove_train(self, train):
+        self.heads.pop(train, None)
+        for piece in self.footprints.pop(train, []):
+            self.segments[piece[0]].remove(piece[1], piece[2], train)
+            self.dirty.add(piece[0])
+
+    def is_occupied(self, segment, start=0, end=None):
+        # Whether any train covers part of [start, end] on the segment, the whole
+        # segment by default
+        return len(self.get_occupants(segment, start, end)) > 0
+
+    def get_occupants(self, segment, start=0, end=None):
+        if segment not in self.segments:
+            return []
+        if end is None:
+            end = self.lengths[segment]
+        return self.segments[segment].query(start, end)
+
+    def get_occupied_segments(self):
+        return [segment for segment, occupancy in self.segments.items() if len(occupancy) > 0]
+
+    def get_collisions(self):
+        # Pairs of trains currently overlapping anywhere. Only the segments that
+        # changed since the last call are swept again, and the pairs found there
+        # are added to or taken from the running counts. Each pair is reported
+        # once, however many segments they share.
+        for segment in self.dirty:
+            old = self.overlaps.pop(segment, {})
+            new = {}
+            for a, b in self.segments[segment].get_overlaps():
+                key = (id(a), id(b)) if id(a) < id(b) else (id(b), id(a))
+                new[key] = (a, b)
+
+            for key in old:
+                if key not in new:
+                    self.pair_counts[key] -= 1
+                    if self.pair_counts[key] == 0:
+                        del self.pair_counts[key]
+                        del self.pairs[key]
+
+            for key, pair in new.items():
+                if key not in old:
+                    self.pair_counts[key] = self.pair_counts.get(key, 0) + 1
+                    self.pairs.setdefault(key, pair)
+
+            if len(new) > 0:
+                self.overlaps[segment] = new
+        self.dirty = set()
+
+        return list(self.pairs.values())
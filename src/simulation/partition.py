@@ -0,0 +1,228 @@
+import multiprocessing
+
+import numpy as np
+
+from src.layout.segment_table import SegmentTable
+from src.simulation.simulation import Simulation
+
+
+def partition_segments(track, count):
+    # Region of every segment id, splitting the layout in half along its longer
+    # side until there are count regions with about as many segments each.
+    # Neighbouring segments mostly end up in the same region, so trains cross
+    # region boundaries rarely.
+    regions = np.zeros(len(track.segment_list), dtype=np.int64)
+    if len(track.segment_list) == 0:
+        return regions
+
+    centers = np.array([[(box[0] + box[2]) / 2, (box[1] + box[3]) / 2]
+                        for box in (segment.bounds() for segment in track.segment_list)])
+
+    stack = [(np.arange(len(centers)), 0, count)]
+    while len(stack) > 0:
+        ids, first_region, region_count = stack.pop()
+        if region_count == 1 or len(ids) <= 1:
+            regions[ids] = first_region
+            continue
+
+        points = centers[ids]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+
+        # Stable sort with ids as the tie break, so the result never depends on
+        # anything but the layout
+        order = np.lexsort((ids, points[:, axis]))
+        left_count = region_count // 2
+        split = (len(ids) * left_count) // region_count
+
+        stack.append((ids[order[:split]], first_region, left_count))
+        stack.append((ids[order[split:]], first_region + left_count, region_count - left_count))
+
+    return regions
+
+
+def run_region(connection, arrays, regions, region):
+    # Worker process simulating the trains whose heads are in one region. Every
+    # worker has the whole segment table, so trains are stepped by whichever
+    # region they start the tick in and handed off afterwards.
+    table = SegmentTable.from_arrays(arrays)
+    trains = {}
+
+    while True:
+        message = connection.recv()
+        command = message[0]
+
+        if command == 'stop':
+            connection.close()
+            return
+
+        if command == 'add':
+            for record in message[1]:
+                trains[record[0]] = record[1:]
+            continue
+
+        if command == 'remove':
+            for train_id in message[1]:
+                trains.pop(train_id, None)
+            continue
+
+        # ('step', dt, substeps, arrivals, speeds)
+        _, dt, substeps, arrivals, speeds = message
+        for record in arrivals:
+            trains[record[0]] = record[1:]
+
+        ids = sorted(trains.keys())
+        for train_id in ids:
+            segment, distance, direction, _, offsets = trains[train_id]
+            trains[train_id] = (segment, distance, direction, speeds[train_id], offsets)
+
+        if len(ids) == 0:
+            connection.send(([], None, None, None, None, []))
+            continue
+
+        segment = np.array([trains[i][0] for i in ids], dtype=np.int64)
+        distance = np.array([trains[i][1] for i in ids], dtype=np.float64)
+        direction = np.array([trains[i][2] for i in ids], dtype=np.int8)
+        speed = np.array([trains[i][3] for i in ids], dtype=np.float64)
+
+        for _ in range(substeps):
+            segment, distance, direction = table.locate(segment, distance, direction, speed * (dt / substeps))
+
+        counts = np.array([len(trains[i][4]) for i in ids], dtype=np.int64)
+        offsets = np.concatenate([trains[i][4] for i in ids])
+        poses = table.place(
+            np.repeat(segment, counts),
+            np.repeat(distance, counts),
+            np.repeat(direction, counts),
+            offsets, out=np.empty((len(offsets), 5)))
+
+        departures = []
+        for k, train_id in enumerate(ids):
+            record = (int(segment[k]), float(distance[k]), int(direction[k])) + trains[train_id][3:]
+            if regions[segment[k]] != region:
+                departures.append((train_id,) + record)
+                del trains[train_id]
+            else:
+                trains[train_id] = record
+
+        connection.send((ids, segment, distance, direction, poses, departures))
+
+
+class PartitionedSimulation(Simulation):
+    def __init__(self, track, region_count=None, context=None):
+        # Simulation split across worker processes, one per region of the
+        # layout. Each tick every worker steps its trains at the same time and
+        # the main process gathers the results. Trains whose heads end a tick in
+        # another region are handed to that region's worker in train order
+        # before the next tick, so results never depend on process timing.
+        # Trains keep the speed they are given; workers have no TrainDynamics or
+        # CouplerDynamics, so step refuses to run if either is set.
+        Simulation.__init__(self, track)
+
+        if region_count is None:
+            region_count = multiprocessing.cpu_count()
+        if context is None:
+            context = multiprocessing.get_context()
+
+        self.region_count = region_count
+        self.regions = partition_segments(track, region_count)
+        self.revision = track.revision
+
+        self.train_ids = {}
+        self.trains_by_id = {}
+        self.next_train_id = 0
+        self.pending_arrivals = [[] for _ in range(region_count)]
+
+        arrays = self.get_segment_table().get_arrays()
+        self.connections = []
+        self.processes = []
+        for region in range(region_count):
+            parent, child = context.Pipe()
+            process = context.Process(target=run_region, args=(child, arrays, self.regions, region), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def get_record(self, state):
+        segment, distance, direction = self.get_segment_table().from_location(state.cursor)
+        offsets = np.array(state.consist.wheel_offsets(), dtype=np.float64)
+        return (self.train_ids[state], segment, distance, direction, state.speed, offsets)
+
+    def add_train(self, state):
+        train_id = self.next_train_id
+        self.next_train_id += 1
+        self.train_ids[state] = train_id
+        self.trains_by_id[train_id] = state
+
+        record = self.get_record(state)
+        self.connections[self.regions[record[1]]].send(('add', [record]))
+        return Simulation.add_train(self, state)
+
+    def remove_train(self, state):
+        train_id = self.train_ids.pop(state)
+        del self.trains_by_id[train_id]
+        for connection in self.connections:
+            connection.send(('remove', [train_id]))
+        for arrivals in self.pending_arrivals:
+            arrivals[:] = [record for record in arrivals if record[0] != train_id]
+        Simulation.remove_train(self, state)
+
+    def step(self, dt, substeps=1):
+        if self.track.revision != self.revision:
+            raise AssertionError('The layout changed, create a new PartitionedSimulation')
+        if self.dynamics is not None or self.couplers is not None:
+            raise AssertionError('PartitionedSimulation does not support dynamics or couplers')
+
+        speeds = {self.train_ids[train]: train.speed for train in self.trains}
+        for region, connection in enumerate(self.connections):
+            arrivals = sorted(self.pending_arrivals[region], key=lambda record: record[0])
+            connection.send(('step', dt, substeps, arrivals, speeds))
+            self.pending_arrivals[region] = []
+
+        table = self.get_segment_table()
+        heads = {}
+        for connection in self.connections:
+            ids, segment, distance, direction, poses, departures = connection.recv()
+
+            start = 0
+            for k, train_id in enumerate(ids):
+                state = self.trains_by_id[train_id]
+                state.move_to(table.segments[segment[k]], float(distance[k]), int(direction[k]))
+                end = start + len(state.poses)
+                state.poses[:] = poses[start:end]
+                start = end
+                heads[train_id] = (segment[k], distance[k], direction[k])
+
+            for record in departures:
+                self.pending_arrivals[self.regions[record[1]]].append(record)
+
+        if len(self.trains) > 0:
+            segment = np.array([heads[self.train_ids[train]][0] for train in self.trains], dtype=np.int64)
+            distance = np.array([heads[self.train_ids[train]][1] for train in self.trains], dtype=np.float64)
+            direction = np.array([heads[self.train_ids[train]][2] for train in self.trains], dtype=np.int8)
+
+            # Speeds are constant through a tick, so this is how far every
+            # worker moved each train, letting the occupancy index shift it
+            moved = np.array([speeds[self.train_ids[train]] for train in self.trains], dtype=np.float64) * dt
+            self.update_occupancy(segment, distance, direction, moved)
+
+        self.time += dt
+
+        for callback in self.subscribers:
+            callback(self)
+
+    def get_region_counts(self):
+        # Number of trains each region will step on the next tick
+        counts = [0] * self.region_count
+        for train in self.trains:
+            counts[self.regions[train.cursor.track_id()]] += 1
+        return counts
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(('stop',))
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -0,0 +1,130 @@
+import math
+import threading
+
+import numpy as np
+
+from src.simulation.train_state import POSE_H
+
+
+class SimulationScheduler:
+    def __init__(self, simulation, rate=60, substeps=1, max_steps=5, threaded=False):
+        # Steps a Simulation at a fixed rate, however often update is called.
+        # Time left over between steps is used to interpolate poses between the
+        # last two steps, so rendering stays smooth at any frame rate. At most
+        # max_steps are taken to catch up on one update, anything beyond that is
+        # dropped and the simulation runs slower than real time instead.
+        #
+        # With threaded set, steps run on a worker thread and update only hands
+        # it more time. Subscribers are always called from update, on the
+        # caller's thread. Trains should only be added or removed while the
+        # worker is stopped.
+        self.simulation = simulation
+        self.step_dt = 1 / rate
+        self.substeps = substeps
+        self.max_steps = max_steps
+
+        self.subscribers = []
+        self.accumulator = 0
+        self.alpha = 0
+
+        # Poses of every train after the last two steps
+        self.previous = {}
+        self.current = {}
+        self.publish()
+        self.previous = self.current
+
+        self.lock = threading.Condition()
+        self.running = False
+        self.thread = None
+        if threaded:
+            self.start()
+
+    def subscribe(self, callback):
+        # Callbacks are called with the scheduler after every update
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run_worker, name='simulation', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+
+        with self.lock:
+            self.running = False
+            self.lock.notify()
+        self.thread.join()
+        self.thread = None
+
+    def take_steps(self):
+        # Number of steps due, dropping time beyond the catch-up limit
+        steps = math.floor(self.accumulator / self.step_dt)
+        if steps > self.max_steps:
+            self.accumulator -= (steps - self.max_steps) * self.step_dt
+            steps = self.max_steps
+        return steps
+
+    def run_steps(self, steps):
+        for _ in range(steps):
+            self.simulation.step(self.step_dt, self.substeps)
+            with self.lock:
+                self.publish()
+                self.accumulator -= self.step_dt
+
+    def publish(self):
+        self.previous = self.current
+        self.current = {train: np.copy(train.poses) for train in self.simulation.trains}
+
+    def run_worker(self):
+        while True:
+            with self.lock:
+                while self.running and self.accumulator < self.step_dt:
+                    self.lock.wait()
+                if not self.running:
+                    return
+                steps = self.take_steps()
+            self.run_steps(steps)
+
+    def update(self, dt):
+        with self.lock:
+            self.accumulator += dt
+            if self.thread is not None:
+                self.lock.notify()
+            else:
+                steps = self.take_steps()
+
+        if self.thread is None:
+            self.run_steps(steps)
+
+        with self.lock:
+            self.alpha = min(max(self.accumulator / self.step_dt, 0), 1)
+
+        for callback in self.subscribers:
+            callback(self)
+
+    def get_poses(self, state):
+        # Poses part way between the last two steps
+        with self.lock:
+            current = self.current.get(state)
+            previous = self.previous.get(state)
+            alpha = self.alpha
+
+        if current is None:
+            return state.poses
+        if previous is None or previous.shape != current.shape:
+            return current
+        return interpolate_poses(previous, current, alpha)
+
+
+def interpolate_poses(previous, current, alpha):
+    poses = previous + ((current - previous) * alpha)
+
+    # Headings take the short way around
+    dh = np.remainder(current[:, POSE_H] - previous[:, POSE_H] + math.pi, 2 * math.pi) - math.pi
+    poses[:, POSE_H] = previous[:, POSE_H] + (dh * alpha)
+    return poses
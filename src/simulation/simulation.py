@@ -0,0 +1,238 @@
+import numpy as np
+
+import src.stats as stats
+from src.layout.segment_table import SegmentTable
+from src.simulation.occupancy import OccupancyIndex
+from src.simulation.train_state import POSE_SLOPE
+
+
+class Simulation:
+    def __init__(self, track, dynamics=None, couplers=None):
+        # Pure simulation of trains on a Track. Nothing here depends on panda3d,
+        # renderers subscribe to be told when the train states have changed.
+        # With a TrainDynamics, speeds follow from each train's controls and the
+        # grade and curvature under it, otherwise trains keep the speed they are
+        # given. With CouplerDynamics every car moves on its own, and a train's
+        # speed is the speed of its lead car.
+        self.track = track
+        self.trains = []
+        self.subscribers = []
+        self.time = 0
+
+        self.segment_table = None
+        self.segment_table_revision = -1
+
+        # Track covered by every train, and the pairs of trains overlapping
+        # after the last step
+        self.occupancy = None
+        self.occupancy_revision = -1
+        self.collisions = []
+
+        # Wheelset offsets of every train concatenated, and the length of every
+        # train, rebuilt when trains change. Every wheelset is placed into one
+        # row of poses, and each train's poses is a view of its rows, so
+        # placing the trains allocates nothing new.
+        self.wheel_offsets = None
+        self.wheel_counts = None
+        self.poses = None
+        self.train_lengths = None
+
+        # Mass, brakes and power of every train, and the mean slope and
+        # curvature under each train's wheelsets after the last placement
+        self.dynamics = dynamics
+        self.train_parameters = None
+        self.train_slopes = None
+        self.train_curvatures = None
+
+        # Per-car state, and the slope and curvature under every wheelset
+        self.couplers = couplers
+        self.wheel_slopes = None
+        self.wheel_curvatures = None
+        if couplers is not None:
+            self.dynamics = couplers.dynamics
+
+    def get_segment_table(self):
+        # After edits only the changed rows are rewritten
+        if self.segment_table_revision != self.track.revision:
+            changes = None
+            if self.segment_table is not None:
+                changes = self.track.get_changes(self.segment_table_revision)
+
+            if changes is None:
+                self.segment_table = SegmentTable(self.track)
+            else:
+                self.segment_table.update(self.track, changes)
+            self.segment_table_revision = self.track.revision
+        return self.segment_table
+
+    def get_occupancy(self):
+        if self.occupancy_revision != self.track.revision:
+            changes = None
+            if self.occupancy is not None:
+                changes = self.track.get_changes(self.occupancy_revision)
+
+            if changes is None:
+                self.occupancy = OccupancyIndex(self.track)
+            else:
+                self.occupancy.update_segments(changes)
+            self.occupancy_revision = self.track.revision
+        return self.occupancy
+
+    def add_train(self, state):
+        self.trains.append(state)
+        self.wheel_offsets = None
+        self.train_lengths = None
+        self.train_parameters = None
+        self.place_trains()
+        return state
+
+    def remove_train(self, state):
+        self.trains.remove(state)
+        self.wheel_offsets = None
+        self.train_lengths = None
+        self.train_parameters = None
+        self.get_occupancy().remove_train(state)
+        self.collisions = self.get_occupancy().get_collisions()
+
+        # The slopes and curvatures of the trains left are found again on the
+        # next placement
+        self.train_slopes = None
+        self.train_curvatures = None
+
+    def subscribe(self, callback):
+        # Callbacks are called with the simulation after every step
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.subscribers.remove(callback)
+
+    def get_heads(self):
+        table = self.get_segment_table()
+        heads = [table.from_location(train.cursor) for train in self.trains]
+        segment = np.array([head[0] for head in heads], dtype=np.int64)
+        distance = np.array([head[1] for head in heads], dtype=np.float64)
+        direction = np.array([head[2] for head in heads], dtype=np.int8)
+        return segment, distance, direction
+
+    def get_poses(self, state):
+        # Renderers read poses through here, so they can be given a
+        # SimulationScheduler instead to get interpolated poses
+        return state.poses
+
+    def step(self, dt, substeps=1):
+        # Advances every train by dt, in the given number of equal substeps.
+        # Wheelsets are only placed and subscribers only told once, at the end.
+        with stats.timer('Simulation:Step'):
+            if len(self.trains) > 0:
+                table = self.get_segment_table()
+                segment, distance, direction = self.get_heads()
+                speed = np.array([train.speed for train in self.trains], dtype=np.float64)
+
+                if self.dynamics is not None:
+                    if self.train_slopes is None:
+                        self.place_trains()
+                    parameters = self.get_train_parameters()
+                    throttle, brake = self.dynamics.get_controls(self.trains)
+
+                if self.couplers is not None:
+                    car_slopes = self.couplers.get_car_values(self.wheel_slopes)
+                    car_curvatures = self.couplers.get_car_values(self.wheel_curvatures)
+
+                # Speeds are updated before moving (semi-implicit Euler), using the
+                # grade and curvature from the start of the step. How far each
+                # train moved lets the occupancy index shift it in place.
+                moved = np.zeros(len(self.trains))
+                for _ in range(substeps):
+                    if self.couplers is not None:
+                        advance, speed = self.couplers.update(throttle, brake, car_slopes, car_curvatures,
+                                                              dt / substeps)
+                    else:
+                        if self.dynamics is not None:
+                            speed = self.dynamics.update(speed, throttle, brake, self.train_slopes,
+                                                         self.train_curvatures, parameters, dt / substeps)
+                        advance = speed * (dt / substeps)
+                    segment, distance, direction = table.locate(segment, distance, direction, advance)
+                    moved += advance
+
+                for i, train in enumerate(self.trains):
+                    train.move_to(table.segments[segment[i]], float(distance[i]), int(direction[i]))
+                    if self.dynamics is not None:
+                        train.speed = float(speed[i])
+
+                self.place_trains(segment, distance, direction, moved)
+
+            self.time += dt
+
+        for callback in self.subscribers:
+            callback(self)
+
+    def place_trains(self, segment=None, distance=None, direction=None, moved=None):
+        # Places every wheelset of every train with a single SegmentTable call.
+        # moved is how far each train went since it was last placed, if known.
+        if len(self.trains) == 0:
+            return
+
+        if segment is None:
+            segment, distance, direction = self.get_heads()
+
+        if self.wheel_offsets is None:
+            offsets = []
+            counts = []
+            for train in self.trains:
+                train_offsets = train.consist.wheel_offsets()
+                offsets.extend(train_offsets)
+                counts.append(len(train_offsets))
+            self.wheel_offsets = np.array(offsets, dtype=np.float64)
+            self.wheel_counts = np.array(counts, dtype=np.int64)
+
+            self.poses = np.zeros((len(offsets), 5))
+            start = 0
+            for train, count in zip(self.trains, counts):
+                train.poses = self.poses[start:start + count]
+                start += count
+
+            if self.couplers is not None:
+                self.couplers.sync(self.trains)
+
+        self.update_occupancy(segment, distance, direction, moved)
+
+        # Cars shift from their rigid places as their couplers take up slack
+        wheel_offsets = self.wheel_offsets
+        if self.couplers is not None:
+            wheel_offsets = wheel_offsets + self.couplers.get_wheel_offsets()
+
+        table = self.get_segment_table()
+        wheel_segment, wheel_distance, wheel_direction = table.locate(
+            np.repeat(segment, self.wheel_counts),
+            np.repeat(distance, self.wheel_counts),
+            np.repeat(direction, self.wheel_counts),
+            wheel_offsets)
+        poses = table.evaluate(wheel_segment, wheel_distance, wheel_direction, out=self.poses)
+
+        if self.dynamics is not None:
+            starts = np.cumsum(self.wheel_counts) - self.wheel_counts
+            # Curves resist whichever way they turn, so reverse curves under one
+            # train add up rather than cancelling
+            self.wheel_slopes = poses[:, POSE_SLOPE]
+            self.wheel_curvatures = np.abs(table.get_curvature(wheel_segment, wheel_distance))
+            self.train_slopes = np.add.reduceat(self.wheel_slopes, starts) / self.wheel_counts
+            self.train_curvatures = np.add.reduceat(self.wheel_curvatures, starts) / self.wheel_counts
+
+    def get_train_parameters(self):
+        if self.train_parameters is None:
+            self.train_parameters = self.dynamics.get_parameters(self.trains)
+        return self.train_parameters
+
+    def update_occupancy(self, segment, distance, direction, moved=None):
+        # Moves every train in the occupancy index to its new head position
+        if self.train_lengths is None:
+            self.train_lengths = [train.consist.length() for train in self.trains]
+
+        occupancy = self.get_occupancy()
+        segment = segment.tolist()
+        distance = distance.tolist()
+        direction = direction.tolist()
+        moved = [None] * len(self.trains) if moved is None else moved.tolist()
+        for i, train in enumerate(self.trains):
+            occupancy.update_train(train, segment[i], distance[i], direction[i], self.train_lengths[i], moved[i])
+        self.collisions = occupancy.get_collisions()
@@ -0,0 +1,50 @@
+import numpy as np
+
+from src.layout.track_cursor import TrackCursor
+
+
+POSE_X = 0
+POSE_Y = 1
+POSE_Z = 2
+POSE_H = 3
+POSE_SLOPE = 4
+
+
+class TrainState:
+    def __init__(self, loc, consist, speed=0):
+        # Head of the train, moving in the direction of its location. The head
+        # is kept as a cursor moved in place every step, and only turned into a
+        # Location object when something asks for loc.
+        self.cursor = TrackCursor.from_location(loc)
+        self.location = loc
+        self.consist = consist
+        self.speed = speed
+
+        # Driver controls, from -1 (full reverse) to 1 and from 0 to 1. Only used
+        # when the Simulation has TrainDynamics, otherwise speed stays as set.
+        self.throttle = 0
+        self.brake = 0
+
+        # One row per wheelset (front and back of each car in order), holding
+        # x, y, z, h and slope. Filled in by the Simulation every step.
+        self.poses = np.zeros((2 * len(consist.cars), 5))
+
+    @property
+    def loc(self):
+        if self.location is None:
+            self.location = self.cursor.to_location()
+        return self.location
+
+    @loc.setter
+    def loc(self, loc):
+        self.cursor.set_location(loc)
+        self.location = loc
+
+    def move_to(self, segment, distance, direction):
+        # Moves the head without allocating a new Location
+        self.cursor.set(segment, distance, direction)
+        self.location = None
+
+    def wheel_locations(self):
+        # Unbatched wheelset locations, mostly useful for debugging and tests
+        return [self.loc.get_offset(offset) for offset in self.consist.wheel_offsets()]
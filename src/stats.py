@@ -0,0 +1,140 @@
+import csv
+import json
+import time
+from collections import defaultdict, deque
+
+
+# Checked by every instrumented call site before doing anything else, so that
+# instrumentation costs a single attribute lookup while disabled
+enabled = False
+
+# Only the most recent frames are kept, so long runs with stats enabled do
+# not grow without bound. 100000 frames is about half an hour at 60 fps.
+MAX_FRAMES = 100000
+
+counters = defaultdict(int)
+times = defaultdict(float)
+frames = deque(maxlen=MAX_FRAMES)
+frame_count = 0
+
+# PStatCollectors by name, when panda3d is available and PStats is in use
+collectors = {}
+use_pstats = False
+
+
+class Timer:
+    def __init__(self, name):
+        # Times a block into the per-frame totals and, if enabled, the PStats
+        # collector of the same name
+        self.name = name
+        self.start = 0
+        self.collector = None
+        if use_pstats:
+            self.collector = get_collector(name)
+
+    def __enter__(self):
+        if self.collector is not None:
+            self.collector.start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        times[self.name] += time.perf_counter() - self.start
+        if self.collector is not None:
+            self.collector.stop()
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def enable(pstats=False, max_frames=MAX_FRAMES):
+    # With pstats set, timers also feed PStats collectors and the client is
+    # connected to a running pstats server
+    global enabled, use_pstats, frames
+    enabled = True
+    use_pstats = pstats
+    if frames.maxlen != max_frames:
+        frames = deque(frames, maxlen=max_frames)
+    if pstats:
+        from panda3d.core import PStatClient
+        if not PStatClient.isConnected():
+            PStatClient.connect()
+
+
+def disable():
+    global enabled, use_pstats
+    enabled = False
+    use_pstats = False
+
+
+def get_collector(name):
+    if name not in collectors:
+        from panda3d.core import PStatCollector
+        collectors[name] = PStatCollector(name)
+    return collectors[name]
+
+
+def timer(name):
+    if not enabled:
+        return NULL_TIMER
+    return Timer(name)
+
+
+def count(name, amount=1):
+    counters[name] += amount
+
+
+def end_frame():
+    # Records the counters and times of the frame that just ended and starts
+    # the next one from zero
+    global frame_count
+    if not enabled:
+        return
+
+    row = {'frame': frame_count}
+    frame_count += 1
+    row.update(counters)
+    for name, seconds in times.items():
+        row[name + ' (ms)'] = seconds * 1000
+    frames.append(row)
+
+    counters.clear()
+    times.clear()
+
+
+def reset():
+    global frame_count
+    counters.clear()
+    times.clear()
+    frames.clear()
+    frame_count = 0
+
+
+def get_columns():
+    columns = ['frame']
+    for row in frames:
+        for name in row:
+            if name not in columns:
+                columns.append(name)
+    return columns
+
+
+def dump_csv(path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=get_columns(), restval=0)
+        writer.writeheader()
+        writer.writerows(frames)
+
+
+def dump_json(path):
+    with open(path, 'w') as f:
+        json.dump(list(frames), f, indent=2)
@@ -0,0 +1,319 @@
+import numpy as np
+from panda3d.core import Shader, Texture, GeomEnums, OmniBoundingVolume
+
+import src.stats as stats
+
+
+INSTANCE_VERTEX_SHADER = """
+#version 140
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform mat3 p3d_NormalMatrix;
+uniform samplerBuffer instance_transforms;
+
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+in vec2 p3d_MultiTexCoord0;
+
+out vec3 normal;
+out vec2 texcoord;
+
+void main() {
+    // Each instance transform is stored as four rows of a panda matrix
+    int row = gl_InstanceID * 4;
+    mat4 instance = mat4(
+        texelFetch(instance_transforms, row),
+        texelFetch(instance_transforms, row + 1),
+        texelFetch(instance_transforms, row + 2),
+        texelFetch(instance_transforms, row + 3));
+
+    gl_Position = p3d_ModelViewProjectionMatrix * instance * p3d_Vertex;
+    normal = normalize(p3d_NormalMatrix * (mat3(instance) * p3d_Normal));
+    texcoord = p3d_MultiTexCoord0;
+}
+"""
+
+INSTANCE_FRAGMENT_SHADER = """
+#version 140
+
+uniform sampler2D p3d_Texture0;
+uniform vec4 p3d_ColorScale;
+
+uniform struct {
+    vec4 baseColor;
+} p3d_Material;
+
+uniform struct {
+    vec4 ambient;
+} p3d_LightModel;
+
+uniform struct {
+    vec4 color;
+    vec4 position;
+} p3d_LightSource[4];
+
+in vec3 normal;
+in vec2 texcoord;
+
+out vec4 color;
+
+void main() {
+    vec3 n = normalize(normal);
+    vec3 light = p3d_LightModel.ambient.rgb;
+    for (int i = 0; i < 4; i++) {
+        // Only directional lights (w = 0) are used by the scene
+        if (p3d_LightSource[i].position.w == 0.0) {
+            light += p3d_LightSource[i].color.rgb * max(dot(n, normalize(p3d_LightSource[i].position.xyz)), 0.0);
+        }
+    }
+
+    vec4 base = texture(p3d_Texture0, texcoord) * p3d_Material.baseColor * p3d_ColorScale;
+    color = vec4(base.rgb * light, base.a);
+}
+"""
+
+
+PLACEHOLDER_MODEL = 'assets/models/cube.glb'
+
+
+class ModelPool:
+    def __init__(self, base, assets=None, hardware_instancing=None):
+        # Loads each model once and hands out instances of it. By default every
+        # instance is a node that shares the prototype's geometry through
+        # instanceTo. With hardware instancing, all instances of a model are
+        # drawn in a single call and only their transforms are stored per instance.
+        #
+        # With an AssetManager, models that are not loaded yet are loaded in the
+        # background and instances show the placeholder model until they arrive.
+        self.base = base
+        self.assets = assets
+        self.prototypes = {}
+        self.groups = {}
+        self.waiting = {}
+
+        if hardware_instancing is None:
+            hardware_instancing = supports_hardware_instancing(base)
+        self.hardware_instancing = hardware_instancing
+
+    def is_loaded(self, path):
+        return path in self.prototypes or (self.assets is not None and self.assets.is_loaded(path))
+
+    def get_prototype(self, path):
+        if path not in self.prototypes:
+            if self.assets is not None:
+                self.prototypes[path] = self.assets.load_model(path)
+            else:
+                self.prototypes[path] = self.base.loader.loadModel(path)
+        return self.prototypes[path]
+
+    def request_prototype(self, path, callback):
+        # Calls callback(prototype) when the model is available
+        if self.assets is None or self.is_loaded(path):
+            callback(self.get_prototype(path))
+            return
+
+        if path in self.waiting:
+            self.waiting[path].append(callback)
+            return
+
+        self.waiting[path] = [callback]
+
+        def on_loaded(model):
+            self.prototypes[path] = model
+            for waiting in self.waiting.pop(path):
+                waiting(model)
+
+        self.assets.load_model_async(path, on_loaded)
+
+    def instance(self, path, parent=None):
+        # Returns something with setPos/setH/setR/removeNode for the new instance
+        if parent is None:
+            parent = self.base.render
+
+        if self.hardware_instancing:
+            return self.get_group(path, parent).add_instance()
+
+        placeholder = parent.attachNewNode(path)
+        if self.is_loaded(path):
+            self.get_prototype(path).instanceTo(placeholder)
+            return placeholder
+
+        if self.is_loaded(PLACEHOLDER_MODEL):
+            self.get_prototype(PLACEHOLDER_MODEL).instanceTo(placeholder)
+
+        def on_loaded(prototype):
+            # The instance may have been removed while the model was loading
+            if placeholder.isEmpty():
+                return
+            placeholder.getChildren().detach()
+            prototype.instanceTo(placeholder)
+
+        self.request_prototype(path, on_loaded)
+        return placeholder
+
+    def get_group(self, path, parent):
+        key = (path, parent.getKey())
+        if key not in self.groups:
+            group = InstanceGroup(self.base, parent)
+            self.groups[key] = group
+            self.request_prototype(path, group.set_prototype)
+        return self.groups[key]
+
+    def cleanup(self):
+        for group in self.groups.values():
+            group.cleanup()
+        self.groups = {}
+
+
+class InstanceGroup:
+    def __init__(self, base, parent, capacity=64):
+        self.base = base
+        self.parent = parent
+        self.capacity = 0
+        self.count = 0
+
+        # Position and hpr of every instance, composed into matrices once per frame
+        self.positions = np.zeros((0, 3), dtype=np.float32)
+        self.hprs = np.zeros((0, 3), dtype=np.float32)
+        self.handles = []
+        self.dirty = False
+
+        self.texture = Texture('instance_transforms')
+
+        # Created once the prototype is loaded, until then nothing is drawn
+        self.model = None
+
+        self.reserve(capacity)
+
+        self.task = self.base.taskMgr.add(self.upload_task, 'instance_upload', sort=49)
+
+    def set_prototype(self, prototype):
+        self.model = prototype.copyTo(self.parent)
+        self.model.setShader(Shader.make(Shader.SL_GLSL, INSTANCE_VERTEX_SHADER, INSTANCE_FRAGMENT_SHADER))
+        self.model.setShaderInput('instance_transforms', self.texture)
+        self.model.setInstanceCount(self.count)
+
+        # Instances are placed by the shader, so the prototype bounds mean nothing
+        self.model.node().setBounds(OmniBoundingVolume())
+        self.model.node().setFinal(True)
+
+    def update_instance_count(self):
+        if self.model is not None:
+            self.model.setInstanceCount(self.count)
+
+    def reserve(self, capacity):
+        if capacity <= self.capacity:
+            return
+
+        self.positions = np.concatenate([self.positions, np.zeros((capacity - self.capacity, 3), dtype=np.float32)])
+        self.hprs = np.concatenate([self.hprs, np.zeros((capacity - self.capacity, 3), dtype=np.float32)])
+        self.capacity = capacity
+
+        self.texture.setupBufferTexture(4 * capacity, Texture.T_float, Texture.F_rgba32, GeomEnums.UH_dynamic)
+        self.dirty = True
+
+    def add_instance(self):
+        if self.count == self.capacity:
+            self.reserve(2 * self.capacity)
+
+        handle = InstanceHandle(self, self.count)
+        self.handles.append(handle)
+        self.count += 1
+        self.update_instance_count()
+        self.dirty = True
+        return handle
+
+    def remove_instance(self, handle):
+        # Moves the last instance into the removed slot to keep the buffer packed
+        last = self.count - 1
+        moved = self.handles[last]
+        self.positions[handle.index] = self.positions[last]
+        self.hprs[handle.index] = self.hprs[last]
+        self.handles[handle.index] = moved
+        moved.index = handle.index
+
+        self.handles.pop()
+        self.count -= 1
+        self.update_instance_count()
+        self.dirty = True
+
+    def upload_task(self, task):
+        if self.dirty:
+            self.upload()
+        return task.cont
+
+    def upload(self):
+        with stats.timer('Train:Upload'):
+            transforms = compose_transforms(self.positions[:self.count], self.hprs[:self.count])
+            data = memoryview(self.texture.modifyRamImage()).cast('B').cast('f')
+            data[:transforms.size] = transforms.ravel()
+            self.dirty = False
+
+    def cleanup(self):
+        self.base.taskMgr.remove(self.task)
+        if self.model is not None:
+            self.model.removeNode()
+
+
+class InstanceHandle:
+    def __init__(self, group, index):
+        self.group = group
+        self.index = index
+
+    def setPos(self, x, y, z):
+        self.group.positions[self.index] = (x, y, z)
+        self.group.dirty = True
+
+    def setH(self, h):
+        self.group.hprs[self.index, 0] = h
+        self.group.dirty = True
+
+    def setP(self, p):
+        self.group.hprs[self.index, 1] = p
+        self.group.dirty = True
+
+    def setR(self, r):
+        self.group.hprs[self.index, 2] = r
+        self.group.dirty = True
+
+    def removeNode(self):
+        self.group.remove_instance(self)
+
+
+def compose_transforms(positions, hprs):
+    # Panda matrices (row vectors) for every position and hpr in degrees, the
+    # same as TransformState.makePosHpr(...).getMat() for each row
+    h, p, r = np.radians(hprs.astype(np.float64)).T
+    ch, sh = np.cos(h), np.sin(h)
+    cp, sp = np.cos(p), np.sin(p)
+    cr, sr = np.cos(r), np.sin(r)
+
+    n = len(positions)
+    mats = np.zeros((n, 4, 4), dtype=np.float32)
+
+    # Roll about y, then pitch about x, then heading about z
+    mats[:, 0, 0] = (cr * ch) - (sr * sp * sh)
+    mats[:, 0, 1] = (cr * sh) + (sr * sp * ch)
+    mats[:, 0, 2] = -sr * cp
+    mats[:, 1, 0] = -cp * sh
+    mats[:, 1, 1] = cp * ch
+    mats[:, 1, 2] = sp
+    mats[:, 2, 0] = (sr * ch) + (cr * sp * sh)
+    mats[:, 2, 1] = (sr * sh) - (cr * sp * ch)
+    mats[:, 2, 2] = cr * cp
+    mats[:, 3, :3] = positions
+    mats[:, 3, 3] = 1
+    return mats
+
+
+def supports_hardware_instancing(base):
+    # Software renderers and windowless bases fall back to instanceTo
+    win = getattr(base, 'win', None)
+    if win is None:
+        return False
+
+    gsg = win.getGsg()
+    if gsg is None:
+        return False
+
+    return gsg.getSupportsGeometryInstancing() and gsg.getSupportsBasicShaders() and gsg.getSupportsBufferTexture()
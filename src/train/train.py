@@ -1,86 +1,66 @@
 import math
 
-from src.geometry.point import Point
-from src.layout.components.curve import CurveLocation
+import src.stats as stats
+from src.simulation.train_state import POSE_X, POSE_Y, POSE_Z, POSE_H, POSE_SLOPE
+from src.train.model_pool import ModelPool
 
-import src.constants as constants
+
+CAR_MODEL = "assets/models/simple_car.glb"
+WHEELS_MODEL = "assets/models/simple_wheelset.glb"
 
 
 class TrainCar:
-    def __init__(self, base, track, initial_loc):
+    def __init__(self, base, car, pool):
         self.base = base
-        self.track = track
-
-        self.loc = initial_loc
-
-        self.wheel_offset = 1.5
-        self.wheel_dist = 5
-
-        front_wheel_loc = self.loc.get_offset(-self.wheel_offset)
-        back_wheel_loc = front_wheel_loc.get_offset(-self.wheel_dist)
-
-        self.front_wheels = TrainWheels(self.base, front_wheel_loc, False)
-        self.back_wheels = TrainWheels(self.base, back_wheel_loc, True)
-
-        self.model = self.base.loader.loadModel("assets/models/simple_car.glb")
-        self.model.reparentTo(self.base.render)
-        self.position_model()
-
-    def length(self):
-        return 2 * self.wheel_offset + self.wheel_dist
-
-    def update(self, new_loc):
-        self.loc = new_loc
+        self.car = car
 
-        front_wheel_loc = self.loc.get_offset(-self.wheel_offset)
-        back_wheel_loc = front_wheel_loc.get_offset(-self.wheel_dist)
+        self.front_wheels = TrainWheels(self.base, False, pool)
+        self.back_wheels = TrainWheels(self.base, True, pool)
 
-        self.front_wheels.update_loc(front_wheel_loc)
-        self.back_wheels.update_loc(back_wheel_loc)
+        self.model = pool.instance(CAR_MODEL)
 
-        self.position_model()
+    def set_poses(self, front_pose, back_pose):
+        self.front_wheels.set_pose(front_pose)
+        self.back_wheels.set_pose(back_pose)
 
-    def position_model(self):
-        front_pos = self.front_wheels.loc.get_pos()
-        back_pos = self.back_wheels.loc.get_pos()
+        front_x, front_y, front_z = front_pose[POSE_X], front_pose[POSE_Y], front_pose[POSE_Z]
+        back_x, back_y, back_z = back_pose[POSE_X], back_pose[POSE_Y], back_pose[POSE_Z]
 
-        front_height = self.front_wheels.loc.get_height()
-        back_height = self.back_wheels.loc.get_height()
-
-        x = (front_pos.x + back_pos.x) / 2
-        y = (front_pos.y + back_pos.y) / 2
-        z = (front_height + back_height) / 2
+        x = (front_x + back_x) / 2
+        y = (front_y + back_y) / 2
+        z = (front_z + back_z) / 2
 
         self.model.setPos(x, y, 1 + z)
 
-        dx = back_pos.x - front_pos.x
-        dy = back_pos.y - front_pos.y
+        dx = back_x - front_x
+        dy = back_y - front_y
         angle = math.atan2(dy, dx)
 
         self.model.setH(math.degrees(angle))
 
-        dz = back_height - front_height
-        slope = math.atan2(dz, self.wheel_dist)
+        dz = back_z - front_z
+        slope = math.atan2(dz, self.car.wheel_dist)
 
         self.model.setR(math.degrees(-slope))
 
+    def cleanup(self):
+        self.front_wheels.cleanup()
+        self.back_wheels.cleanup()
+        self.model.removeNode()
+
 
 class TrainWheels:
-    def __init__(self, base, initial_loc, is_reverse):
+    def __init__(self, base, is_reverse, pool):
         self.base = base
-        self.loc = initial_loc
         self.is_reverse = is_reverse
 
-        self.model = self.base.loader.loadModel("assets/models/simple_wheelset.glb")
-        self.model.reparentTo(self.base.render)
-        self.position_model()
+        self.model = pool.instance(WHEELS_MODEL)
 
-    def position_model(self):
-        pos = self.loc.get_pos()
-        self.model.setPos(pos.x, pos.y, self.loc.get_height())
+    def set_pose(self, pose):
+        self.model.setPos(pose[POSE_X], pose[POSE_Y], pose[POSE_Z])
 
-        h = self.loc.get_h()
-        slope = self.loc.get_slope()
+        h = pose[POSE_H]
+        slope = pose[POSE_SLOPE]
         if self.is_reverse:
             h += math.pi
             slope = -slope
@@ -88,31 +68,47 @@ class TrainWheels:
         self.model.setH(math.degrees(h))
         self.model.setR(math.degrees(-slope))
 
-    def update_loc(self, new_loc):
-        self.loc = new_loc
-        self.position_model()
+    def cleanup(self):
+        self.model.removeNode()
 
 
 class Train:
-    def __init__(self, track, start_track, base):
+    def __init__(self, base, simulation, state, pool=None):
+        # Renders a TrainState from a Simulation, moving the models every time
+        # the simulation steps. A SimulationScheduler can be given in place of
+        # the Simulation to draw interpolated poses every frame instead. Trains
+        # should share one ModelPool so that every car and wheelset is an
+        # instance of the same loaded models.
         self.base = base
-        self.track = track
+        self.simulation = simulation
+        self.state = state
+
+        if pool is None:
+            pool = ModelPool(base)
+        self.pool = pool
+
+        self.cars = []
+        for car in self.state.consist.cars:
+            self.cars.append(TrainCar(self.base, car, self.pool))
+
+        self.position_models()
+        self.simulation.subscribe(self.on_simulation_step)
+
+    def on_simulation_step(self, simulation):
+        self.position_models()
 
-        self.loc = CurveLocation(start_track, math.pi, constants.DIRECTION_REVERSE)
-        self.speed = 10
+    def position_models(self):
+        with stats.timer('Train:Position'):
+            poses = self.simulation.get_poses(self.state)
+            for i, car in enumerate(self.cars):
+                car.set_poses(poses[2 * i], poses[2 * i + 1])
 
-        self.length = 15
+        if stats.enabled:
+            # A body and two wheelsets per car
+            stats.count('models_updated', 3 * len(self.cars))
 
+    def cleanup(self):
+        self.simulation.unsubscribe(self.on_simulation_step)
+        for car in self.cars:
+            car.cleanup()
         self.cars = []
-        for i in range(self.length):
-            car = TrainCar(self.base, self.track, self.loc)
-            self.cars.append(car)
-
-    def update(self, dt):
-        offset = self.speed * dt
-        self.loc = self.loc.get_offset(offset)
-
-        loc = self.loc
-        for i in range(self.length):
-            self.cars[i].update(loc)
-            loc = loc.get_offset(-self.cars[i].length())
@@ -1,14 +1,24 @@
+import atexit
 import math
+import sys
 
 from direct.showbase.ShowBase import ShowBase
 from direct.showbase.ShowBaseGlobal import globalClock
 from panda3d.core import AmbientLight, DirectionalLight, Vec3, Vec4
 
+import src.constants as constants
+import src.stats as stats
+from src.assets.asset_manager import AssetManager
 from src.geometry.point import Point
 from src.layout.components.node import Node
 from src.layout.components.straight import Straight
-from src.layout.components.curve import Curve
+from src.layout.components.curve import Curve, CurveLocation
 from src.layout.track import Track
+from src.simulation.consist import Consist
+from src.simulation.scheduler import SimulationScheduler
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from src.train.model_pool import ModelPool
 from src.train.train import Train
 
 
@@ -17,6 +27,11 @@ class MyApp(ShowBase):
         ShowBase.__init__(self)
 
         self.track = None
+        self.simulation = None
+        self.scheduler = None
+        self.assets = AssetManager(self)
+        self.assets.preload()
+        self.model_pool = ModelPool(self, self.assets)
         self.train = None
 
         self.setup_lights()
@@ -66,17 +81,30 @@ class MyApp(ShowBase):
         self.track = Track(nodes, tracks)
         self.track.render(self.render)
 
-        self.train = Train(self.track, t0, self)
+        self.simulation = Simulation(self.track)
+
+        start_loc = CurveLocation(t0, math.pi, constants.DIRECTION_REVERSE)
+        state = self.simulation.add_train(TrainState(start_loc, Consist.uniform(15), 10))
+        # The simulation runs at a fixed rate and trains are drawn between steps
+        self.scheduler = SimulationScheduler(self.simulation)
+        self.train = Train(self, self.scheduler, state, self.model_pool)
 
         self.taskMgr.add(self.update_task, "main_update_loop")
 
     def update_task(self, task):
         dt = globalClock.getDt()
 
-        self.train.update(dt)
+        self.scheduler.update(dt)
+        stats.end_frame()
 
         return task.cont
 
 
+# Run with --stats to send timings to a running pstats server and write
+# per-frame counters to stats.csv on exit
+if '--stats' in sys.argv:
+    stats.enable(pstats=True)
+    atexit.register(stats.dump_csv, 'stats.csv')
+
 app = MyApp()
 app.run()
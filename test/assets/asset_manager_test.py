@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from panda3d.core import Loader, NodePath
+
+from src.assets.asset_manager import AssetManager
+
+
+MODEL_EGG = """
+<CoordinateSystem> { Z-Up }
+<VertexPool> box {
+  <Vertex> 0 { 0 0 0 }
+  <Vertex> 1 { 1 0 0 }
+  <Vertex> 2 { 1 1 0 }
+}
+<Polygon> { <VertexRef> { 0 1 2 <Ref> { box } } }
+"""
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loaded = []
+        self.threads = []
+
+    def loadModel(self, path, noCache=False, callback=None):
+        self.loaded.append(path.getBasename())
+        self.threads.append(threading.current_thread())
+        model = NodePath(Loader.getGlobalPtr().loadSync(path))
+        if callback is not None:
+            callback(model)
+            return None
+        return model
+
+
+class FakeTaskManager:
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, function, name):
+        self.tasks.append(function)
+        return function
+
+
+class FakeBase:
+    def __init__(self):
+        self.loader = CountingLoader()
+        self.taskMgr = FakeTaskManager()
+
+
+class TestAssetManager(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.dir, 'models')
+        self.cache_dir = os.path.join(self.dir, 'cache')
+        os.makedirs(self.models_dir)
+
+        # Egg files stand in for glTF here so the test does not need the glTF plugin
+        self.model_path = os.path.join(self.models_dir, 'triangle.egg')
+        with open(self.model_path, 'w') as f:
+            f.write(MODEL_EGG)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_convert_is_cached_by_content(self):
+        assets = AssetManager(FakeBase(), self.models_dir, self.cache_dir)
+        cache_path = assets.convert(self.model_path)
+
+        self.assertTrue(cache_path.endswith('.bam'))
+        self.assertTrue(os.path.exists(cache_path))
+        self.assertEqual(cache_path, assets.convert(self.model_path))
+        self.assertEqual(['triangle.egg'], assets.base.loader.loaded)
+
+        with open(self.model_path, 'a') as f:
+            f.write('\n')
+        self.assertNotEqual(cache_path, assets.convert(self.model_path))
+
+    def test_loads_from_bam(self):
+        AssetManager(FakeBase(), self.models_dir, self.cache_dir).convert(self.model_path)
+
+        assets = AssetManager(FakeBase(), self.models_dir, self.cache_dir)
+        model = assets.load_model(self.model_path)
+
+        self.assertEqual(1, len(model.findAllMatches('**/+GeomNode')))
+        self.assertTrue(assets.base.loader.loaded[0].endswith('.bam'))
+        self.assertIs(model, assets.load_model(self.model_path))
+
+    def test_async_callbacks(self):
+        assets = AssetManager(FakeBase(), self.models_dir, self.cache_dir)
+        results = []
+
+        assets.load_model_async(self.model_path, results.append)
+        assets.load_model_async(self.model_path, results.append)
+        self.assertEqual(1, len(assets.base.taskMgr.tasks))
+        self.assertEqual([], results)
+
+        # The source is converted off the calling thread, and callbacks are
+        # only called from poll
+        deadline = time.monotonic() + 10
+        while len(results) == 0 and time.monotonic() < deadline:
+            assets.poll()
+            time.sleep(0.01)
+
+        loader = assets.base.loader
+        self.assertEqual(['triangle.egg'], loader.loaded[:1])
+        self.assertIsNot(threading.current_thread(), loader.threads[0])
+        self.assertEqual(0, assets.converting)
+        self.assertEqual(2, len(results))
+        self.assertIs(results[0], results[1])
+        self.assertTrue(assets.is_loaded(self.model_path))
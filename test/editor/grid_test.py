@@ -0,0 +1,36 @@
+import unittest
+
+from panda3d.core import NodePath, TextureStage
+
+from src.editor.grid import Grid, get_grid_texture
+
+
+class FakeBase:
+    def __init__(self):
+        self.render = NodePath('render')
+
+
+class TestGrid(unittest.TestCase):
+    def test_resize_keeps_nodes(self):
+        base = FakeBase()
+        grid = Grid(base, 50, 50)
+        root = grid.root
+        count = len(root.findAllMatches('**/+GeomNode'))
+
+        grid.update_size(100, 20)
+
+        self.assertIs(root, grid.root)
+        self.assertEqual(count, len(root.findAllMatches('**/+GeomNode')))
+        self.assertAlmostEqual(1200, root.getSx())
+        self.assertAlmostEqual(240, root.getSy())
+
+        tex_scale = grid.quad.getTexScale(TextureStage.getDefault())
+        self.assertAlmostEqual(100, tex_scale[0])
+        self.assertAlmostEqual(20, tex_scale[1])
+
+    def test_shared_texture(self):
+        first = Grid(FakeBase(), 10, 10)
+        second = Grid(FakeBase(), 30, 5)
+
+        self.assertEqual(get_grid_texture(), first.quad.getTexture())
+        self.assertEqual(get_grid_texture(), second.quad.getTexture())
@@ -0,0 +1,101 @@
+import random
+import unittest
+
+import numpy as np
+
+from src.geometry.algorithm.graham_scan import graham_scan
+from src.geometry.algorithm.monotone_chain import *
+from src.geometry.convex_hull import ConvexHull
+from src.geometry.point import Point
+
+
+class TestMonotoneChain(unittest.TestCase):
+    def test_empty(self):
+        with self.assertRaises(AssertionError):
+            monotone_chain([])
+        with self.assertRaises(AssertionError):
+            monotone_chain_array(np.zeros((0, 2)))
+
+    def test_single_point(self):
+        p = Point(3, 6)
+        self.assertListEqual([p], monotone_chain([p]))
+
+    def test_two_points(self):
+        p1 = Point(3, 6)
+        p2 = Point(4, 7)
+        self.assertListEqual([p1, p2], monotone_chain([p2, p1]))
+
+    def test_duplicate_points(self):
+        p1 = Point(3, 6)
+        p2 = Point(4, 7)
+        p3 = Point(4, 7)
+        self.assertListEqual([p1, p2], monotone_chain([p1, p2, p3]))
+
+    def test_duplicate_ref_points(self):
+        p1 = Point(3, 6)
+        p2 = Point(3, 6)
+        p3 = Point(4, 7)
+        self.assertListEqual([p1, p3], monotone_chain([p1, p2, p3]))
+
+    def test_collinear_points(self):
+        points = [Point(0, 0), Point(4, 0), Point(2, 0), Point(4, 4), Point(4, 2), Point(2, 2), Point(0, 4)]
+        expected = [Point(0, 0), Point(4, 0), Point(4, 4), Point(0, 4)]
+        self.assertListEqual(expected, monotone_chain(points))
+
+    def test_convex_hull(self):
+        points = [
+            Point(0, 7),
+            Point(6, 9),
+            Point(8, 7),
+            Point(12, 4),
+            Point(10, 2),
+            Point(13, 7),
+            Point(12, 11),
+            Point(3, 2),
+            Point(14, 2),
+            Point(6, 5),
+            Point(3, 2),
+            Point(12, 4),
+            Point(15, 5),
+        ]
+
+        expected = [
+            Point(3, 2),
+            Point(14, 2),
+            Point(15, 5),
+            Point(12, 11),
+            Point(0, 7)
+        ]
+
+        self.assertListEqual(expected, monotone_chain(points))
+
+        result = monotone_chain_array(np.array([(p.x, p.y) for p in points]))
+        self.assertListEqual([[p.x, p.y] for p in expected], result.tolist())
+
+    def test_matches_graham_scan(self):
+        generator = random.Random(1)
+        for count in [3, 10, 100, 1000]:
+            points = [Point(generator.randint(-50, 50), generator.randint(-50, 50)) for _ in range(count)]
+            expected = graham_scan(list(points))
+
+            self.assertListEqual(expected, monotone_chain(points))
+
+            result = monotone_chain_array(np.array([(p.x, p.y) for p in points]))
+            self.assertListEqual([[p.x, p.y] for p in expected], result.tolist())
+
+    def test_array_discards_interior(self):
+        generator = np.random.default_rng(2)
+        points = generator.uniform(-1, 1, (100000, 2))
+        points[:4] = [(-2, -2), (2, -2), (2, 2), (-2, 2)]
+
+        self.assertListEqual([[-2, -2], [2, -2], [2, 2], [-2, 2]], monotone_chain_array(points).tolist())
+
+
+class TestConvexHull(unittest.TestCase):
+    def test_from_points(self):
+        hull = ConvexHull([Point(1, 1), Point(0, 0), Point(2, 0), Point(0, 2), Point(2, 2)])
+        self.assertListEqual([Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)], hull.points)
+
+    def test_from_array(self):
+        hull = ConvexHull(np.array([(1, 1), (0, 0), (2, 0), (0, 2), (2, 2)]))
+        self.assertListEqual([Point(0, 0), Point(2, 0), Point(2, 2), Point(0, 2)], hull.points)
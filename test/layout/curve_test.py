@@ -0,0 +1,36 @@
+import math
+import unittest
+
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+
+
+def create_curve(radius, sweep):
+    start = Node(Point(radius, 0), 0)
+    end = Node(Point(radius * math.cos(sweep), radius * math.sin(sweep)), 0)
+    return Curve(Point(0, 0), radius, 0, sweep, start, end)
+
+
+class TestCurveTessellation(unittest.TestCase):
+    def test_chord_error_within_tolerance(self):
+        for radius, sweep in [(21, 2 * math.pi - 0.1), (50, math.pi), (300, math.pi / 36), (5000, 0.2)]:
+            curve = create_curve(radius, sweep)
+            for tolerance in [0.001, 0.01, 0.1, 1.0]:
+                count = curve.get_segment_count(tolerance)
+                step = sweep / count
+
+                # Chord error is largest in the middle of each chord
+                error = radius * (1 - math.cos(step / 2))
+                self.assertLessEqual(error, tolerance + 1e-12)
+
+                if count > 1:
+                    coarser = radius * (1 - math.cos(sweep / (count - 1) / 2))
+                    self.assertGreater(coarser, tolerance)
+
+    def test_count_scales_with_curvature(self):
+        tight = create_curve(21, math.pi)
+        broad = create_curve(2000, math.pi / 36)
+
+        self.assertGreater(tight.get_segment_count(0.01), broad.get_segment_count(0.01))
+        self.assertEqual(1, broad.get_segment_count(1000))
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.layout.layout_file import LayoutFile, write_layout, export_json, import_json
+from src.layout.segment_table import SegmentTable
+from test.layout.segment_table_test import create_test_track
+from test.layout.spline_test import create_spline_track
+
+
+class TestLayoutFile(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'layout.bin')
+        write_layout(self.path, self.track)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assertSameTrack(self, expected, actual):
+        self.assertEqual(set(expected.nodes.keys()), set(actual.nodes.keys()))
+        self.assertEqual(set(expected.tracks.keys()), set(actual.tracks.keys()))
+
+        for uuid, node in expected.nodes.items():
+            self.assertEqual(node.point.x, actual.nodes[uuid].point.x)
+            self.assertEqual(node.point.y, actual.nodes[uuid].point.y)
+            self.assertEqual(node.height, actual.nodes[uuid].height)
+
+        for uuid, segment in expected.tracks.items():
+            other = actual.tracks[uuid]
+            self.assertEqual(type(segment), type(other))
+            self.assertEqual(segment.length(), other.length())
+            self.assertEqual(segment.get_nodes(), other.get_nodes())
+            connections = {node: connected.uuid for node, connected in segment.connections.items()}
+            self.assertEqual(connections, {node: connected.uuid for node, connected in other.connections.items()})
+
+    def test_round_trip(self):
+        layout = LayoutFile(self.path)
+        self.assertEqual(layout.node_count, 4)
+        self.assertEqual(layout.segment_count, 4)
+        self.assertSameTrack(self.track, layout.to_track())
+        layout.close()
+
+    def test_lazy_segments(self):
+        layout = LayoutFile(self.path)
+        segment = layout.get_segment(1)
+
+        # Only the segment and its neighbours are built
+        self.assertEqual(len(layout.segments), 3)
+        self.assertEqual(len(segment.connections), 2)
+        self.assertEqual(list(self.track.tracks.keys())[1], segment.uuid)
+
+        # Offsets past the end of a built segment follow the file's transitions
+        for offset in [200, -200]:
+            moved = segment.get_location(10, constants.DIRECTION_FORWARD).get_offset(offset)
+            expected = self.track.segment_list[1].get_location(10, constants.DIRECTION_FORWARD).get_offset(offset)
+            self.assertEqual(expected.track_uuid(), moved.track_uuid())
+            self.assertAlmostEqual(expected.get_distance(), moved.get_distance())
+            self.assertIs(layout.get_segment(moved.track_id()), moved.track)
+        layout.close()
+
+    def test_segment_table(self):
+        layout = LayoutFile(self.path)
+        expected = SegmentTable(self.track)
+        table = layout.get_segment_table()
+
+        for name in ['kind', 'length', 'start_x', 'start_y', 'start_z', 'end_x', 'end_y', 'end_z',
+                     'start_angle', 'end_angle', 'next_segment', 'next_end']:
+            np.testing.assert_allclose(getattr(table, name), getattr(expected, name), err_msg=name)
+
+        # The table works without the segments having been built first
+        segment = list(self.track.tracks.values())[0]
+        loc = segment.get_location(10, constants.DIRECTION_FORWARD)
+        moved = table.to_location(*table.locate(*table.from_location(loc), 250))
+        expected_loc = self.track.get_updated_location(loc, 250)
+        self.assertEqual(moved.track_uuid(), expected_loc.track_uuid())
+        self.assertAlmostEqual(moved.get_distance(), expected_loc.get_distance())
+        layout.close()
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+        with self.assertRaises(AssertionError):
+            LayoutFile(self.path)
+
+    def test_json_round_trip(self):
+        path = os.path.join(self.directory.name, 'layout.json')
+        export_json(path, self.track)
+        self.assertSameTrack(self.track, import_json(path))
+
+    def test_splines(self):
+        track = create_spline_track()
+        write_layout(self.path, track)
+        layout = LayoutFile(self.path)
+        self.assertSameTrack(track, layout.to_track())
+
+        table = layout.get_segment_table()
+        expected = SegmentTable(track)
+        for name in ['kind', 'length', 'spline_first', 'spline_last', 'spline_s', 'spline_x', 'spline_y']:
+            np.testing.assert_allclose(getattr(table, name), getattr(expected, name), err_msg=name)
+        layout.close()
+
+        path = os.path.join(self.directory.name, 'layout.json')
+        export_json(path, track)
+        self.assertSameTrack(track, import_json(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
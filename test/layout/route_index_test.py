@@ -0,0 +1,149 @@
+import math
+import sys
+import unittest
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from benchmark.layouts import create_oval
+from src.layout.route_index import RouteIndex
+from src.layout.segment_table import SegmentTable
+from src.layout.track import Track
+from test.layout.segment_table_test import create_test_track
+
+
+def create_zigzag_track(count):
+    # Open chain of short straights, alternating which end each one starts from
+    nodes = [Node(Point(i, (i % 2) * 0.5), i * 0.1) for i in range(count + 1)]
+    tracks = []
+    for i in range(count):
+        if i % 2 == 0:
+            tracks.append(Straight(nodes[i], nodes[i + 1]))
+        else:
+            tracks.append(Straight(nodes[i + 1], nodes[i]))
+    return Track(nodes, tracks), tracks
+
+
+def create_two_ovals(count):
+    # Two ovals in one track that share no nodes, so editing one leaves every
+    # route on the other alone
+    first_nodes, first_tracks = create_oval(count)
+    second_nodes, second_tracks = create_oval(count)
+    return Track(first_nodes + second_nodes, first_tracks + second_tracks), first_nodes, second_tracks
+
+
+def split_straight(track, segment):
+    # Replaces a straight with two halves meeting at a new node
+    start = segment.startNode.point
+    end = segment.endNode.point
+    middle = Node(Point((start.x + end.x) / 2, (start.y + end.y) / 2), segment.startNode.height)
+
+    track.remove_segment(segment)
+    track.add_node(middle)
+    track.add_segment(Straight(segment.startNode, middle))
+    track.add_segment(Straight(middle, segment.endNode))
+
+
+class TestRouteIndex(unittest.TestCase):
+    def assertSameLocation(self, expected, result):
+        self.assertEqual(expected.track_uuid(), result.track_uuid())
+        self.assertEqual(expected.direction, result.direction)
+        self.assertAlmostEqual(expected.get_distance(), result.get_distance())
+
+    def test_loop_matches_segment_table(self):
+        track = create_test_track()
+        table = SegmentTable(track)
+        index = track.get_route_index()
+
+        self.assertEqual(1, len(index.chains))
+        self.assertTrue(index.chains[0].is_loop)
+
+        for segment in track.tracks.values():
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                loc = segment.get_location(segment.length() / 4, direction)
+                for offset in [-2000, -300.5, -10, 0, 10, 99.9, 450, 2000]:
+                    seg, distance, new_direction = table.locate(*table.from_location(loc), offset)
+                    expected = table.to_location(seg, distance, new_direction)
+                    self.assertSameLocation(expected, index.get_offset(loc, offset))
+                    self.assertSameLocation(expected, loc.get_offset(offset))
+
+    def test_long_chain_without_recursion(self):
+        count = 4 * sys.getrecursionlimit()
+        track, tracks = create_zigzag_track(count)
+        table = SegmentTable(track)
+
+        index = track.get_route_index()
+        self.assertEqual(1, len(index.chains))
+        self.assertFalse(index.chains[0].is_loop)
+
+        loc = tracks[0].get_location(0.25, constants.DIRECTION_FORWARD)
+        total = index.chains[0].total_length
+        for offset in [total / 3, total / 2, total - 1]:
+            seg, distance, direction = table.locate(*table.from_location(loc), offset)
+            self.assertSameLocation(table.to_location(seg, distance, direction), loc.get_offset(offset))
+
+        back = tracks[-1].get_location(0.5, constants.DIRECTION_REVERSE)
+        self.assertSameLocation(back.get_offset(-total / 2).get_offset(total / 2), back)
+
+    def test_past_open_end(self):
+        track, tracks = create_zigzag_track(10)
+        loc = tracks[0].get_location(0.5, constants.DIRECTION_FORWARD)
+
+        with self.assertRaises(AssertionError):
+            loc.get_offset(-1)
+        with self.assertRaises(AssertionError):
+            loc.get_offset(100)
+
+    def test_rebuilt_after_change(self):
+        track = create_test_track()
+        index = track.get_route_index()
+        self.assertIs(index, track.get_route_index())
+
+        node = next(iter(track.nodes.values()))
+        node.point = Point(node.point.x, node.point.y + 10)
+        track.mark_changed()
+
+        self.assertIsNot(index, track.get_route_index())
+        self.assertFalse(math.isclose(index.chains[0].total_length, track.get_route_index().chains[0].total_length))
+
+    def assertMatchesFreshIndex(self, track):
+        index = track.get_route_index()
+        expected = RouteIndex(track)
+        self.assertEqual(len(expected.chains), len(index.chains))
+
+        for segment in track.segment_list[::7]:
+            loc = segment.get_location(segment.length() / 3, constants.DIRECTION_FORWARD)
+            chain, _, _ = index.get_chain_position(loc)
+            self.assertAlmostEqual(expected.get_chain_position(loc)[0].total_length, chain.total_length)
+            for offset in [-250, 35.5, 600]:
+                self.assertSameLocation(expected.get_offset(loc, offset), index.get_offset(loc, offset))
+
+    def test_update_after_move(self):
+        track, first_nodes, second_tracks = create_two_ovals(40)
+        index = track.get_route_index()
+        other = index.positions[second_tracks[0].id][0]
+
+        # Node 2 joins two straights on the bottom run of the first oval
+        node = first_nodes[2]
+        node.point = Point(node.point.x, node.point.y + 3)
+
+        self.assertIs(index, track.get_route_index())
+        self.assertIs(other, index.positions[second_tracks[0].id][0])
+        self.assertMatchesFreshIndex(track)
+
+    def test_update_after_split(self):
+        track, first_nodes, second_tracks = create_two_ovals(40)
+        index = track.get_route_index()
+        other = index.positions[second_tracks[0].id][0]
+
+        split_straight(track, track.segment_list[3])
+        split_straight(track, track.segment_list[70])
+
+        self.assertIs(index, track.get_route_index())
+        self.assertEqual(82, len(track.segment_list))
+        self.assertMatchesFreshIndex(track)
+
+        # The last segment, on the second oval, took over a freed id, so that
+        # oval is built again
+        self.assertIsNot(other, index.positions[second_tracks[0].id][0])
@@ -0,0 +1,148 @@
+import math
+import unittest
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from src.layout.route_planner import RoutePlanner, dijkstra, state_for
+from src.layout.track import Track
+from test.layout.route_index_test import create_two_ovals, create_zigzag_track, split_straight
+
+
+def create_junction_track():
+    # A loop with a siding leaving from one of its nodes, so that node joins
+    # three segment ends
+    n0 = Node(Point(0, 50), 0)
+    n1 = Node(Point(100, 50), 0)
+    n2 = Node(Point(100, -50), 0)
+    n3 = Node(Point(0, -50), 0)
+    n4 = Node(Point(200, 50), 0)
+    n5 = Node(Point(300, 50), 0)
+
+    segments = [
+        Curve(Point(0, 0), 50, math.pi / 2, 3 * math.pi / 2, n0, n3),
+        Straight(n0, n1),
+        Curve(Point(100, 0), 50, 3 * math.pi / 2, 5 * math.pi / 2, n2, n1),
+        Straight(n2, n3),
+        Straight(n1, n4),
+        Straight(n5, n4),
+    ]
+    return Track([n0, n1, n2, n3, n4, n5], segments)
+
+
+class TestRoutePlanner(unittest.TestCase):
+    def setUp(self):
+        self.track = create_junction_track()
+        self.planner = self.track.get_route_planner()
+
+    def assertValidRoute(self, route, segment, direction, target):
+        self.assertEqual(route.steps[0], (segment, direction))
+        self.assertEqual(route.steps[-1][0], target)
+
+        distance = 0
+        for (a, a_direction), (b, b_direction) in zip(route.steps, route.steps[1:]):
+            successors = [next_state for next_state, _ in self.planner.successors[state_for(a, a_direction)]]
+            self.assertIn(state_for(b, b_direction), successors)
+            distance += self.track.segment_list[a].length()
+        self.assertAlmostEqual(route.distance, distance)
+
+    def test_matches_dijkstra(self):
+        n = len(self.track.segment_list)
+        for segment in range(n):
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                distances = dijkstra(self.planner.successors, [state_for(segment, direction)])[0]
+
+                for target in range(n):
+                    expected = min(distances[state_for(target, constants.DIRECTION_FORWARD)],
+                                   distances[state_for(target, constants.DIRECTION_REVERSE)])
+
+                    for route in [self.planner.find_route(segment, direction, target),
+                                  self.planner.find_route_astar(segment, direction, target)]:
+                        if expected == math.inf:
+                            self.assertIsNone(route)
+                        else:
+                            self.assertAlmostEqual(route.distance, expected)
+                            self.assertValidRoute(route, segment, direction, target)
+
+    def test_siding(self):
+        # Heading into the loop from the end of the siding
+        route = self.planner.find_route(5, constants.DIRECTION_FORWARD, 0)
+        self.assertEqual(route.segments(), [5, 4, 1, 0])
+        self.assertAlmostEqual(route.distance, 300)
+
+    def test_next_step(self):
+        self.assertEqual(self.planner.get_next_step(5, constants.DIRECTION_FORWARD, 0), (4, constants.DIRECTION_REVERSE))
+        self.assertAlmostEqual(self.planner.get_distance(5, constants.DIRECTION_FORWARD, 0), 300)
+        self.assertIsNone(self.planner.get_next_step(0, constants.DIRECTION_FORWARD, 0))
+
+    def test_unreachable(self):
+        track, _ = create_zigzag_track(6)
+        planner = track.get_route_planner()
+        self.assertIsNone(planner.find_route(3, constants.DIRECTION_REVERSE, 1))
+        self.assertIsNone(planner.find_route_astar(3, constants.DIRECTION_REVERSE, 1))
+
+    def test_from_location(self):
+        loc = self.track.segment_list[1].get_location(40, constants.DIRECTION_FORWARD)
+        route = self.planner.find_route_from_location(loc, 5)
+        self.assertEqual(route.segments(), [1, 4, 5])
+        self.assertAlmostEqual(route.distance, 160)
+
+    def test_cache(self):
+        self.planner.max_cached_targets = 2
+        for target in [0, 1, 2, 1]:
+            self.planner.find_route(4, constants.DIRECTION_REVERSE, target)
+        self.assertEqual(list(self.planner.trees.keys()), [2, 1])
+
+        # Editing the layout replaces the planner and its cache
+        self.assertIs(self.track.get_route_planner(), self.planner)
+        self.track.mark_changed()
+        self.assertIsNot(self.track.get_route_planner(), self.planner)
+
+    def assertMatchesFreshPlanner(self, track, planner):
+        expected = RoutePlanner(track)
+        n = len(track.segment_list)
+        for segment in range(0, n, 9):
+            for target in range(0, n, 13):
+                fresh = expected.find_route(segment, constants.DIRECTION_FORWARD, target)
+                for route in [planner.find_route(segment, constants.DIRECTION_FORWARD, target),
+                              planner.find_route_astar(segment, constants.DIRECTION_FORWARD, target)]:
+                    if fresh is None:
+                        self.assertIsNone(route)
+                    else:
+                        self.assertAlmostEqual(fresh.distance, route.distance)
+
+    def test_update_after_move(self):
+        track, first_nodes, second_tracks = create_two_ovals(40)
+        planner = track.get_route_planner()
+        near = 1
+        far = second_tracks[5].id
+        planner.find_route(0, constants.DIRECTION_FORWARD, near)
+        planner.find_route(far, constants.DIRECTION_FORWARD, far)
+        far_tree = planner.trees[far]
+
+        node = first_nodes[2]
+        node.point = Point(node.point.x, node.point.y + 3)
+
+        # Only the tree towards the oval that moved is dropped
+        self.assertIs(planner, track.get_route_planner())
+        self.assertNotIn(near, planner.trees)
+        self.assertIs(far_tree, planner.trees[far])
+        self.assertMatchesFreshPlanner(track, planner)
+
+    def test_update_after_split(self):
+        track, _, _ = create_two_ovals(40)
+        planner = track.get_route_planner()
+        planner.find_route(0, constants.DIRECTION_FORWARD, 1)
+
+        split_straight(track, track.segment_list[3])
+        split_straight(track, track.segment_list[70])
+
+        self.assertIs(planner, track.get_route_planner())
+        self.assertEqual(2 * len(track.segment_list), len(planner.successors))
+        self.assertMatchesFreshPlanner(track, planner)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+from src.geometry.point import Point
+from src.layout.dimensions.section import Section
+from src.layout.dimensions.section_layout import SectionLayout
+
+
+def rectangle(x, y, width, height):
+    return Section([Point(x, y), Point(x + width, y), Point(x + width, y + height), Point(x, y + height)])
+
+
+class TestSection(unittest.TestCase):
+    def test_contains(self):
+        section = Section([Point(0, 0), Point(10, 0), Point(0, 10)])
+
+        self.assertTrue(section.contains(Point(2, 2)))
+        self.assertTrue(section.contains(Point(5, 5)))
+        self.assertTrue(section.contains(Point(0, 0)))
+        self.assertFalse(section.contains(Point(6, 6)))
+        self.assertFalse(section.contains(Point(-1, 2)))
+
+    def test_overlaps(self):
+        a = rectangle(0, 0, 10, 10)
+
+        self.assertTrue(a.overlaps(rectangle(5, 5, 10, 10)))
+        self.assertTrue(a.overlaps(rectangle(2, 2, 2, 2)))
+        self.assertFalse(a.overlaps(rectangle(10, 0, 10, 10)))
+        self.assertFalse(a.overlaps(rectangle(11, 11, 10, 10)))
+
+    def test_overlaps_diagonal(self):
+        # Bounding boxes overlap but the triangles are separated along the diagonal
+        a = Section([Point(0, 0), Point(10, 0), Point(0, 10)])
+        b = Section([Point(10, 10), Point(10, 1), Point(1, 10)])
+        self.assertTrue(a.bounds_overlap(b))
+        self.assertFalse(a.overlaps(b))
+
+        b.translate(-2, -2)
+        self.assertTrue(a.overlaps(b))
+
+
+class TestSectionLayout(unittest.TestCase):
+    def brute_force(self, sections):
+        pairs = set()
+        for i, a in enumerate(sections):
+            for b in sections[i + 1:]:
+                if a.overlaps(b):
+                    pairs.add(frozenset([a.uuid, b.uuid]))
+        return pairs
+
+    def assertOverlapsMatch(self, layout, sections):
+        result = set(frozenset([a.uuid, b.uuid]) for a, b in layout.get_overlaps())
+        self.assertSetEqual(self.brute_force(sections), result)
+
+    def test_matches_brute_force(self):
+        generator = random.Random(3)
+        sections = [rectangle(generator.uniform(0, 200), generator.uniform(0, 200),
+                              generator.uniform(5, 30), generator.uniform(5, 30)) for _ in range(150)]
+
+        layout = SectionLayout(sections)
+        self.assertOverlapsMatch(layout, sections)
+
+        for _ in range(100):
+            section = generator.choice(sections)
+            layout.move_section(section, generator.uniform(-20, 20), generator.uniform(-20, 20))
+        self.assertOverlapsMatch(layout, sections)
+
+        removed = sections.pop()
+        layout.remove_section(removed)
+        self.assertOverlapsMatch(layout, sections)
+
+        layout.check_all()
+        self.assertOverlapsMatch(layout, sections)
+
+    def test_sections_at(self):
+        a = rectangle(0, 0, 10, 10)
+        b = rectangle(5, 0, 10, 10)
+        layout = SectionLayout([a, b])
+
+        self.assertListEqual([a], layout.get_sections_at(Point(2, 2)))
+        self.assertSetEqual({a.uuid, b.uuid}, set(s.uuid for s in layout.get_sections_at(Point(7, 2))))
+        self.assertListEqual([], layout.get_sections_at(Point(20, 2)))
+        self.assertListEqual([b], layout.get_overlapping(a))
@@ -0,0 +1,89 @@
+import math
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from src.layout.segment_table import SegmentTable
+from src.layout.track import Track
+
+
+def create_test_track():
+    n0 = Node(Point(0, 50), 0)
+    n1 = Node(Point(100, 50), 50)
+    n2 = Node(Point(100, -50), 10)
+    n3 = Node(Point(0, -50), 20)
+
+    t0 = Curve(Point(0, 0), 50, math.pi / 2, 3 * math.pi / 2, n0, n3)
+    t1 = Straight(n0, n1)
+    t2 = Curve(Point(100, 0), 50, 3 * math.pi / 2, 5 * math.pi / 2, n2, n1)
+    t3 = Straight(n2, n3)
+
+    return Track([n0, n1, n2, n3], [t0, t1, t2, t3])
+
+
+class TestSegmentTable(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.table = SegmentTable(self.track)
+
+        self.start_locations = []
+        for segment in self.track.tracks.values():
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                self.start_locations.append(segment.get_location(segment.length() / 3, direction))
+
+        self.offsets = [-700, -210.5, -60, -1.5, 0, 2.25, 45, 180, 333.3, 1000]
+
+    def assertMatchesLocation(self, expected, x, y, z, h, slope):
+        pos = expected.get_pos()
+        self.assertAlmostEqual(pos.x, x)
+        self.assertAlmostEqual(pos.y, y)
+        self.assertAlmostEqual(expected.get_height(), z)
+        self.assertAlmostEqual(math.cos(expected.get_h()), math.cos(h))
+        self.assertAlmostEqual(math.sin(expected.get_h()), math.sin(h))
+        self.assertAlmostEqual(expected.get_slope(), slope)
+
+    def test_round_trip_location(self):
+        for loc in self.start_locations:
+            segment, distance, direction = self.table.from_location(loc)
+            result = self.table.to_location(segment, distance, direction)
+
+            self.assertEqual(loc.track_uuid(), result.track_uuid())
+            self.assertEqual(loc.direction, result.direction)
+            self.assertAlmostEqual(loc.get_distance(), result.get_distance())
+
+    def test_locate_matches_get_offset(self):
+        for loc in self.start_locations:
+            segment, distance, direction = self.table.from_location(loc)
+            new_segment, new_distance, new_direction = self.table.locate(segment, distance, direction, self.offsets)
+
+            for i, offset in enumerate(self.offsets):
+                expected = loc.get_offset(offset)
+                self.assertEqual(expected.track_uuid(), self.table.segments[new_segment[i]].uuid)
+                self.assertEqual(expected.direction, new_direction[i])
+                self.assertAlmostEqual(expected.get_distance(), new_distance[i])
+
+    def test_place_matches_get_offset(self):
+        heads = [self.table.from_location(loc) for loc in self.start_locations]
+        segment = np.array([head[0] for head in heads])[:, None]
+        distance = np.array([head[1] for head in heads])[:, None]
+        direction = np.array([head[2] for head in heads])[:, None]
+
+        x, y, z, h, slope = self.table.place(segment, distance, direction, np.array(self.offsets)[None, :])
+        self.assertEqual((len(self.start_locations), len(self.offsets)), x.shape)
+
+        for i, loc in enumerate(self.start_locations):
+            for j, offset in enumerate(self.offsets):
+                self.assertMatchesLocation(loc.get_offset(offset), x[i, j], y[i, j], z[i, j], h[i, j], slope[i, j])
+
+    def test_open_end(self):
+        n0 = Node(Point(0, 0), 0)
+        n1 = Node(Point(10, 0), 0)
+        table = SegmentTable(Track([n0, n1], [Straight(n0, n1)]))
+
+        with self.assertRaises(AssertionError):
+            table.locate(0, 5, constants.DIRECTION_FORWARD, 6)
@@ -0,0 +1,101 @@
+import math
+import random
+import unittest
+
+from benchmark.layouts import create_oval
+from src.geometry.point import Point
+from src.layout.components.curve import Curve
+from src.layout.components.node import Node
+from src.layout.spatial_index import SpatialIndex
+from src.layout.track import Track
+
+
+class TestSegmentDistance(unittest.TestCase):
+    def test_curve_bounds(self):
+        n0 = Node(Point(10, 0), 0)
+        n1 = Node(Point(0, -10), 0)
+        curve = Curve(Point(0, 0), 10, 0, 3 * math.pi / 2, n0, n1)
+
+        bounds = curve.bounds()
+        for actual, expected in zip(bounds, (-10, -10, 10, 10)):
+            self.assertAlmostEqual(expected, actual)
+
+    def test_curve_distance(self):
+        n0 = Node(Point(10, 0), 0)
+        n1 = Node(Point(0, 10), 0)
+        curve = Curve(Point(0, 0), 10, 0, math.pi / 2, n0, n1)
+
+        self.assertAlmostEqual(5, curve.distance_to(Point(15 / math.sqrt(2), 15 / math.sqrt(2))))
+        self.assertAlmostEqual(10, curve.distance_to(Point(0, 0)))
+        self.assertAlmostEqual(5, curve.distance_to(Point(10, -5)))
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def setUp(self):
+        nodes, tracks = create_oval(400, segment_length=6, radius=80)
+        self.track = Track(nodes, tracks)
+        self.index = SpatialIndex(self.track)
+        self.generator = random.Random(4)
+
+    def random_point(self):
+        return Point(self.generator.uniform(-150, 800), self.generator.uniform(-150, 150))
+
+    def test_nearest(self):
+        for _ in range(200):
+            point = self.random_point()
+            expected = min(segment.distance_to(point) for segment in self.track.tracks.values())
+
+            segment, distance = self.index.nearest(point)
+            self.assertAlmostEqual(expected, distance)
+            self.assertAlmostEqual(expected, segment.distance_to(point))
+
+    def test_nearest_max_distance(self):
+        segment, distance = self.index.nearest(Point(300, 0), max_distance=10)
+        self.assertIsNone(segment)
+        self.assertIsNone(distance)
+
+    def test_radius(self):
+        for _ in range(50):
+            point = self.random_point()
+            radius = self.generator.uniform(1, 60)
+            expected = set(s.uuid for s in self.track.tracks.values() if s.distance_to(point) <= radius)
+            self.assertSetEqual(expected, set(s.uuid for s in self.index.query_radius(point, radius)))
+
+    def test_box(self):
+        result = self.index.query_box(-200, 0, 1000, 200)
+        expected = [s for s in self.track.tracks.values() if s.bounds()[3] >= 0]
+        self.assertSetEqual(set(s.uuid for s in expected), set(s.uuid for s in result))
+
+    def test_node_moved(self):
+        node = next(iter(self.track.nodes.values()))
+        node.point = Point(400, 400)
+        self.index.node_moved(node)
+
+        segment, distance = self.index.nearest(Point(400, 401))
+        self.assertIn(node.uuid, segment.get_nodes())
+        self.assertAlmostEqual(1, distance)
+
+    def test_follows_track_edits(self):
+        # Moving a node is picked up from the track's changes by the next query,
+        # and the occupied range shrinks again once it moves back
+        node = self.track.node_list[10]
+        original = node.point
+        node.point = Point(400, 400)
+
+        segment, distance = self.index.nearest(Point(400, 401))
+        self.assertIn(node.uuid, segment.get_nodes())
+        self.assertAlmostEqual(1, distance)
+        self.assertEqual(self.index.get_cell(400, 400)[1], self.index.max_cell[1])
+
+        node.point = original
+        self.assertEqual([], self.index.query_box(390, 390, 410, 410))
+        self.test_nearest()
+        self.test_radius()
+        self.assertGreater(self.index.get_cell(400, 400)[1], self.index.max_cell[1])
+
+    def test_rebuilt_after_mark_changed(self):
+        node = self.track.node_list[10]
+        node.point = Point(400, 400)
+        self.track.mark_changed()
+
+        self.assertEqual(2, len(self.index.query_radius(Point(400, 400), 1)))
@@ -0,0 +1,162 @@
+import math
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.spline import Spline
+from src.layout.components.straight import Straight
+from src.layout.segment_table import SegmentTable
+from src.layout.track import Track
+
+
+def create_spline(control1, control2, end):
+    return Spline(Point(*control1), Point(*control2), Node(Point(0, 0), 0), Node(Point(*end), 10))
+
+
+def create_spline_track():
+    # Two straights joined at each end by a spline easement
+    n0 = Node(Point(0, 50), 0)
+    n1 = Node(Point(100, 50), 5)
+    n2 = Node(Point(100, -50), 10)
+    n3 = Node(Point(0, -50), 5)
+
+    t0 = Straight(n0, n1)
+    t1 = Spline.from_headings(n1, 0, n2, math.pi)
+    t2 = Straight(n2, n3)
+    t3 = Spline.from_headings(n3, math.pi, n0, 0)
+
+    return Track([n0, n1, n2, n3], [t0, t1, t2, t3])
+
+
+def get_reference_lengths(spline, count=200000):
+    # Cumulative arc length at evenly spaced parameters by the trapezoid rule
+    t = np.linspace(0, 1, count + 1)
+    _, first, _ = spline.evaluate_arrays(t)
+    speed = np.hypot(first[:, 0], first[:, 1])
+    return t, np.concatenate([[0], np.cumsum((speed[1:] + speed[:-1]) / 2 * np.diff(t))])
+
+
+class TestSpline(unittest.TestCase):
+    def setUp(self):
+        self.splines = [
+            create_spline((30, 0), (60, 10), (100, 40)),
+            create_spline((50, 0), (50, 0), (50, 50)),
+            create_spline((100, 100), (-50, 100), (50, 0)),
+            create_spline((10, 0), (20, 0), (30, 0)),
+        ]
+
+    def test_length(self):
+        for spline in self.splines:
+            t, lengths = get_reference_lengths(spline)
+            self.assertAlmostEqual(lengths[-1], spline.length(), delta=1e-6)
+
+        # Evenly spaced control points on a line make a straight line
+        self.assertAlmostEqual(30, self.splines[3].length())
+
+    def test_parameter_accuracy(self):
+        # The distance back along the curve to the parameter found for a
+        # distance is that distance, to within a micrometre
+        for spline in self.splines:
+            t, lengths = get_reference_lengths(spline)
+            for distance in np.linspace(0, spline.length(), 101):
+                parameter = spline.get_parameter(distance)
+                self.assertAlmostEqual(distance, np.interp(parameter, t, lengths), delta=1e-6)
+
+    def test_table_within_tolerance(self):
+        # Straight lines between table entries stay within the tolerance of the curve
+        for spline in self.splines:
+            table_s, table_x, table_y, table_h = spline.get_table()
+            self.assertLessEqual(len(table_s), 4096)
+
+            middle = [spline.point_at(spline.get_parameter((table_s[i] + table_s[i + 1]) / 2))
+                      for i in range(len(table_s) - 1)]
+            error = np.hypot(np.array([x for x, y in middle]) - ((table_x[:-1] + table_x[1:]) / 2),
+                             np.array([y for x, y in middle]) - ((table_y[:-1] + table_y[1:]) / 2))
+            self.assertLessEqual(np.max(error), spline.tolerance)
+
+    def test_ends(self):
+        spline = self.splines[0]
+        start = spline.get_location(0, constants.DIRECTION_FORWARD)
+        end = spline.get_location(spline.length(), constants.DIRECTION_FORWARD)
+
+        self.assertAlmostEqual(0, start.get_pos().distance(spline.startNode.point))
+        self.assertAlmostEqual(0, end.get_pos().distance(spline.endNode.point))
+        self.assertAlmostEqual(math.atan2(0, 30), start.get_h())
+        self.assertAlmostEqual(math.atan2(30, 40), end.get_h())
+        self.assertAlmostEqual(10, end.get_height())
+
+    def test_moving_node_rebuilds_table(self):
+        spline = self.splines[3]
+        spline.endNode.point = Point(60, 0)
+        self.assertAlmostEqual(60, spline.length())
+        self.assertAlmostEqual(60, spline.get_table()[0][-1])
+
+    def test_bounds_and_distance(self):
+        spline = self.splines[1]
+        min_x, min_y, max_x, max_y = spline.bounds()
+        self.assertLessEqual(min_x, 0)
+        self.assertGreaterEqual(max_x, 50)
+        self.assertGreaterEqual(max_y, 50)
+
+        self.assertAlmostEqual(0, spline.distance_to(spline.get_location(20, constants.DIRECTION_FORWARD).get_pos()),
+                               delta=spline.tolerance)
+
+
+class TestSplineTrack(unittest.TestCase):
+    def setUp(self):
+        self.track = create_spline_track()
+        self.locations = []
+        for segment in self.track.segment_list:
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                self.locations.append(segment.get_location(segment.length() / 3, direction))
+
+    def test_easement_is_tangent(self):
+        for segment in [self.track.segment_list[1], self.track.segment_list[3]]:
+            for node in [segment.startNode, segment.endNode]:
+                loc = segment.get_initial_location(node.uuid, constants.DIRECTION_AWAY_FROM_NODE)
+                other = segment.connections[node.uuid]
+                other_loc = other.get_initial_location(node.uuid, constants.DIRECTION_TOWARD_NODE)
+                self.assertAlmostEqual(math.cos(loc.get_h()), math.cos(other_loc.get_h()))
+                self.assertAlmostEqual(math.sin(loc.get_h()), math.sin(other_loc.get_h()))
+
+    def test_offset_round_trip(self):
+        # Going all the way around returns to the same place
+        total = sum(segment.length() for segment in self.track.segment_list)
+        for loc in self.locations:
+            for offset in [total, -total]:
+                moved = loc.get_offset(offset)
+                self.assertEqual(loc.track_uuid(), moved.track_uuid())
+                self.assertAlmostEqual(loc.get_distance(), moved.get_distance())
+
+    def test_segment_table_matches_locations(self):
+        table = SegmentTable(self.track)
+        for loc in self.locations:
+            for offset in [-150, -20, 0, 35, 260]:
+                expected = loc.get_offset(offset)
+                x, y, z, h, slope = table.place(*table.from_location(loc), offset)
+                pos = expected.get_pos()
+
+                self.assertLessEqual(math.hypot(pos.x - x, pos.y - y), expected.track.tolerance
+                                     if isinstance(expected.track, Spline) else 1e-9)
+                self.assertAlmostEqual(expected.get_height(), z)
+                self.assertAlmostEqual(math.cos(expected.get_h()), math.cos(h), places=3)
+                self.assertAlmostEqual(math.sin(expected.get_h()), math.sin(h), places=3)
+                self.assertAlmostEqual(expected.get_slope(), slope)
+
+    def test_segment_table_curvature(self):
+        table = SegmentTable(self.track)
+        spline = self.track.segment_list[1]
+        distances = np.linspace(1, spline.length() - 1, 20)
+
+        t = np.array([spline.get_parameter(distance) for distance in distances])
+        _, first, second = spline.evaluate_arrays(t)
+        expected = ((first[:, 0] * second[:, 1]) - (first[:, 1] * second[:, 0])) / np.hypot(first[:, 0], first[:, 1]) ** 3
+
+        np.testing.assert_allclose(expected, table.get_curvature(np.full(20, spline.id), distances), atol=1e-3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import math
+import unittest
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from test.layout.curve_test import create_curve
+
+
+class TestStraightCache(unittest.TestCase):
+    def setUp(self):
+        self.start = Node(Point(0, 0), 0)
+        self.end = Node(Point(30, 40), 5)
+        self.straight = Straight(self.start, self.end)
+
+    def test_derived_quantities(self):
+        self.assertAlmostEqual(self.straight.length(), 50)
+        self.assertAlmostEqual(self.straight.get_heading(), math.atan2(40, 30))
+        self.assertEqual(self.straight.get_unit_direction(), (0.6, 0.8))
+        self.assertAlmostEqual(self.straight.get_height_delta(), 5)
+        self.assertAlmostEqual(self.straight.get_grade(), math.atan2(5, 50))
+
+    def test_moving_node_invalidates(self):
+        self.straight.length()
+        self.end.point = Point(0, 20)
+        self.assertAlmostEqual(self.straight.length(), 20)
+        self.assertAlmostEqual(self.straight.get_heading(), math.pi / 2)
+
+        self.start.height = 5
+        self.assertAlmostEqual(self.straight.get_height_delta(), 0)
+        self.assertAlmostEqual(self.straight.get_grade(), 0)
+
+    def test_location(self):
+        loc = self.straight.get_location(10, constants.DIRECTION_REVERSE)
+        pos = loc.get_pos()
+        self.assertAlmostEqual(pos.x, 6)
+        self.assertAlmostEqual(pos.y, 8)
+        self.assertAlmostEqual(loc.get_height(), 1)
+        self.assertAlmostEqual(loc.get_h(), math.atan2(40, 30) + math.pi)
+        self.assertAlmostEqual(loc.get_slope(), -math.atan2(5, 50))
+
+    def test_zero_length(self):
+        straight = Straight(Node(Point(1, 2), 3), Node(Point(1, 2), 3))
+        loc = straight.get_location(0, constants.DIRECTION_FORWARD)
+        self.assertEqual(straight.length(), 0)
+        self.assertEqual(loc.get_pos(), Point(1, 2))
+        self.assertEqual(loc.get_height(), 3)
+
+    def test_curve(self):
+        curve = create_curve(50, math.pi)
+        self.assertAlmostEqual(curve.length(), 50 * math.pi)
+
+        curve.endNode.height = 10
+        self.assertAlmostEqual(curve.get_grade(), math.atan2(10, 50 * math.pi))
+        loc = curve.get_location(curve.length() / 2, constants.DIRECTION_FORWARD)
+        self.assertAlmostEqual(loc.get_height(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.geometry.vector import Vector
+from src.layout.track_cursor import TrackCursor
+from test.layout.segment_table_test import create_test_track
+
+
+class TestTrackCursor(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.locations = []
+        for segment in self.track.segment_list:
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                self.locations.append(segment.get_location(segment.length() / 3, direction))
+
+    def test_reads_like_location(self):
+        loc = self.locations[3]
+        cursor = TrackCursor.from_location(loc)
+        self.assertEqual(cursor.track_uuid(), loc.track_uuid())
+        self.assertEqual(cursor.track_id(), loc.track_id())
+        self.assertEqual(cursor.to_location().get_distance(), loc.get_distance())
+
+    def test_slots(self):
+        for value in [Point(0, 0), Vector(1, 1), self.locations[0], self.locations[1], TrackCursor.from_location(self.locations[0])]:
+            self.assertFalse(hasattr(value, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from panda3d.core import NodePath
+
+from benchmark.layouts import create_oval
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from src.layout.track import Track
+from src.layout.track_renderer import TrackRenderer
+
+
+class TestTrackRenderer(unittest.TestCase):
+    def test_chunks(self):
+        nodes, tracks = create_oval(2000)
+        root = NodePath('render')
+        renderer = Track(nodes, tracks).render(root)
+
+        leaves = renderer.get_leaf_chunks()
+        lod_nodes = root.findAllMatches('**/+LODNode')
+
+        self.assertEqual(len(leaves), lod_nodes.getNumPaths())
+        self.assertLess(len(leaves), len(tracks) / 10)
+        self.assertEqual(len(tracks), sum(len(chunk.segments) for chunk in leaves))
+        self.assertTrue(all(len(chunk.segments) <= renderer.max_segments for chunk in leaves))
+
+        for chunk in leaves:
+            self.assertEqual(len(renderer.lod_levels), chunk.node_path.getNumChildren())
+            for child in chunk.node_path.getChildren():
+                self.assertEqual(1, child.node().getNumGeoms())
+
+    def test_levels_reduce_vertices(self):
+        nodes, tracks = create_oval(40)
+        root = NodePath('render')
+        renderer = Track(nodes, tracks).render(root)
+
+        for chunk in renderer.get_leaf_chunks():
+            counts = [child.node().getGeom(0).getVertexData().getNumRows() for child in chunk.node_path.getChildren()]
+            self.assertListEqual(sorted(counts, reverse=True), counts)
+            self.assertLess(counts[-1], counts[0])
+
+    def test_rebuild_chunk(self):
+        nodes, tracks = create_oval(500)
+        root = NodePath('render')
+        renderer = Track(nodes, tracks).render(root)
+
+        chunk = renderer.chunks_by_segment[tracks[0].uuid]
+        renderer.rebuild_chunk(chunk)
+
+        self.assertEqual(len(renderer.get_leaf_chunks()), root.findAllMatches('**/+LODNode').getNumPaths())
+
+    def test_update_moved_node(self):
+        nodes, tracks = create_oval(500)
+        root = NodePath('render')
+        renderer = Track(nodes, tracks).render(root)
+
+        before = {id(chunk): chunk.node_path for chunk in renderer.get_leaf_chunks()}
+        node = nodes[10]
+        node.point = Point(node.point.x, node.point.y + 0.5)
+        renderer.update()
+
+        redrawn = [chunk for chunk in renderer.get_leaf_chunks() if chunk.node_path is not before[id(chunk)]]
+        self.assertEqual({id(renderer.chunks_by_segment[segment.uuid]) for segment in node.segments},
+                         {id(chunk) for chunk in redrawn})
+        self.assertEqual(len(renderer.get_leaf_chunks()), root.findAllMatches('**/+LODNode').getNumPaths())
+
+    def test_update_added_segments(self):
+        nodes, tracks = create_oval(500)
+        track = Track(nodes, tracks)
+        root = NodePath('render')
+        renderer = track.render(root)
+
+        # A spur far outside the layout, then the first segment taken away
+        spur = Node(Point(5000, 5000), 0)
+        track.add_node(spur)
+        track.add_segment(Straight(nodes[0], spur))
+        track.remove_segment(tracks[0])
+        renderer.update()
+
+        leaves = renderer.get_leaf_chunks()
+        self.assertEqual(len(track.segment_list), sum(len(chunk.segments) for chunk in leaves))
+        self.assertEqual(set(track.tracks.keys()), set(renderer.chunks_by_segment.keys()))
+        self.assertEqual(len(leaves), root.findAllMatches('**/+LODNode').getNumPaths())
+
+    def test_update_splits_full_leaves(self):
+        # Many segments added into one leaf split it, as a fresh build would
+        nodes, tracks = create_oval(40)
+        track = Track(nodes, tracks)
+        root = NodePath('render')
+        renderer = TrackRenderer(track, root, max_segments=8)
+
+        previous = nodes[0]
+        for i in range(1, 60):
+            node = Node(Point(nodes[0].point.x + (i * 0.5), nodes[0].point.y + 1), 0)
+            track.add_node(node)
+            track.add_segment(Straight(previous, node))
+            previous = node
+        renderer.update()
+
+        leaves = renderer.get_leaf_chunks()
+        self.assertTrue(all(len(chunk.segments) <= renderer.max_segments for chunk in leaves))
+        self.assertEqual(len(track.segment_list), sum(len(chunk.segments) for chunk in leaves))
+        self.assertEqual(set(track.tracks.keys()), set(renderer.chunks_by_segment.keys()))
+        for segment in track.segment_list:
+            self.assertIn(segment, renderer.chunks_by_segment[segment.uuid].segments)
+        self.assertEqual(len(leaves), root.findAllMatches('**/+LODNode').getNumPaths())
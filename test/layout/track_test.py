@@ -0,0 +1,186 @@
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from benchmark.layouts import create_oval
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from src.layout.segment_table import SegmentTable, ROW_ARRAY_NAMES
+from src.layout.track import Track
+from test.layout.segment_table_test import create_test_track
+
+
+class TestTrack(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+
+    def test_ids(self):
+        for i, node in enumerate(self.track.node_list):
+            self.assertEqual(node.id, i)
+            self.assertIs(self.track.nodes[node.uuid], node)
+
+        for i, segment in enumerate(self.track.segment_list):
+            self.assertEqual(segment.id, i)
+            self.assertIs(self.track.tracks[segment.uuid], segment)
+
+    def assertConnected(self, track):
+        # Every transition leads to the segment sharing the node at that end
+        for segment in track.segment_list:
+            for end, node in enumerate([segment.startNode, segment.endNode]):
+                next_segment, next_end, direction = track.get_transition(segment.id, end)
+                if next_segment < 0:
+                    self.assertNotIn(node.uuid, segment.connections)
+                    continue
+
+                other = track.segment_list[next_segment]
+                self.assertIs(segment.connections[node.uuid], other)
+                self.assertIs([other.startNode, other.endNode][next_end], node)
+                self.assertEqual(track.get_transition(next_segment, next_end)[:2], (segment.id, end))
+
+    def test_transitions(self):
+        self.assertConnected(self.track)
+
+        for segment in self.track.segment_list:
+            for end, node in enumerate([segment.startNode, segment.endNode]):
+                next_segment, next_end, direction = self.track.get_transition(segment.id, end)
+                other = self.track.segment_list[next_segment]
+
+                self.assertIs(segment.connections[node.uuid], other)
+                self.assertIs([other.startNode, other.endNode][next_end], node)
+
+                expected = constants.DIRECTION_FORWARD if next_end == constants.END_START else constants.DIRECTION_REVERSE
+                self.assertEqual(direction, expected)
+
+                # Leaving the next segment back through the same end returns here
+                self.assertEqual(self.track.get_transition(next_segment, next_end)[:2], (segment.id, end))
+
+    def split(self, track, segment):
+        # Replaces a straight with two halves meeting at a new node
+        start = segment.startNode.point
+        end = segment.endNode.point
+        middle = Node(Point((start.x + end.x) / 2, (start.y + end.y) / 2), segment.startNode.height)
+
+        track.remove_segment(segment)
+        track.add_node(middle)
+        first = Straight(segment.startNode, middle)
+        second = Straight(middle, segment.endNode)
+        track.add_segment(first)
+        track.add_segment(second)
+        return first, second
+
+    def test_split_segment(self):
+        segment = self.track.segment_list[1]
+        length = segment.length()
+        total = self.track.get_route_index().chains[0].total_length
+
+        first, second = self.split(self.track, segment)
+
+        self.assertConnected(self.track)
+        self.assertEqual(5, len(self.track.segment_list))
+        self.assertIsNone(segment.layout)
+        self.assertNotIn(segment.uuid, self.track.tracks)
+        self.assertNotIn(segment, segment.startNode.segments)
+        for i, node in enumerate(self.track.node_list):
+            self.assertEqual(i, node.id)
+        for i, other in enumerate(self.track.segment_list):
+            self.assertEqual(i, other.id)
+
+        # Still one loop of the same length
+        self.assertEqual(1, len(self.track.get_route_index().chains))
+        self.assertAlmostEqual(total, self.track.get_route_index().chains[0].total_length)
+        self.assertAlmostEqual(length, first.length() + second.length())
+
+    def test_remove_node(self):
+        first = Node(Point(0, 0), 0)
+        second = Node(Point(1, 0), 0)
+        self.track.add_node(first)
+        self.track.add_node(second)
+        self.track.remove_node(first)
+
+        self.assertEqual(5, len(self.track.node_list))
+        self.assertIs(second, self.track.node_list[4])
+        self.assertEqual(4, second.id)
+        self.assertNotIn(first.uuid, self.track.nodes)
+
+        with self.assertRaises(AssertionError):
+            self.track.remove_node(self.track.node_list[0])
+
+    def test_changes(self):
+        revision = self.track.revision
+        self.assertEqual([], self.track.get_changes(revision))
+
+        node = self.track.node_list[1]
+        node.point = Point(node.point.x, node.point.y + 10)
+        changed = self.track.get_changes(revision)
+        self.assertEqual({segment.uuid for segment in node.segments}, {segment.uuid for segment in changed})
+
+        # Splitting touches the removed segment, the two halves, the segments
+        # meeting them and whichever segment took over the freed id
+        revision = self.track.revision
+        segment = self.track.segment_list[3]
+        self.split(self.track, segment)
+        changed = {other.uuid for other in self.track.get_changes(revision)}
+        self.assertIn(segment.uuid, changed)
+        self.assertEqual(5, len(changed))
+
+        self.track.mark_changed()
+        self.assertIsNone(self.track.get_changes(revision))
+        self.assertEqual([], self.track.get_changes(self.track.revision))
+
+    def test_readded_segment_follows_nodes(self):
+        segment = self.track.segment_list[1]
+        self.track.remove_segment(segment)
+        self.track.add_segment(segment)
+        self.assertEqual(1, segment.startNode.segments.count(segment))
+
+        revision = self.track.revision
+        length = segment.length()
+        node = segment.endNode
+        node.point = Point(node.point.x + 10, node.point.y)
+        self.assertNotAlmostEqual(length, segment.length())
+        self.assertIn(segment.uuid, {other.uuid for other in self.track.get_changes(revision)})
+
+    def test_changes_are_local(self):
+        # Moving a node of a large layout touches only the segments at it
+        nodes, tracks = create_oval(20000)
+        track = Track(nodes, tracks)
+        revision = track.revision
+
+        nodes[100].point = Point(nodes[100].point.x, nodes[100].point.y + 1)
+        self.assertEqual(2, len(track.get_changes(revision)))
+
+    def test_segment_table_update(self):
+        table = SegmentTable(self.track)
+        revision = self.track.revision
+
+        node = self.track.node_list[2]
+        node.point = Point(node.point.x + 5, node.point.y)
+        self.split(self.track, self.track.segment_list[3])
+        table.update(self.track, self.track.get_changes(revision))
+
+        expected = SegmentTable(self.track)
+        for name in ROW_ARRAY_NAMES:
+            np.testing.assert_allclose(getattr(table, name), getattr(expected, name), err_msg=name)
+        self.assertEqual(expected.segments, table.segments)
+        self.assertEqual(expected.index_by_uuid, table.index_by_uuid)
+
+    def test_segment_table_update_renumbered(self):
+        # Removing a segment other than the last moves the last one into its
+        # id, so the rows of that segment's neighbours must follow it
+        track = Track(*create_oval(40))
+        table = SegmentTable(track)
+        revision = track.revision
+
+        self.split(track, track.segment_list[5])
+        table.update(track, track.get_changes(revision))
+
+        expected = SegmentTable(track)
+        for name in ROW_ARRAY_NAMES:
+            np.testing.assert_allclose(getattr(table, name), getattr(expected, name), err_msg=name)
+        self.assertEqual(expected.segments, table.segments)
+
+
+if __name__ == '__main__':
+    unittest.main()
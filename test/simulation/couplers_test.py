@@ -0,0 +1,141 @@
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.simulation.consist import Consist
+from src.simulation.couplers import CouplerDynamics, solve_tridiagonal
+from src.simulation.dynamics import TrainDynamics
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState, POSE_X
+from test.simulation.dynamics_test import create_line
+
+
+class TestSolveTridiagonal(unittest.TestCase):
+    def test_matches_dense_solve(self):
+        rng = np.random.default_rng(3)
+        lower = -rng.random((5, 7))
+        upper = -rng.random((5, 7))
+        diagonal = 2 + rng.random((5, 8))
+        right = rng.random((5, 8))
+
+        x = solve_tridiagonal(lower, diagonal, upper, right)
+        for i in range(5):
+            matrix = np.diag(diagonal[i]) + np.diag(lower[i], -1) + np.diag(upper[i], 1)
+            np.testing.assert_allclose(np.linalg.solve(matrix, right[i]), x[i])
+
+
+class TestCouplerDynamics(unittest.TestCase):
+    def create_simulation(self, couplers, consists, length=20000, rise=0):
+        track = create_line(length, rise)
+        simulation = Simulation(track, couplers=couplers)
+        segment = track.segment_list[0]
+        for i, consist in enumerate(consists):
+            loc = segment.get_location(2000 + (i * 5000), constants.DIRECTION_FORWARD)
+            simulation.add_train(TrainState(loc, consist))
+        return simulation
+
+    def get_gaps(self, couplers, i):
+        count = couplers.parameters.car_counts[i]
+        return couplers.offsets[i, :count - 1] - couplers.offsets[i, 1:count]
+
+    def test_stiff_couplers_match_rigid_train(self):
+        dynamics = TrainDynamics()
+        couplers = CouplerDynamics(dynamics, stiffness=1e9, damping=1e7, slack=0)
+        simulation = self.create_simulation(couplers, [Consist.hauled(1, 20)])
+        rigid = self.create_simulation(None, [Consist.hauled(1, 20)])
+        rigid.dynamics = dynamics
+
+        for train in simulation.trains + rigid.trains:
+            train.throttle = 1
+        for _ in range(300):
+            simulation.step(1 / 30)
+            rigid.step(1 / 30)
+
+        self.assertGreater(rigid.trains[0].speed, 2)
+        self.assertAlmostEqual(rigid.trains[0].speed, simulation.trains[0].speed, delta=0.02 * rigid.trains[0].speed)
+        self.assertLess(np.max(np.abs(couplers.offsets)), 0.01)
+
+    def test_slack_runs_out_from_the_head(self):
+        couplers = CouplerDynamics(TrainDynamics(), slack=0.1)
+        simulation = self.create_simulation(couplers, [Consist.hauled(1, 30)])
+        simulation.trains[0].throttle = 1
+
+        simulation.step(1 / 30)
+        speeds = couplers.speeds[0, :31]
+        self.assertGreater(speeds[0], 0)
+        self.assertEqual(0, speeds[-1])
+
+        for _ in range(600):
+            simulation.step(1 / 30)
+
+        # Every coupler is stretched to the end of its slack and in draft, each
+        # pulling everything behind it
+        self.assertTrue(np.all(self.get_gaps(couplers, 0) > 0.05 - 1e-6))
+        forces = couplers.get_coupler_forces()[0, :30]
+        self.assertTrue(np.all(forces > 0))
+        self.assertTrue(np.all(np.diff(forces) < 0))
+
+        # The force in each coupler accelerates the cars behind it, against
+        # their resistance
+        before = couplers.speeds[0].copy()
+        simulation.step(1 / 30)
+        acceleration = (couplers.speeds[0] - before) * 30
+        zeros = np.zeros((1, 31))
+        _, resisting = couplers.dynamics.get_forces(couplers.speeds, zeros, zeros, zeros, zeros, couplers.parameters)
+        needed = (30000 * acceleration[1:]) + resisting[0, 1:]
+        expected = np.cumsum(needed[::-1])[::-1]
+        np.testing.assert_allclose(expected, couplers.get_coupler_forces()[0, :30], rtol=0.05)
+
+    def test_wheels_follow_cars(self):
+        couplers = CouplerDynamics(TrainDynamics(), slack=0.2)
+        simulation = self.create_simulation(couplers, [Consist.hauled(1, 10)])
+        train = simulation.trains[0]
+        rigid_length = train.poses[0, POSE_X] - train.poses[-1, POSE_X]
+
+        train.throttle = 1
+        for _ in range(300):
+            simulation.step(1 / 30)
+
+        # Each coupler is stretched by half its slack, plus the spring deflection
+        stretch = -couplers.offsets[0, 10]
+        deflection = np.sum(couplers.get_coupler_forces()[0, :10]) / couplers.stiffness
+        self.assertAlmostEqual(rigid_length + stretch, train.poses[0, POSE_X] - train.poses[-1, POSE_X])
+        self.assertAlmostEqual((10 * 0.1) + deflection, stretch, delta=0.01)
+        self.assertEqual(train.speed, couplers.speeds[0, 0])
+
+    def test_brakes_hold_on_grade(self):
+        couplers = CouplerDynamics(TrainDynamics())
+        simulation = self.create_simulation(couplers, [Consist.uniform(20)], rise=200)
+        simulation.trains[0].brake = 1
+
+        for _ in range(300):
+            simulation.step(1 / 30)
+        self.assertLessEqual(np.max(np.abs(couplers.speeds)), couplers.min_speed)
+
+    def test_trains_of_different_lengths(self):
+        couplers = CouplerDynamics(TrainDynamics())
+        simulation = self.create_simulation(couplers, [Consist.hauled(1, 3), Consist.hauled(2, 40)])
+        for train in simulation.trains:
+            train.throttle = 1
+        for _ in range(60):
+            simulation.step(1 / 30)
+
+        # Padding cars after the short train stay where they are
+        np.testing.assert_array_equal(0, couplers.speeds[0, 4:])
+        np.testing.assert_array_equal(0, couplers.offsets[0, 4:])
+        self.assertGreater(simulation.trains[0].speed, simulation.trains[1].speed)
+
+        # Removing a train keeps the state of the other
+        offsets = couplers.offsets[1, :42].copy()
+        speeds = couplers.speeds[1, :42].copy()
+        simulation.remove_train(simulation.trains[0])
+        couplers.sync(simulation.trains)
+        self.assertEqual((1, 42), couplers.speeds.shape)
+        np.testing.assert_array_equal(offsets, couplers.offsets[0])
+        np.testing.assert_array_equal(speeds, couplers.speeds[0])
+        simulation.step(1 / 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+import math
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.geometry.point import Point
+from src.layout.components.node import Node
+from src.layout.components.straight import Straight
+from src.layout.segment_table import SegmentTable
+from src.layout.track import Track
+from src.simulation.consist import Consist
+from src.simulation.dynamics import TrainDynamics
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from test.layout.segment_table_test import create_test_track
+
+
+def create_line(length, rise=0):
+    n0 = Node(Point(0, 0), 0)
+    n1 = Node(Point(length, 0), rise)
+    return Track([n0, n1], [Straight(n0, n1)])
+
+
+class TestTrainDynamics(unittest.TestCase):
+    def setUp(self):
+        self.dynamics = TrainDynamics()
+        loc = create_line(1000).segment_list[0].get_location(500, constants.DIRECTION_FORWARD)
+        self.trains = [
+            TrainState(loc, Consist.hauled(1, 10), 0),
+            TrainState(loc, Consist.hauled(2, 40), 0),
+            TrainState(loc, Consist.uniform(5), 0),
+        ]
+        self.parameters = self.dynamics.get_parameters(self.trains)
+
+    def update(self, speed, throttle=0, brake=0, slope=0, curvature=0, dt=1):
+        n = len(self.trains)
+        return self.dynamics.update(np.full(n, speed, dtype=np.float64), np.full(n, throttle, dtype=np.float64),
+                                    np.full(n, brake, dtype=np.float64), np.full(n, slope, dtype=np.float64),
+                                    np.full(n, curvature, dtype=np.float64), self.parameters, dt)
+
+    def test_parameters(self):
+        self.assertEqual(100000 + (10 * 30000), self.parameters.mass[0])
+        self.assertEqual(500000, self.parameters.tractive_effort[1])
+        self.assertEqual(0, self.parameters.power[2])
+
+    def test_starting_pull(self):
+        # From a stand the pull is the full tractive effort, less rolling resistance
+        speed = self.update(0, throttle=1, dt=0.1)
+        mass = self.parameters.mass
+        expected = (self.parameters.tractive_effort - (mass * 9.81 * 0.0015)) / mass * 0.1
+        np.testing.assert_allclose(expected[:2], speed[:2])
+
+        # Cars without locomotives cannot pull, and never roll backwards
+        self.assertEqual(0, speed[2])
+
+    def test_power_limits_pull(self):
+        driving, resisting = self.dynamics.get_forces(np.full(3, 40.0), np.ones(3), np.zeros(3), np.zeros(3),
+                                                      np.zeros(3), self.parameters)
+        np.testing.assert_allclose(self.parameters.power / 40, driving)
+
+    def test_grade(self):
+        # Unbraked trains roll back down a 2% grade
+        speed = self.update(0, slope=math.atan(0.02))
+        self.assertTrue(np.all(speed < 0))
+        np.testing.assert_allclose(-9.81 * (math.sin(math.atan(0.02)) - 0.0015), speed)
+
+        # Brakes hold them
+        np.testing.assert_array_equal(np.zeros(3), self.update(0, brake=1, slope=math.atan(0.02)))
+
+    def test_braking_stops_without_reversing(self):
+        speed = np.full(3, 5.0)
+        brake = np.ones(3)
+        zeros = np.zeros(3)
+        for _ in range(100):
+            speed = self.dynamics.update(speed, zeros, brake, zeros, zeros, self.parameters, 0.1)
+        np.testing.assert_array_equal(zeros, speed)
+
+    def test_curve_resistance(self):
+        straight = self.update(10)
+        curve = self.update(10, curvature=1 / 50)
+        self.assertTrue(np.all(curve < straight))
+        np.testing.assert_allclose(straight - curve, 9.81 * 0.5 / 50)
+
+    def test_reverse(self):
+        speed = self.update(-2, throttle=-1)
+        self.assertTrue(np.all(speed[:2] < -2))
+        self.assertTrue(speed[2] > -2)
+
+
+class TestSimulationDynamics(unittest.TestCase):
+    def test_accelerates_on_level_track(self):
+        track = create_line(5000)
+        simulation = Simulation(track, TrainDynamics())
+        train = simulation.add_train(TrainState(track.segment_list[0].get_location(500, constants.DIRECTION_FORWARD),
+                                                Consist.hauled(1, 10)))
+        train.throttle = 1
+
+        for _ in range(60):
+            simulation.step(0.5)
+
+        self.assertGreater(train.speed, 10)
+        self.assertGreater(train.loc.get_distance(), 600)
+
+        # Coasting slows it down again
+        speed = train.speed
+        train.throttle = 0
+        simulation.step(1)
+        self.assertLess(train.speed, speed)
+
+    def test_rolls_downhill(self):
+        # A train facing up a grade rolls backwards, or forwards if turned around
+        track = create_line(2000, 40)
+        simulation = Simulation(track, TrainDynamics())
+        segment = track.segment_list[0]
+        up = simulation.add_train(TrainState(segment.get_location(1000, constants.DIRECTION_FORWARD), Consist.uniform(3)))
+        down = simulation.add_train(TrainState(segment.get_location(500, constants.DIRECTION_REVERSE), Consist.uniform(3)))
+
+        simulation.step(1)
+        self.assertLess(up.speed, 0)
+        self.assertGreater(down.speed, 0)
+        self.assertAlmostEqual(up.speed, -down.speed)
+
+    def test_slope_and_curvature_under_trains(self):
+        track = create_test_track()
+        simulation = Simulation(track, TrainDynamics())
+        curve = track.segment_list[0]
+        straight = track.segment_list[1]
+        simulation.add_train(TrainState(curve.get_location(curve.length() / 2, constants.DIRECTION_FORWARD),
+                                        Consist.uniform(2)))
+        simulation.add_train(TrainState(straight.get_location(50, constants.DIRECTION_REVERSE), Consist.uniform(2)))
+
+        np.testing.assert_allclose([1 / 50, 0], simulation.train_curvatures)
+        self.assertAlmostEqual(-straight.get_grade(), simulation.train_slopes[1])
+
+    def test_without_dynamics_speed_is_kept(self):
+        track = create_line(1000)
+        simulation = Simulation(track)
+        train = simulation.add_train(TrainState(track.segment_list[0].get_location(100, constants.DIRECTION_FORWARD),
+                                                Consist.uniform(2), 10))
+        train.brake = 1
+        simulation.step(1)
+        self.assertEqual(10, train.speed)
+
+
+class TestCurvature(unittest.TestCase):
+    def test_segment_table_curvature(self):
+        track = create_test_track()
+        table = SegmentTable(track)
+        np.testing.assert_allclose([1 / 50, 0, 1 / 50, 0], table.get_curvature([0, 1, 2, 3], [10, 10, 10, 10]))
+
+
+if __name__ == '__main__':
+    unittest.main()
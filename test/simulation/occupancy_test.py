@@ -0,0 +1,137 @@
+import random
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from benchmark.layouts import create_oval
+from src.layout.track import Track
+from src.simulation.consist import Consist
+from src.simulation.occupancy import OccupancyIndex
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from test.layout.segment_table_test import create_test_track
+
+
+def overlapping(a, b):
+    for segment, start, end in a:
+        for other_segment, other_start, other_end in b:
+            if segment == other_segment and start < other_end and other_start < end:
+                return True
+    return False
+
+
+class TestOccupancyIndex(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.index = OccupancyIndex(self.track)
+
+    def test_footprint(self):
+        # Every piece is within its segment and the pieces add up to the length
+        for segment in self.track.segment_list:
+            for direction in [constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE]:
+                footprint = self.index.get_footprint(segment.id, segment.length() / 3, direction, 300)
+                self.assertAlmostEqual(sum(end - start for _, start, end in footprint), 300)
+                for piece_segment, start, end in footprint:
+                    self.assertGreaterEqual(start, 0)
+                    self.assertLessEqual(end, self.index.lengths[piece_segment] + 1e-9)
+
+        # The tail is where an offset of minus the length would put the head
+        loc = self.track.segment_list[1].get_location(30, constants.DIRECTION_FORWARD)
+        tail = loc.get_offset(-200)
+        footprint = self.index.get_footprint(1, 30, constants.DIRECTION_FORWARD, 200)
+        segment, start, end = footprint[-1]
+        self.assertEqual(tail.track_id(), segment)
+        self.assertIn(round(tail.get_distance(), 6), [round(start, 6), round(end, 6)])
+
+    def test_occupancy(self):
+        train = object()
+        self.index.update_train(train, 1, 60, constants.DIRECTION_FORWARD, 40)
+        self.assertEqual(self.index.get_occupied_segments(), [1])
+        self.assertTrue(self.index.is_occupied(1))
+        self.assertTrue(self.index.is_occupied(1, 50, 55))
+        self.assertFalse(self.index.is_occupied(1, 70, 100))
+        self.assertFalse(self.index.is_occupied(0))
+
+        self.index.remove_train(train)
+        self.assertFalse(self.index.is_occupied(1))
+
+    def test_matches_brute_force(self):
+        rng = random.Random(4)
+        trains = [object() for _ in range(12)]
+        heads = {}
+
+        for _ in range(30):
+            for train in rng.sample(trains, 4):
+                segment = rng.randrange(len(self.track.segment_list))
+                distance = rng.uniform(0, self.index.lengths[segment])
+                heads[train] = (segment, distance, rng.choice([0, 1]), rng.uniform(5, 80))
+                self.index.update_train(train, *heads[train])
+
+            footprints = {train: self.index.get_footprint(*head) for train, head in heads.items()}
+            expected = set()
+            for a in heads:
+                for b in heads:
+                    if id(a) < id(b) and overlapping(footprints[a], footprints[b]):
+                        expected.add(frozenset([id(a), id(b)]))
+
+            found = {frozenset([id(a), id(b)]) for a, b in self.index.get_collisions()}
+            self.assertEqual(expected, found)
+
+    def test_moved_trains_match_walk(self):
+        # Trains shifted by how far they moved end up with the footprint a full
+        # walk from their new head would give, and the same collisions
+        track = Track(*create_oval(40))
+        simulation = Simulation(track)
+        rng = random.Random(7)
+        for i in range(6):
+            segment = track.segment_list[i * 6]
+            direction = rng.choice([constants.DIRECTION_FORWARD, constants.DIRECTION_REVERSE])
+            simulation.add_train(TrainState(segment.get_location(1, direction), Consist.uniform(rng.randrange(1, 8)),
+                                            rng.uniform(-30, 30)))
+
+        occupancy = simulation.get_occupancy()
+        for _ in range(100):
+            simulation.step(0.25)
+            footprints = {}
+            for train in simulation.trains:
+                head = simulation.get_segment_table().from_location(train.cursor)
+                footprints[train] = occupancy.get_footprint(*head, train.consist.length())
+                shifted = [piece[:3] for piece in occupancy.footprints[train]]
+                self.assertEqual([piece[0] for piece in footprints[train]], [piece[0] for piece in shifted])
+                np.testing.assert_allclose([piece[1:] for piece in footprints[train]],
+                                           [piece[1:] for piece in shifted], atol=1e-6)
+
+            expected = set()
+            for a in simulation.trains:
+                for b in simulation.trains:
+                    if id(a) < id(b) and overlapping(footprints[a], footprints[b]):
+                        expected.add(frozenset([id(a), id(b)]))
+            self.assertEqual(expected, {frozenset([id(a), id(b)]) for a, b in simulation.collisions})
+
+
+class TestSimulationCollisions(unittest.TestCase):
+    def test_head_on(self):
+        track = create_test_track()
+        simulation = Simulation(track)
+        segment = track.segment_list[1]
+
+        a = simulation.add_train(TrainState(segment.get_location(20, constants.DIRECTION_FORWARD), Consist.uniform(2), 5))
+        b = simulation.add_train(TrainState(segment.get_location(80, constants.DIRECTION_REVERSE), Consist.uniform(2), 5))
+        self.assertEqual(simulation.collisions, [])
+
+        # The heads meet after six seconds
+        for _ in range(6):
+            simulation.step(1)
+        self.assertEqual(simulation.collisions, [])
+
+        simulation.step(1)
+        self.assertEqual(len(simulation.collisions), 1)
+        self.assertEqual(set(simulation.collisions[0]), {a, b})
+
+        simulation.remove_train(b)
+        self.assertEqual(simulation.collisions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from benchmark.layouts import create_oval
+from src.layout.track import Track
+from src.simulation.consist import Consist
+from src.simulation.dynamics import TrainDynamics
+from src.simulation.partition import PartitionedSimulation, partition_segments
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+
+
+def add_trains(simulation, tracks, count):
+    states = []
+    for i in range(count):
+        segment = tracks[(i * len(tracks)) // count]
+        direction = constants.DIRECTION_FORWARD if i % 2 == 0 else constants.DIRECTION_REVERSE
+        loc = segment.get_location(segment.length() / 2, direction)
+        states.append(simulation.add_train(TrainState(loc, Consist.uniform(3), 20 + i)))
+    return states
+
+
+class TestPartition(unittest.TestCase):
+    def test_balanced_regions(self):
+        nodes, tracks = create_oval(100)
+        track = Track(nodes, tracks)
+        regions = partition_segments(track, 4)
+
+        counts = np.bincount(regions, minlength=4)
+        self.assertEqual(counts.sum(), len(tracks))
+        self.assertLessEqual(counts.max() - counts.min(), 1)
+        np.testing.assert_array_equal(regions, partition_segments(track, 4))
+
+
+class TestPartitionedSimulation(unittest.TestCase):
+    def setUp(self):
+        nodes, tracks = create_oval(60)
+        self.track = Track(nodes, tracks)
+        self.simulation = PartitionedSimulation(self.track, 3)
+        self.reference = Simulation(self.track)
+
+        self.trains = add_trains(self.simulation, tracks, 6)
+        self.expected = add_trains(self.reference, tracks, 6)
+
+    def tearDown(self):
+        self.simulation.close()
+
+    def test_matches_simulation(self):
+        regions = []
+        for i in range(40):
+            self.simulation.step(0.5, 2)
+            self.reference.step(0.5, 2)
+            regions.append(tuple(self.simulation.get_region_counts()))
+
+            # A change of speed between ticks reaches the workers
+            if i == 20:
+                self.trains[0].speed = -5
+                self.expected[0].speed = -5
+
+        for train, expected in zip(self.trains, self.expected):
+            self.assertEqual(train.loc.track_id(), expected.loc.track_id())
+            self.assertAlmostEqual(train.loc.get_distance(), expected.loc.get_distance())
+            np.testing.assert_allclose(train.poses, expected.poses, atol=1e-9)
+
+        # Trains were handed off between regions along the way
+        self.assertGreater(len(set(regions)), 1)
+
+        # Occupancy shifted by how far each train moved matches the reference
+        for train, expected in zip(self.trains, self.expected):
+            np.testing.assert_allclose([piece[1:3] for piece in self.simulation.occupancy.footprints[train]],
+                                       [piece[1:3] for piece in self.reference.occupancy.footprints[expected]],
+                                       atol=1e-6)
+        pairs = {frozenset([self.trains.index(a), self.trains.index(b)]) for a, b in self.simulation.collisions}
+        expected_pairs = {frozenset([self.expected.index(a), self.expected.index(b)])
+                          for a, b in self.reference.collisions}
+        self.assertEqual(expected_pairs, pairs)
+
+    def test_refuses_dynamics(self):
+        self.simulation.dynamics = TrainDynamics()
+        with self.assertRaises(AssertionError):
+            self.simulation.step(1)
+
+    def test_remove_train(self):
+        self.simulation.step(1)
+        self.reference.step(1)
+        self.simulation.remove_train(self.trains[2])
+        self.reference.remove_train(self.expected[2])
+        self.simulation.step(1)
+        self.reference.step(1)
+
+        for train, expected in zip(self.simulation.trains, self.reference.trains):
+            np.testing.assert_allclose(train.poses, expected.poses, atol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import time
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.simulation.consist import Consist
+from src.simulation.scheduler import SimulationScheduler, interpolate_poses
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState, POSE_H
+from test.layout.segment_table_test import create_test_track
+
+
+class TestSimulationScheduler(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.simulation = Simulation(self.track)
+        segment = self.track.segment_list[1]
+        self.train = self.simulation.add_train(
+            TrainState(segment.get_location(50, constants.DIRECTION_FORWARD), Consist.uniform(3), 10))
+
+    def test_fixed_steps(self):
+        scheduler = SimulationScheduler(self.simulation, rate=10)
+        calls = []
+        scheduler.subscribe(lambda s: calls.append(self.simulation.time))
+
+        scheduler.update(0.25)
+        self.assertAlmostEqual(self.simulation.time, 0.2)
+        self.assertAlmostEqual(scheduler.alpha, 0.5)
+
+        scheduler.update(0.06)
+        self.assertAlmostEqual(self.simulation.time, 0.3)
+        self.assertAlmostEqual(scheduler.alpha, 0.1)
+        self.assertEqual(len(calls), 2)
+
+    def test_catch_up_limit(self):
+        scheduler = SimulationScheduler(self.simulation, rate=10, max_steps=3)
+        scheduler.update(2.05)
+        self.assertAlmostEqual(self.simulation.time, 0.3)
+        self.assertAlmostEqual(scheduler.accumulator, 0.05)
+
+    def test_interpolation(self):
+        scheduler = SimulationScheduler(self.simulation, rate=10)
+        scheduler.update(0.1)
+        before = np.copy(self.train.poses)
+        scheduler.update(0.125)
+
+        poses = scheduler.get_poses(self.train)
+        expected = before + ((self.train.poses - before) * 0.25)
+        np.testing.assert_allclose(poses, expected, atol=1e-9)
+
+    def test_interpolate_heading_wraps(self):
+        previous = np.zeros((1, 5))
+        current = np.zeros((1, 5))
+        previous[0, POSE_H] = np.pi - 0.1
+        current[0, POSE_H] = -np.pi + 0.1
+        poses = interpolate_poses(previous, current, 0.5)
+        self.assertAlmostEqual(np.cos(poses[0, POSE_H]), -1)
+
+    def test_substeps(self):
+        other = Simulation(create_test_track())
+        segment = other.track.segment_list[1]
+        other_train = other.add_train(TrainState(segment.get_location(50, constants.DIRECTION_FORWARD), Consist.uniform(3), 10))
+
+        self.simulation.step(3)
+        other.step(3, substeps=7)
+        np.testing.assert_allclose(self.train.poses, other_train.poses, atol=1e-9)
+
+    def test_threaded(self):
+        scheduler = SimulationScheduler(self.simulation, rate=100, max_steps=10, threaded=True)
+        for _ in range(5):
+            scheduler.update(0.02)
+
+        deadline = time.time() + 5
+        while scheduler.accumulator >= scheduler.step_dt and time.time() < deadline:
+            time.sleep(0.001)
+        scheduler.stop()
+
+        self.assertAlmostEqual(self.simulation.time, 0.1)
+        self.assertIsNone(scheduler.thread)
+
+
+if __name__ == '__main__':
+    unittest.main()
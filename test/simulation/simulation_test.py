@@ -0,0 +1,115 @@
+import math
+import subprocess
+import sys
+import unittest
+
+import numpy as np
+
+import src.constants as constants
+from src.simulation.consist import Consist
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from test.layout.segment_table_test import create_test_track
+
+
+class TestSimulation(unittest.TestCase):
+    def setUp(self):
+        self.track = create_test_track()
+        self.simulation = Simulation(self.track)
+
+        segments = list(self.track.tracks.values())
+        self.trains = [
+            TrainState(segments[0].get_location(30, constants.DIRECTION_REVERSE), Consist.uniform(15), 10),
+            TrainState(segments[1].get_location(90, constants.DIRECTION_FORWARD), Consist.uniform(4), -7.5),
+            TrainState(segments[3].get_location(10, constants.DIRECTION_FORWARD), Consist.uniform(1, 2, 8), 3),
+        ]
+        for train in self.trains:
+            self.simulation.add_train(train)
+
+    def assertPosesMatchLocations(self, train):
+        locations = train.wheel_locations()
+        self.assertEqual(len(locations), len(train.poses))
+
+        for loc, pose in zip(locations, train.poses):
+            pos = loc.get_pos()
+            self.assertAlmostEqual(pos.x, pose[0])
+            self.assertAlmostEqual(pos.y, pose[1])
+            self.assertAlmostEqual(loc.get_height(), pose[2])
+            self.assertAlmostEqual(math.cos(loc.get_h()), math.cos(pose[3]))
+            self.assertAlmostEqual(math.sin(loc.get_h()), math.sin(pose[3]))
+            self.assertAlmostEqual(loc.get_slope(), pose[4])
+
+    def test_initial_poses(self):
+        for train in self.trains:
+            self.assertPosesMatchLocations(train)
+
+    def test_step(self):
+        expected = [train.loc.get_offset(train.speed * 40 * 0.25) for train in self.trains]
+
+        for _ in range(40):
+            self.simulation.step(0.25)
+
+        self.assertAlmostEqual(10, self.simulation.time)
+        for loc, train in zip(expected, self.trains):
+            self.assertEqual(loc.track_uuid(), train.loc.track_uuid())
+            self.assertEqual(loc.direction, train.loc.direction)
+            self.assertAlmostEqual(loc.get_distance(), train.loc.get_distance())
+            self.assertPosesMatchLocations(train)
+
+    def test_subscribers(self):
+        calls = []
+
+        def callback(simulation):
+            calls.append(simulation.time)
+
+        self.simulation.subscribe(callback)
+        self.simulation.step(1)
+        self.simulation.step(1)
+        self.simulation.unsubscribe(callback)
+        self.simulation.step(1)
+
+        self.assertListEqual([1, 2], calls)
+
+    def test_poses_placed_in_place(self):
+        # Every train's poses stay a view of the one array placed into each step
+        poses = [train.poses for train in self.trains]
+        buffer = self.simulation.poses
+        before = [pose.copy() for pose in poses]
+
+        self.simulation.step(1)
+
+        self.assertIs(buffer, self.simulation.poses)
+        for train, pose, old in zip(self.trains, poses, before):
+            self.assertIs(pose, train.poses)
+            self.assertIs(buffer, pose.base)
+            self.assertFalse(np.allclose(old, pose))
+            self.assertPosesMatchLocations(train)
+
+    def test_remove_train(self):
+        self.simulation.remove_train(self.trains[1])
+        self.simulation.step(1)
+
+        for train in [self.trains[0], self.trains[2]]:
+            self.assertPosesMatchLocations(train)
+
+    def test_layout_edit(self):
+        # Raising a node updates the table and occupancy in place, and trains
+        # keep following the layout
+        table = self.simulation.get_segment_table()
+        node = self.track.node_list[1]
+        node.height = 80
+        self.simulation.step(1)
+
+        self.assertIs(table, self.simulation.get_segment_table())
+        self.assertEqual(80, table.end_z[1])
+        for train in self.trains:
+            self.assertPosesMatchLocations(train)
+
+    def test_does_not_import_panda3d(self):
+        code = (
+            'import sys\n'
+            'import src.simulation.simulation\n'
+            'import test.layout.segment_table_test\n'
+            'sys.exit(1 if "panda3d" in sys.modules else 0)\n'
+        )
+        self.assertEqual(0, subprocess.call([sys.executable, '-c', code]))
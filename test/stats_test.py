@@ -0,0 +1,87 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+import src.constants as constants
+import src.stats as stats
+from src.simulation.consist import Consist
+from src.simulation.simulation import Simulation
+from src.simulation.train_state import TrainState
+from test.layout.segment_table_test import create_test_track
+
+
+class TestStats(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+        self.track = create_test_track()
+        self.simulation = Simulation(self.track)
+        loc = self.track.segment_list[1].get_location(95, constants.DIRECTION_FORWARD)
+        self.simulation.add_train(TrainState(loc, Consist.uniform(2), 10))
+
+    def tearDown(self):
+        stats.disable()
+        stats.reset()
+
+    def test_disabled(self):
+        self.simulation.step(1)
+        self.assertIs(stats.timer('Simulation:Step'), stats.NULL_TIMER)
+        stats.end_frame()
+        self.assertEqual(len(stats.counters), 0)
+        self.assertEqual(len(stats.frames), 0)
+
+    def test_frames(self):
+        stats.enable()
+        self.simulation.step(1)
+        stats.end_frame()
+        self.simulation.step(0)
+        stats.end_frame()
+
+        first, second = stats.frames
+        # Stepping the head over the end of the segment crosses once more than
+        # placing the wheelsets alone
+        self.assertEqual(first['segment_crossings'], second['segment_crossings'] + 1)
+        self.assertGreater(first['Simulation:Step (ms)'], 0)
+
+        # Stepping moves heads in place, locations are only made when asked for
+        self.assertNotIn('locations_allocated', first)
+        self.simulation.trains[0].loc
+        stats.end_frame()
+        self.assertEqual(stats.frames[2]['locations_allocated'], 1)
+        self.assertEqual(second['frame'], 1)
+
+    def test_dump(self):
+        stats.enable()
+        for dt in [1, 0, 1]:
+            self.simulation.step(dt)
+            stats.end_frame()
+
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'stats.csv')
+            json_path = os.path.join(directory, 'stats.json')
+            stats.dump_csv(csv_path)
+            stats.dump_json(json_path)
+
+            with open(csv_path, newline='') as f:
+                rows = list(csv.DictReader(f))
+            with open(json_path) as f:
+                frames = json.load(f)
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1]['segment_crossings'], str(stats.frames[1]['segment_crossings']))
+        self.assertEqual(frames, list(stats.frames))
+
+    def test_frames_are_bounded(self):
+        stats.enable(max_frames=2)
+        for dt in [1, 0, 1]:
+            self.simulation.step(dt)
+            stats.end_frame()
+
+        frame_numbers = [row['frame'] for row in stats.frames]
+        stats.enable(max_frames=stats.MAX_FRAMES)
+        self.assertEqual([1, 2], frame_numbers)
+
+
+if __name__ == '__main__':
+    unittest.main()
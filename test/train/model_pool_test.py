@@ -0,0 +1,90 @@
+import unittest
+
+import numpy as np
+from panda3d.core import NodePath, TransformState, Point3, Vec3, GeomNode
+
+from src.train.model_pool import ModelPool, PLACEHOLDER_MODEL, compose_transforms
+
+
+class FakeLoader:
+    def __init__(self):
+        self.loads = 0
+
+    def loadModel(self, path):
+        self.loads += 1
+        return NodePath(GeomNode(path))
+
+
+class FakeBase:
+    def __init__(self):
+        self.render = NodePath('render')
+        self.loader = FakeLoader()
+
+
+class DeferredAssets:
+    # Stands in for an AssetManager whose background loads finish on demand
+    def __init__(self):
+        self.models = {}
+        self.callbacks = []
+
+    def is_loaded(self, path):
+        return path in self.models
+
+    def load_model(self, path):
+        self.models[path] = NodePath(GeomNode(path))
+        return self.models[path]
+
+    def load_model_async(self, path, callback):
+        self.callbacks.append((path, callback))
+
+    def finish(self):
+        for path, callback in self.callbacks:
+            callback(self.load_model(path))
+        self.callbacks = []
+
+
+class TestModelPool(unittest.TestCase):
+    def test_instances_share_prototype(self):
+        base = FakeBase()
+        pool = ModelPool(base)
+        self.assertFalse(pool.hardware_instancing)
+
+        first = pool.instance('car.glb')
+        second = pool.instance('car.glb')
+        pool.instance('wheels.glb')
+
+        self.assertEqual(2, base.loader.loads)
+        self.assertEqual(first.getChild(0).node(), second.getChild(0).node())
+
+        first.setPos(1, 2, 3)
+        self.assertEqual(Point3(0, 0, 0), second.getPos())
+
+    def test_compose_transforms(self):
+        positions = np.array([[1, 2, 3], [-4, 5, 0.5], [0, 0, 0]], dtype=np.float32)
+        hprs = np.array([[30, 0, 20], [-100, 12, 45], [270, -5, 0]], dtype=np.float32)
+
+        mats = compose_transforms(positions, hprs)
+        for i in range(len(positions)):
+            expected = TransformState.makePosHpr(Point3(*positions[i]), Vec3(*hprs[i])).getMat()
+            for row in range(4):
+                for col in range(4):
+                    self.assertAlmostEqual(expected[row][col], mats[i, row, col], places=5)
+
+    def test_async_placeholder(self):
+        assets = DeferredAssets()
+        assets.load_model(PLACEHOLDER_MODEL)
+        pool = ModelPool(FakeBase(), assets)
+
+        first = pool.instance('car.glb')
+        second = pool.instance('car.glb')
+        removed = pool.instance('car.glb')
+        removed.removeNode()
+
+        self.assertEqual(1, len(assets.callbacks))
+        self.assertEqual(PLACEHOLDER_MODEL, first.getChild(0).getName())
+
+        assets.finish()
+
+        for instance in [first, second]:
+            self.assertEqual(1, instance.getNumChildren())
+            self.assertEqual('car.glb', instance.getChild(0).getName())